@@ -1,23 +1,48 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./online_store.db")
 
+
+def _async_url(url: str) -> str:
+    """Map a sync database URL onto the matching async driver"""
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    if url.startswith("postgresql:") or url.startswith("postgres:"):
+        return "postgresql+asyncpg:" + url.split(":", 1)[1]
+    return url
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", _async_url(DATABASE_URL))
+# Seconds a SQLite writer waits for the lock before failing with "database is locked"
+SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", "30"))
+
 engine = create_engine(
     DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {},
-    pool_pre_ping=True,  
-    echo=False  
+    connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT} if "sqlite" in DATABASE_URL else {},
+    pool_pre_ping=True,
+    echo=False
+)
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    connect_args={"timeout": SQLITE_BUSY_TIMEOUT} if "sqlite" in ASYNC_DATABASE_URL else {},
+    pool_pre_ping=True,
+    echo=False
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
@@ -1,17 +1,41 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 from app.database import get_db
 from app.models import User  
-from app.utils import verify_token
+from app.utils import verify_token, user_cache, TRUST_TOKEN_CLAIMS
 
 security = HTTPBearer(auto_error=False)
 
+_CACHED_USER_FIELDS = ("user_id", "user_name", "email", "tel", "is_member", "is_admin")
+
+
+def _principal_from_claims(payload: dict) -> User:
+    # Only what create_access_token puts in the token; email/tel stay unset
+    return User(
+        user_id=payload["user_id"],
+        user_name=payload.get("username"),
+        is_admin=bool(payload.get("is_admin", False))
+    )
+
+
+async def _load_principal(db: AsyncSession, user_id: int) -> Optional[User]:
+    cached = user_cache.get(user_id)
+    if cached is None:
+        user = await db.scalar(select(User).where(User.user_id == user_id))
+        if not user:
+            return None
+        cached = {field: getattr(user, field) for field in _CACHED_USER_FIELDS}
+        user_cache.set(user_id, cached)
+    # A fresh detached instance per request, so handlers can't mutate the cached row
+    return User(**cached)
+
 
 async def get_current_user(
         credentials: HTTPAuthorizationCredentials = Depends(security),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
 ) -> User:
 
     if not credentials:
@@ -39,7 +63,10 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    user = db.query(User).filter(User.user_id == user_id).first()
+    if TRUST_TOKEN_CLAIMS:
+        return _principal_from_claims(payload)
+
+    user = await _load_principal(db, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -51,7 +78,7 @@ async def get_current_user(
 
 async def get_current_user_optional(
         credentials: HTTPAuthorizationCredentials = None,
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
 ) -> Optional[User]:
 
     if not credentials:
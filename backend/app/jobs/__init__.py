@@ -0,0 +1 @@
+"""Maintenance jobs that can run from a CLI or a scheduler as well as from the API"""
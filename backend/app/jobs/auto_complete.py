@@ -0,0 +1,197 @@
+"""
+Mark shipped orders older than the grace period as completed.
+
+python -m app.jobs.auto_complete [--days 15] [--batch-size 1000]
+"""
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import func, select, update
+
+from app.database import AsyncSessionLocal
+from app.models import Order
+from app.utils import recompute_order_stats, refresh_member_status, invalidate_cached_user
+from app.utils.log_utils import get_logger
+
+AUTO_COMPLETE_AFTER_DAYS = int(os.getenv("AUTO_COMPLETE_AFTER_DAYS", "15"))
+# Orders flipped per transaction; keeps lock time and memory flat whatever the backlog
+AUTO_COMPLETE_BATCH_SIZE = int(os.getenv("AUTO_COMPLETE_BATCH_SIZE", "1000"))
+
+logger = get_logger("app.jobs.auto_complete")
+
+
+class AutoCompleteProgress:
+    def __init__(self):
+        self.state = "idle"
+        self.total = 0
+        self.updated_orders = 0
+        self.updated_users = 0
+        self.membership_changes = 0
+        self.batches = 0
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.error: Optional[str] = None
+        self._started = 0.0
+        self._finished: Optional[float] = None
+
+    def start(self, total: int):
+        self.state = "running"
+        self.total = total
+        self.started_at = datetime.utcnow()
+        self._started = time.perf_counter()
+
+    def record_batch(self, orders: int, users: int, membership_changes: int):
+        self.batches += 1
+        self.updated_orders += orders
+        self.updated_users += users
+        self.membership_changes += membership_changes
+
+    def finish(self, error: Optional[str] = None):
+        self.state = "failed" if error else "finished"
+        self.error = error
+        self.finished_at = datetime.utcnow()
+        self._finished = time.perf_counter()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "total": self.total,
+            "updated_orders": self.updated_orders,
+            "updated_users": self.updated_users,
+            "membership_changes": self.membership_changes,
+            "batches": self.batches,
+            "elapsed_seconds": round((self._finished or time.perf_counter()) - self._started, 2) if self.started_at else 0.0,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "error": self.error,
+        }
+
+
+def stale_cutoff(older_than_days: int = AUTO_COMPLETE_AFTER_DAYS) -> datetime:
+    return datetime.utcnow() - timedelta(days=older_than_days)
+
+
+def _stale_shipped(cutoff: datetime):
+    return (Order.status == "shipped", Order.created_at <= cutoff)
+
+
+async def count_stale_orders(cutoff: datetime) -> int:
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(select(func.count()).select_from(Order).where(*_stale_shipped(cutoff)))
+
+
+async def auto_complete_orders(
+        older_than_days: int = AUTO_COMPLETE_AFTER_DAYS,
+        batch_size: int = AUTO_COMPLETE_BATCH_SIZE,
+        progress: Optional[AutoCompleteProgress] = None,
+        on_batch: Optional[Callable[[AutoCompleteProgress], None]] = None
+) -> AutoCompleteProgress:
+    """
+    Complete stale shipped orders in batches of batch_size, one transaction each.
+
+    Every batch is one UPDATE over a keyset slice of order ids, followed by a set-based
+    recount of UserOrderStats and a membership refresh for the users it touched.
+    """
+    progress = progress or AutoCompleteProgress()
+    cutoff = stale_cutoff(older_than_days)
+    progress.start(await count_stale_orders(cutoff))
+
+    try:
+        last_order_id = 0
+        while True:
+            async with AsyncSessionLocal() as db:
+                rows = (await db.execute(
+                    select(Order.order_id, Order.user_id)
+                    .where(*_stale_shipped(cutoff), Order.order_id > last_order_id)
+                    .order_by(Order.order_id)
+                    .limit(batch_size)
+                )).all()
+                if not rows:
+                    break
+
+                order_ids = [order_id for order_id, _ in rows]
+                user_ids = {user_id for _, user_id in rows}
+                # Re-check the status so orders changed since the SELECT are left alone
+                result = await db.execute(
+                    update(Order)
+                    .where(Order.order_id.in_(order_ids), *_stale_shipped(cutoff))
+                    .values(status="completed")
+                    .execution_options(synchronize_session=False)
+                )
+                await recompute_order_stats(db, user_ids)
+                changed = await refresh_member_status(db, user_ids)
+                await db.commit()
+
+            for user_id in changed:
+                invalidate_cached_user(user_id)
+            last_order_id = order_ids[-1]
+            progress.record_batch(result.rowcount, len(user_ids), len(changed))
+            if on_batch:
+                on_batch(progress)
+            # Let request handlers run between batches when this executes inside the API process
+            await asyncio.sleep(0)
+    except Exception as e:
+        progress.finish(error=str(e))
+        raise
+
+    progress.finish()
+    return progress
+
+
+class AutoCompleteRunner:
+    """Runs at most one auto-complete job at a time inside the API process"""
+
+    def __init__(self):
+        self.progress = AutoCompleteProgress()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, older_than_days: int = AUTO_COMPLETE_AFTER_DAYS) -> bool:
+        """Start a job unless one is running; returns False when it was already running"""
+        if self.running:
+            return False
+        self.progress = AutoCompleteProgress()
+        self._task = asyncio.create_task(self._run(older_than_days))
+        return True
+
+    async def _run(self, older_than_days: int):
+        try:
+            await auto_complete_orders(older_than_days, progress=self.progress)
+        except Exception:
+            # Also recorded on the progress object for the status endpoint
+            logger.exception("Auto-complete job failed")
+
+    async def wait(self):
+        if self._task is not None:
+            await self._task
+
+
+auto_complete_runner = AutoCompleteRunner()
+
+
+def _print_progress(progress: AutoCompleteProgress):
+    print(
+        f"batch {progress.batches}: {progress.updated_orders}/{progress.total} orders, "
+        f"{progress.updated_users} users, {progress.membership_changes} membership changes"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.jobs.auto_complete", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--days", type=int, default=AUTO_COMPLETE_AFTER_DAYS, help="Grace period after shipping")
+    parser.add_argument("--batch-size", type=int, default=AUTO_COMPLETE_BATCH_SIZE, help="Orders per transaction")
+    args = parser.parse_args(argv)
+
+    progress = asyncio.run(auto_complete_orders(args.days, args.batch_size, on_batch=_print_progress))
+    print(f"Completed {progress.updated_orders} orders in {progress.snapshot()['elapsed_seconds']}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+"""
+Stream a CSV or JSONL product feed into the catalog, upserting on sku.
+
+python -m app.jobs.import_products feed.csv [--chunk-size 5000] [--update price,stock_quantity] [--defer-indexes]
+
+Columns: sku, product_name, price, type (required), description, stock_quantity.
+Rows are read, validated and written one chunk at a time, so memory stays flat
+whatever the size of the feed. Search suggestions in running API workers catch
+up on their next refresh (SEARCH_SUGGEST_REFRESH_SECONDS).
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal, async_engine
+from app.migrations.operations import create_index, drop_index
+from app.models import Product
+from app.utils import (
+    app_cache, bump_product_versions, bump_versions, product_cache, search_backend, suggestion_index,
+    PRODUCT_LIST_TAG, CATEGORY_TAG
+)
+from app.utils.category_utils import rebuild_categories
+from app.utils.common import dialect_insert
+
+# Rows per INSERT ... ON CONFLICT executemany, and per transaction
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "5000"))
+
+REQUIRED_FIELDS = ("sku", "product_name", "price", "type")
+UPDATABLE_FIELDS = ("product_name", "price", "type", "description", "stock_quantity")
+MAX_LENGTHS = {"sku": 64, "product_name": 100, "type": 50}
+# Product.price is Numeric(10, 2)
+MAX_PRICE = Decimal("99999999.99")
+# Only the first errors are kept for the report; the count covers all of them
+MAX_REPORTED_ERRORS = 50
+
+Record = Tuple[int, Any]
+
+
+class FeedError(ValueError):
+    pass
+
+
+def read_csv(stream) -> Iterator[Record]:
+    reader = csv.DictReader(stream)
+    missing = [field for field in REQUIRED_FIELDS if field not in (reader.fieldnames or [])]
+    if missing:
+        raise FeedError(f"CSV header lacks {', '.join(missing)}")
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_jsonl(stream) -> Iterator[Record]:
+    for line_number, line in enumerate(stream, 1):
+        if line.strip():
+            yield line_number, line
+
+
+READERS: Dict[str, Callable[[Any], Iterator[Record]]] = {"csv": read_csv, "jsonl": read_jsonl}
+
+
+def feed_format(path: str) -> str:
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    raise FeedError(f"Cannot tell the format of {path}; pass --format")
+
+
+def normalize_row(record: Any) -> Dict[str, Any]:
+    """Validated column values for one feed record; raises FeedError"""
+    if isinstance(record, str):
+        try:
+            record = json.loads(record)
+        except ValueError as e:
+            raise FeedError(f"invalid JSON: {e}")
+        if not isinstance(record, dict):
+            raise FeedError("expected a JSON object")
+
+    def text(field: str) -> str:
+        value = record.get(field)
+        return "" if value is None else str(value).strip()
+
+    for field in REQUIRED_FIELDS:
+        if not text(field):
+            raise FeedError(f"missing {field}")
+    for field, limit in MAX_LENGTHS.items():
+        if len(text(field)) > limit:
+            raise FeedError(f"{field} longer than {limit} characters")
+
+    try:
+        price = Decimal(text("price")).quantize(Decimal("0.01"))
+    except InvalidOperation:
+        raise FeedError(f"invalid price {record.get('price')!r}")
+    if not price.is_finite() or not 0 <= price <= MAX_PRICE:
+        raise FeedError(f"invalid price {record.get('price')!r}")
+
+    stock = text("stock_quantity") or "0"
+    try:
+        stock_quantity = int(stock)
+    except ValueError:
+        raise FeedError(f"invalid stock_quantity {stock!r}")
+    if stock_quantity < 0:
+        raise FeedError("stock_quantity is negative")
+
+    return {
+        "sku": text("sku"),
+        "product_name": text("product_name"),
+        "price": price,
+        "type": text("type"),
+        "description": text("description"),
+        "stock_quantity": stock_quantity,
+    }
+
+
+class ImportProgress:
+    def __init__(self):
+        self.rows_read = 0
+        self.rows_inserted = 0
+        self.rows_updated = 0
+        # Existing skus left alone because no columns are to be updated
+        self.rows_skipped = 0
+        self.rows_rejected = 0
+        self.chunks = 0
+        self.errors: List[Tuple[int, str]] = []
+        self._started = time.perf_counter()
+
+    def reject(self, line_number: int, message: str):
+        self.rows_rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line_number, message))
+
+    def record_chunk(self, inserted: int, updated: int, skipped: int):
+        self.chunks += 1
+        self.rows_inserted += inserted
+        self.rows_updated += updated
+        self.rows_skipped += skipped
+
+    @property
+    def rows_written(self) -> int:
+        return self.rows_inserted + self.rows_updated
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._started
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "rows_read": self.rows_read,
+            "rows_written": self.rows_written,
+            "rows_inserted": self.rows_inserted,
+            "rows_updated": self.rows_updated,
+            "rows_skipped": self.rows_skipped,
+            "rows_rejected": self.rows_rejected,
+            "chunks": self.chunks,
+            "elapsed_seconds": round(self.elapsed, 2),
+            "rows_per_second": round(self.rows_read / self.elapsed) if self.elapsed else 0,
+        }
+
+
+async def upsert_chunk(
+        db: AsyncSession, rows: List[Dict[str, Any]], update_fields: Sequence[str]
+) -> Tuple[int, List[int]]:
+    """
+    Write one chunk in the caller's transaction.
+
+    Returns the number of new products and the ids of existing ones that were
+    updated; with no update_fields existing skus are left alone and none are.
+    """
+    table = Product.__table__
+    existing = (await db.execute(
+        select(table.c.product_id).where(table.c.sku.in_([row["sku"] for row in rows]))
+    )).scalars().all()
+    inserted = len(rows) - len(existing)
+    updated = list(existing) if update_fields else []
+    if not inserted and not updated:
+        return 0, []
+
+    statement = dialect_insert(db)(table)
+    if update_fields:
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.sku],
+            set_={field: statement.excluded[field] for field in update_fields}
+        )
+    else:
+        statement = statement.on_conflict_do_nothing(index_elements=[table.c.sku])
+    # A list of parameter sets runs as one executemany
+    await db.execute(statement, rows)
+    # Keeps list and category ETags honest; only updated products can have cached detail entries
+    await bump_product_versions(db, *updated)
+    return inserted, updated
+
+
+async def refresh_derived(reindex: bool):
+    """
+    Bring the search index and category counts in line with Product after a load.
+
+    Indexed once for the whole feed instead of per row as the admin endpoints do.
+    setup() creates the index if the app never ran and reindexes when row counts
+    differ; updated rows keep the counts equal, so they need reindex. The counts
+    are only right from here on, so the list and category validators move again.
+    """
+    async with AsyncSessionLocal() as db:
+        conn = await db.connection()
+        await search_backend.setup(conn)
+        if reindex:
+            await search_backend.rebuild(conn)
+        await rebuild_categories(conn)
+        await bump_versions(db, PRODUCT_LIST_TAG, CATEGORY_TAG)
+        await db.commit()
+    await app_cache.invalidate_tags(PRODUCT_LIST_TAG, CATEGORY_TAG)
+    # Picked up by the next lookup in this process; API workers elsewhere within SEARCH_SUGGEST_REFRESH_SECONDS
+    suggestion_index.mark_stale()
+
+
+def _secondary_indexes():
+    # The sku index stays: every chunk's upsert needs it
+    return [index for index in Product.__table__.indexes if not index.unique]
+
+
+async def set_secondary_indexes(build: bool):
+    """Drop or rebuild the non-unique Product indexes; building once after a large load beats updating them per row"""
+    async with async_engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        for index in _secondary_indexes():
+            if build:
+                await conn.run_sync(create_index, index.name, Product.__tablename__, [c.name for c in index.columns])
+            else:
+                await conn.run_sync(drop_index, index.name)
+
+
+def _chunks(records: Iterable[Record], size: int) -> Iterator[List[Record]]:
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+async def import_products(
+        records: Iterable[Record],
+        chunk_size: int = IMPORT_CHUNK_SIZE,
+        update_fields: Sequence[str] = UPDATABLE_FIELDS,
+        defer_indexes: bool = False,
+        max_errors: Optional[int] = None,
+        progress: Optional[ImportProgress] = None,
+        on_chunk: Optional[Callable[[ImportProgress], None]] = None
+) -> ImportProgress:
+    """
+    Upsert (line number, record) pairs into Product by sku, one transaction per chunk.
+
+    A later row for the same sku wins. Chunks already committed stay when the
+    feed fails part way, with the search index and category counts rebuilt to
+    match them; rerunning the same feed is safe.
+    """
+    progress = progress or ImportProgress()
+    if defer_indexes:
+        await set_secondary_indexes(build=False)
+    try:
+        for chunk in _chunks(records, chunk_size):
+            rows: Dict[str, Dict[str, Any]] = {}
+            for line_number, record in chunk:
+                progress.rows_read += 1
+                try:
+                    row = normalize_row(record)
+                except FeedError as e:
+                    progress.reject(line_number, str(e))
+                    continue
+                # One row per sku, or PostgreSQL refuses to update the same row twice in a statement
+                rows.pop(row["sku"], None)
+                rows[row["sku"]] = row
+            if max_errors is not None and progress.rows_rejected > max_errors:
+                raise FeedError(f"More than {max_errors} invalid rows; stopped after line {chunk[-1][0]}")
+
+            if rows:
+                async with AsyncSessionLocal() as db:
+                    inserted, updated = await upsert_chunk(db, list(rows.values()), update_fields)
+                    await db.commit()
+                if inserted or updated:
+                    await product_cache.invalidate(*updated)
+                progress.record_chunk(inserted, len(updated), len(rows) - inserted - len(updated))
+            if on_chunk:
+                on_chunk(progress)
+            # Let request handlers run between chunks when this executes inside the API process
+            await asyncio.sleep(0)
+    finally:
+        if defer_indexes:
+            await set_secondary_indexes(build=True)
+        # Also when the feed stops part way: the chunks already committed are live
+        if progress.rows_written:
+            await refresh_derived(reindex=progress.rows_updated > 0)
+    return progress
+
+
+def _print_progress(progress: ImportProgress):
+    if progress.chunks % 10 == 0:
+        print(f"{progress.rows_read} rows read, {progress.rows_written} written, {progress.rows_rejected} rejected")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.jobs.import_products", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("path", help="Feed file, or - for stdin")
+    parser.add_argument("--format", choices=sorted(READERS), help="Defaults to the file extension")
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE, help="Rows per statement and transaction")
+    parser.add_argument("--update", default=",".join(UPDATABLE_FIELDS),
+                        help="Columns overwritten for existing skus, or 'none' to only insert new ones")
+    parser.add_argument("--defer-indexes", action="store_true",
+                        help="Drop secondary Product indexes during the load and rebuild them after; for initial loads")
+    parser.add_argument("--max-errors", type=int, default=None, help="Stop once more rows than this are rejected")
+    args = parser.parse_args(argv)
+
+    update_fields = [] if args.update == "none" else [field.strip() for field in args.update.split(",") if field.strip()]
+    unknown = set(update_fields) - set(UPDATABLE_FIELDS)
+    if unknown:
+        parser.error(f"cannot update {', '.join(sorted(unknown))}; choose from {', '.join(UPDATABLE_FIELDS)}")
+
+    try:
+        fmt = args.format or feed_format(args.path)
+    except FeedError as e:
+        parser.error(str(e))
+    stream = sys.stdin if args.path == "-" else open(args.path, newline="", encoding="utf-8-sig")
+    try:
+        progress = asyncio.run(import_products(
+            READERS[fmt](stream), args.chunk_size, update_fields, args.defer_indexes, args.max_errors,
+            on_chunk=_print_progress
+        ))
+    except FeedError as e:
+        sys.exit(f"Import failed: {e}")
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+    summary = progress.snapshot()
+    print(", ".join(f"{key}={value}" for key, value in summary.items()))
+    for line_number, message in progress.errors:
+        print(f"  line {line_number}: {message}")
+    if progress.rows_rejected > len(progress.errors):
+        print(f"  ... and {progress.rows_rejected - len(progress.errors)} more")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""
+Rebuild UserOrderStats from the Order table.
+
+python -m app.jobs.order_stats [--user-id N ...]
+"""
+import argparse
+import asyncio
+
+from sqlalchemy import func, select
+
+from app.database import AsyncSessionLocal
+from app.models import UserOrderStats
+from app.utils import recompute_order_stats
+
+
+async def run(user_ids=None) -> int:
+    async with AsyncSessionLocal() as db:
+        await recompute_order_stats(db, user_ids)
+        await db.commit()
+        return await db.scalar(select(func.count()).select_from(UserOrderStats))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.jobs.order_stats", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--user-id", type=int, action="append", dest="user_ids", help="Only these users (repeatable)")
+    args = parser.parse_args(argv)
+
+    rows = asyncio.run(run(args.user_ids))
+    print(f"Order stats rebuilt; {rows} users have completed orders")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import asyncio
+import os
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Set
+
+from app.database import AsyncSessionLocal
+from app.utils.log_utils import get_logger
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+# First retry waits this long, doubling on each further attempt
+JOB_RETRY_BACKOFF = float(os.getenv("JOB_RETRY_BACKOFF", "0.5"))
+# Upper bound on items merged into one batch job
+JOB_MAX_BATCH = int(os.getenv("JOB_MAX_BATCH", "500"))
+
+logger = get_logger("app.jobs")
+
+
+class Job:
+    def __init__(self, fn: Callable, args: tuple = (), items: Optional[Set[Any]] = None):
+        self.fn = fn
+        self.args = args
+        # Batch jobs collect items and hand the whole set to fn in one call
+        self.items = items
+        self.attempts = 0
+        self.enqueued_at = time.monotonic()
+
+    @property
+    def name(self) -> str:
+        return self.fn.__name__
+
+    @property
+    def key(self) -> Hashable:
+        return (self.fn, "batch") if self.items is not None else (self.fn, self.args)
+
+    async def run(self, db):
+        if self.items is not None:
+            return await self.fn(db, set(self.items))
+        return await self.fn(db, *self.args)
+
+
+class JobQueue:
+    """
+    In-process queue for work that should not hold up the response.
+
+    Every job gets its own session from session_factory, failures are retried with
+    exponential backoff, and a job that is already waiting absorbs duplicates:
+    enqueue() drops an identical (fn, args) job and enqueue_batch() adds the item to
+    the waiting batch, so a burst of membership updates becomes one UPDATE.
+    """
+
+    def __init__(
+            self,
+            workers: int = JOB_WORKERS,
+            max_attempts: int = JOB_MAX_ATTEMPTS,
+            backoff: float = JOB_RETRY_BACKOFF,
+            max_batch: int = JOB_MAX_BATCH,
+            session_factory=AsyncSessionLocal
+    ):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_batch = max_batch
+        self.session_factory = session_factory
+        self._queue: Optional[asyncio.Queue] = None
+        self._pending: Dict[Hashable, Job] = {}
+        self._workers: list = []
+        self._retries: Set[asyncio.Task] = set()
+        self.in_flight = 0
+        self.counters = {"enqueued": 0, "coalesced": 0, "processed": 0, "retried": 0, "failed": 0}
+        self.by_name: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, name: str, counter: str):
+        self.counters[counter] += 1
+        per_name = self.by_name.setdefault(name, {"enqueued": 0, "coalesced": 0, "processed": 0, "retried": 0, "failed": 0})
+        per_name[counter] += 1
+
+    def start(self):
+        """Start the workers on the running loop; enqueue calls this too, so startup hooks are optional"""
+        if self._workers:
+            return
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = 10.0):
+        """Let queued jobs finish for up to timeout seconds, then cancel the workers"""
+        if not self._workers:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Job queue stopped with %s jobs still queued", self._queue.qsize())
+        for task in [*self._retries, *self._workers]:
+            task.cancel()
+        await asyncio.gather(*self._retries, *self._workers, return_exceptions=True)
+        self._workers = []
+        self._pending.clear()
+        self._queue = None
+
+    async def drain(self):
+        """Wait until every job queued so far has run, retries aside"""
+        if self._queue is not None:
+            await self._queue.join()
+
+    def _put(self, job: Job):
+        self.start()
+        self._pending[job.key] = job
+        self._queue.put_nowait(job)
+
+    def enqueue(self, fn: Callable, *args) -> bool:
+        """Queue fn(db, *args); returns False when an identical job is already waiting"""
+        job = Job(fn, args)
+        if job.key in self._pending:
+            self._count(job.name, "coalesced")
+            return False
+        self._count(job.name, "enqueued")
+        self._put(job)
+        return True
+
+    def enqueue_batch(self, fn: Callable, item: Any) -> bool:
+        """Add item to the waiting fn(db, items) batch, starting a new batch when there is none"""
+        waiting = self._pending.get((fn, "batch"))
+        if waiting is not None and len(waiting.items) < self.max_batch:
+            waiting.items.add(item)
+            self._count(waiting.name, "coalesced")
+            return False
+        job = Job(fn, items={item})
+        self._count(job.name, "enqueued")
+        self._put(job)
+        return True
+
+    async def _retry_later(self, job: Job):
+        await asyncio.sleep(self.backoff * 2 ** (job.attempts - 1))
+        waiting = self._pending.get(job.key)
+        if waiting is None:
+            self._put(job)
+        elif job.items is not None:
+            waiting.items.update(job.items)
+        # else: an identical job is already waiting and will do the same work
+
+    def _schedule_retry(self, job: Job):
+        task = asyncio.create_task(self._retry_later(job))
+        self._retries.add(task)
+        task.add_done_callback(self._retries.discard)
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            # New duplicates queue behind this run instead of merging into it
+            if self._pending.get(job.key) is job:
+                del self._pending[job.key]
+            self.in_flight += 1
+            try:
+                job.attempts += 1
+                async with self.session_factory() as db:
+                    await job.run(db)
+                self._count(job.name, "processed")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if job.attempts < self.max_attempts:
+                    self._count(job.name, "retried")
+                    logger.info("Job %s failed on attempt %s, retrying: %s", job.name, job.attempts, e,
+                                extra={"job": job.name, "attempt": job.attempts})
+                    self._schedule_retry(job)
+                else:
+                    self._count(job.name, "failed")
+                    logger.exception("Job %s failed after %s attempts", job.name, job.attempts,
+                                     extra={"job": job.name, "attempt": job.attempts})
+            finally:
+                self.in_flight -= 1
+                self._queue.task_done()
+
+    def stats(self) -> Dict[str, Any]:
+        oldest = min((job.enqueued_at for job in self._pending.values()), default=None)
+        return {
+            "depth": self._queue.qsize() if self._queue else 0,
+            "in_flight": self.in_flight,
+            "waiting_retries": len(self._retries),
+            "workers": len(self._workers),
+            "oldest_wait_seconds": round(time.monotonic() - oldest, 3) if oldest is not None else 0.0,
+            **self.counters,
+            "by_job": self.by_name,
+        }
+
+
+job_queue = JobQueue()
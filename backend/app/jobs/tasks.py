@@ -0,0 +1,12 @@
+"""Jobs run on job_queue, each with its own session"""
+from typing import Set
+
+from app.utils import refresh_member_status, invalidate_cached_user
+
+
+async def refresh_membership(db, user_ids: Set[int]):
+    """Batch job: re-evaluate is_member for every user queued since the last run"""
+    changed = await refresh_member_status(db, user_ids)
+    await db.commit()
+    for user_id in changed:
+        invalidate_cached_user(user_id)
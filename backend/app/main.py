@@ -1,18 +1,24 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from app.routes import auth, users, products, cart, orders, favorites, reviews
-from app.database import engine, Base
-
-
-
-Base.metadata.create_all(bind=engine)
+from app.database import engine, async_engine
+from app.migrations import check_schema
+from app.jobs.queue import job_queue
+from app.middleware import CompressionMiddleware, MetricsMiddleware, QueryDetectorMiddleware, RequestIdMiddleware
+from app.utils import search_backend, password_pool, sync_categories, FastJSONResponse, app_cache, token_cache
+from app.utils.metrics_utils import metrics, instrument_engine, gauge_lines
+from app.utils.log_utils import log_subsystem
+from app.utils.index_utils import run_startup_advisor, INDEX_ADVISOR_ON_STARTUP
+from app.utils.nplusone_utils import install_query_detector, QUERY_DETECTOR
 
 
 app = FastAPI(
     title="OnlineStore API",
     description="Backend API for E-commerce Platform",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
 
 
@@ -30,8 +36,31 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets the frontend read the validators it sends back on revalidation
+    expose_headers=["ETag", "Last-Modified", "X-Request-ID"],
 )
 
+app.add_middleware(CompressionMiddleware)
+if QUERY_DETECTOR:
+    app.add_middleware(QueryDetectorMiddleware)
+# Timings and sizes cover the other middleware too
+app.add_middleware(MetricsMiddleware)
+# Outermost, so every log line for a request, the slow-request warning included, carries its id
+app.add_middleware(RequestIdMiddleware)
+
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+# Cheap no-op unless a recorder is active: QUERY_DETECTOR, record_queries() or the query_budget fixture
+install_query_detector(engine)
+install_query_detector(async_engine.sync_engine)
+metrics.add_collector(lambda: gauge_lines("job_queue", "Background job queue state", job_queue.stats(), "stat"))
+metrics.add_collector(lambda: gauge_lines("app_cache", "Shared read cache state", app_cache.stats(), "stat"))
+metrics.add_collector(lambda: gauge_lines("token_cache", "Verified JWT payload cache state", token_cache.stats(), "stat"))
+metrics.add_collector(lambda: gauge_lines(
+    "password_hash", "bcrypt pool backlog and per-operation latency", password_pool.flat_stats(), "stat"
+))
+metrics.add_collector(lambda: gauge_lines("log_queue", "Log records waiting for the writer or dropped", log_subsystem.stats(), "stat"))
+
 
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(users.router, prefix="/api/users", tags=["User"])
@@ -41,6 +70,50 @@ app.include_router(orders.router, prefix="/api/orders", tags=["Order"])
 app.include_router(favorites.router, prefix="/api/favorites", tags=["Favorites"])
 app.include_router(reviews.router, prefix="/api/reviews", tags=["Review"])
 
+@app.on_event("startup")
+async def start_logging():
+    log_subsystem.configure()
+
+@app.on_event("startup")
+async def check_schema_version():
+    # Runs before the other startup hooks, which rely on the tables being there
+    async with async_engine.connect() as conn:
+        await conn.run_sync(check_schema)
+
+@app.on_event("startup")
+async def setup_search_index():
+    async with async_engine.begin() as conn:
+        await search_backend.setup(conn)
+
+@app.on_event("startup")
+async def setup_category_counts():
+    async with async_engine.begin() as conn:
+        await sync_categories(conn)
+
+@app.on_event("startup")
+async def check_query_plans():
+    if INDEX_ADVISOR_ON_STARTUP and async_engine.dialect.name == "sqlite":
+        async with async_engine.connect() as conn:
+            await run_startup_advisor(conn)
+
+@app.on_event("startup")
+async def start_job_queue():
+    job_queue.start()
+
+@app.on_event("shutdown")
+async def stop_job_queue():
+    # Drain before the pool goes away so queued jobs still get a connection
+    await job_queue.stop()
+
+@app.on_event("shutdown")
+async def shutdown_password_pool():
+    password_pool.shutdown()
+
+@app.on_event("shutdown")
+async def stop_logging():
+    # Last, so records from the other shutdown hooks are written out
+    log_subsystem.stop()
+
 @app.get("/")
 async def root():
     return {"message": "OnlineStore API"}
@@ -48,3 +121,7 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
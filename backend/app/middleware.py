@@ -0,0 +1,248 @@
+import os
+import time
+import uuid
+import zlib
+from typing import Any, Dict, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils.log_utils import current_request_id, get_logger
+from app.utils.metrics_utils import RequestStats, current_request_stats, metrics
+from app.utils.nplusone_utils import QUERY_DETECTOR_THRESHOLD, record_queries
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this go out uncompressed; below ~1KB the framing costs more than it saves
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+logger = get_logger("app.middleware")
+
+
+def accepted_encodings(header: str) -> set:
+    encodings = set()
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        if name:
+            encodings.add(name.strip().lower())
+    return encodings
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            # wbits=31 writes the gzip container rather than raw zlib
+            self._zlib = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(data)
+        return self._zlib.compress(data)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with brotli when the client accepts it and the brotli package is
+    installed, gzip otherwise. Small bodies, already-encoded responses and bodiless
+    statuses such as 304 pass through untouched.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    def _choose(self, scope: Scope) -> Optional[str]:
+        accepted = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        if brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        encoding = self._choose(scope) if scope["type"] == "http" else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressionResponder(self.app, encoding, self.minimum_size)(scope, receive, send)
+
+
+class _CompressionResponder:
+    def __init__(self, app: ASGIApp, encoding: str, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send: Optional[Send] = None
+        self.initial_message: Message = {}
+        self.passthrough = False
+        self.started = False
+        self.compressor: Optional[_Compressor] = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message):
+        if message["type"] == "http.response.start":
+            # Held back until the first body chunk shows whether compressing is worth it
+            self.initial_message = message
+            self.passthrough = "content-encoding" in Headers(raw=message["headers"])
+            return
+
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if not self.started:
+            self.started = True
+            if self.passthrough or (len(body) < self.minimum_size and not more_body):
+                self.compressor = None
+                await self.send(self.initial_message)
+                await self.send(message)
+                return
+
+            self.compressor = _Compressor(self.encoding)
+            headers = MutableHeaders(raw=self.initial_message["headers"])
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            compressed = self.compressor.compress(body)
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                compressed += self.compressor.finish()
+                headers["Content-Length"] = str(len(compressed))
+            await self.send(self.initial_message)
+            await self.send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+            return
+
+        if self.compressor is None:
+            await self.send(message)
+            return
+
+        compressed = self.compressor.compress(body)
+        if not more_body:
+            compressed += self.compressor.finish()
+        await self.send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+
+class MetricsMiddleware:
+    """
+    Record latency, status, response bytes and SQL work per route into app.utils.metrics_utils.
+
+    Added last so it wraps everything else and sees the bytes that actually go out.
+    Routes are labelled by their path template, never the raw path.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._route_paths: Dict[Any, str] = {}
+
+    def _route_label(self, scope: Scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if endpoint not in self._route_paths:
+            for route in getattr(scope.get("app"), "routes", ()):
+                if getattr(route, "endpoint", None) is not None:
+                    self._route_paths.setdefault(route.endpoint, route.path)
+        return self._route_paths.get(endpoint, getattr(endpoint, "__name__", "unknown"))
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        status = 500
+        size = 0
+        started = time.perf_counter()
+
+        async def send_with_metrics(message: Message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            current_request_stats.reset(token)
+            metrics.observe_request(
+                scope["method"], self._route_label(scope), status, time.perf_counter() - started, size, stats
+            )
+
+
+class QueryDetectorMiddleware:
+    """Print the repeated statement shapes and their call sites for requests that look like N+1s"""
+
+    def __init__(self, app: ASGIApp, threshold: int = QUERY_DETECTOR_THRESHOLD):
+        self.app = app
+        self.threshold = threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with record_queries(self.threshold) as recorder:
+            await self.app(scope, receive, send)
+        if recorder.repeated():
+            logger.warning(recorder.report(f"Repeated queries in {scope['method']} {scope['path']}"))
+
+
+class RequestIdMiddleware:
+    """
+    Give every request an id for log correlation: the caller's X-Request-ID when it
+    sends a sane one, a fresh one otherwise. Echoed back on the response.
+    """
+
+    header = "x-request-id"
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = Headers(scope=scope).get(self.header, "")
+        if not request_id or len(request_id) > 128 or not request_id.isprintable():
+            request_id = uuid.uuid4().hex
+        token = current_request_id.set(request_id)
+
+        async def send_with_id(message: Message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["X-Request-ID"] = request_id
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            current_request_id.reset(token)
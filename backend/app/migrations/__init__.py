@@ -0,0 +1,178 @@
+"""
+Versioned schema migrations.
+
+Each module in app/migrations/versions is named NNNN_description.py and defines
+upgrade(conn). The applied versions are recorded in the SchemaVersion table, so
+starting a worker costs one SELECT instead of reflecting every table.
+"""
+import importlib
+import os
+import pkgutil
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, inspect, insert, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import DBAPIError, IntegrityError
+
+from app.migrations import versions
+from app.utils.log_utils import get_logger
+
+# Apply pending migrations when a worker starts; set to false where a deploy step runs the CLI
+SCHEMA_AUTO_MIGRATE = os.getenv("SCHEMA_AUTO_MIGRATE", "true").lower() in ("1", "true", "yes")
+
+logger = get_logger("app.migrations")
+
+_migration_metadata = MetaData()
+schema_version_table = Table(
+    "SchemaVersion",
+    _migration_metadata,
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("description", String(200), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+class SchemaOutOfDate(RuntimeError):
+    """Raised at startup when the database is behind the code and auto-migration is off"""
+
+
+class Migration:
+    def __init__(self, version: int, name: str, module):
+        self.version = version
+        self.name = name
+        self.module = module
+        self.description = (module.__doc__ or name).strip().splitlines()[0]
+        # Migrations that build indexes concurrently cannot run inside a transaction
+        self.transactional = getattr(module, "transactional", True)
+
+    def upgrade(self, conn: Connection):
+        self.module.upgrade(conn)
+
+    def __repr__(self):
+        return f"<Migration {self.version:04d} {self.name}>"
+
+
+def load_migrations() -> List[Migration]:
+    migrations = []
+    for module_info in pkgutil.iter_modules(versions.__path__):
+        prefix, _, name = module_info.name.partition("_")
+        if not prefix.isdigit():
+            continue
+        module = importlib.import_module(f"{versions.__name__}.{module_info.name}")
+        migrations.append(Migration(int(prefix), name, module))
+
+    migrations.sort(key=lambda migration: migration.version)
+    seen = [migration.version for migration in migrations]
+    if len(seen) != len(set(seen)):
+        raise RuntimeError(f"Duplicate migration versions in {versions.__name__}: {seen}")
+    return migrations
+
+
+MIGRATIONS = load_migrations()
+LATEST_VERSION = MIGRATIONS[-1].version if MIGRATIONS else 0
+
+
+def current_version(conn: Connection) -> int:
+    """Highest applied version, or 0 for a database that predates SchemaVersion"""
+    try:
+        version = conn.scalar(select(func.max(schema_version_table.c.version)))
+    except DBAPIError:
+        conn.rollback()
+        return 0
+    conn.commit()
+    return version or 0
+
+
+def _record(conn: Connection, migration: Migration):
+    conn.execute(insert(schema_version_table).values(
+        version=migration.version,
+        description=migration.description,
+        applied_at=datetime.utcnow()
+    ))
+
+
+def _apply(conn: Connection, migration: Migration) -> bool:
+    if migration.transactional:
+        try:
+            with conn.begin():
+                # Claiming the version first takes the write lock, so a second worker
+                # migrating at the same time fails here instead of repeating the DDL
+                _record(conn, migration)
+                migration.upgrade(conn)
+        except IntegrityError:
+            return False
+        return True
+
+    # Operations in these migrations must be idempotent (IF NOT EXISTS)
+    conn.execution_options(isolation_level="AUTOCOMMIT")
+    try:
+        migration.upgrade(conn)
+    finally:
+        # Each statement has already committed; this only closes SQLAlchemy's transaction marker
+        conn.rollback()
+        conn.execution_options(isolation_level=conn.default_isolation_level)
+    try:
+        with conn.begin():
+            _record(conn, migration)
+    except IntegrityError:
+        return False
+    return True
+
+
+def upgrade(conn: Connection, target: Optional[int] = None) -> List[Migration]:
+    """Apply every migration above the current version, up to target; returns what was applied"""
+    schema_version_table.create(conn, checkfirst=True)
+    conn.commit()
+
+    version = current_version(conn)
+    applied = []
+    for migration in MIGRATIONS:
+        if migration.version <= version or (target is not None and migration.version > target):
+            continue
+        if _apply(conn, migration):
+            applied.append(migration)
+    return applied
+
+
+def verify(conn: Connection) -> List[str]:
+    """Compare the database with the version list and the models; returns a list of problems"""
+    from app.database import Base
+    import app.models  # noqa: F401  (registers every table on Base.metadata)
+
+    problems = []
+    version = current_version(conn)
+    if version < LATEST_VERSION:
+        problems.append(f"schema is at version {version}, latest migration is {LATEST_VERSION}")
+
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            problems.append(f"missing table {table.name}")
+            continue
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in columns:
+                problems.append(f"missing column {table.name}.{column.name}")
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in indexes:
+                problems.append(f"missing index {index.name} on {table.name}")
+    conn.commit()
+    return problems
+
+
+def check_schema(conn: Connection, auto_migrate: bool = SCHEMA_AUTO_MIGRATE) -> int:
+    """Startup check: one version lookup, migrating first when allowed"""
+    version = current_version(conn)
+    if version >= LATEST_VERSION:
+        return version
+    if not auto_migrate:
+        raise SchemaOutOfDate(
+            f"Database schema is at version {version} but the code needs {LATEST_VERSION}; "
+            f"run `python -m app.migrations upgrade`"
+        )
+    for migration in upgrade(conn):
+        logger.info("Applied migration %04d %s", migration.version, migration.name,
+                    extra={"version": migration.version, "migration": migration.name})
+    return current_version(conn)
@@ -0,0 +1,46 @@
+"""
+python -m app.migrations status
+python -m app.migrations upgrade [--target N]
+python -m app.migrations verify
+"""
+import argparse
+import sys
+
+from app.database import engine
+from app.migrations import LATEST_VERSION, MIGRATIONS, current_version, upgrade, verify
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.migrations", description="Apply and check schema migrations")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="Show applied and pending migrations")
+    upgrade_parser = commands.add_parser("upgrade", help="Apply pending migrations")
+    upgrade_parser.add_argument("--target", type=int, default=None, help="Stop after this version")
+    commands.add_parser("verify", help="Check the database matches the latest migration and the models")
+    args = parser.parse_args(argv)
+
+    with engine.connect() as conn:
+        if args.command == "status":
+            version = current_version(conn)
+            for migration in MIGRATIONS:
+                state = "applied" if migration.version <= version else "pending"
+                print(f"{migration.version:04d}  {state:8} {migration.description}")
+            return 0
+
+        if args.command == "upgrade":
+            applied = upgrade(conn, target=args.target)
+            for migration in applied:
+                print(f"Applied {migration.version:04d} {migration.description}")
+            print(f"Schema is at version {current_version(conn)} (latest {LATEST_VERSION})")
+            return 0
+
+        problems = verify(conn)
+        for problem in problems:
+            print(f"FAIL  {problem}")
+        if not problems:
+            print(f"OK    schema is at version {LATEST_VERSION} and matches the models")
+        return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
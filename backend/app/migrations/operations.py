@@ -0,0 +1,28 @@
+from typing import Sequence
+
+from sqlalchemy.engine import Connection
+
+
+def _quote(conn: Connection, name: str) -> str:
+    return conn.dialect.identifier_preparer.quote(name)
+
+
+def create_index(conn: Connection, name: str, table: str, columns: Sequence[str], unique: bool = False):
+    """
+    Build an index without blocking writers where the database allows it.
+
+    PostgreSQL uses CREATE INDEX CONCURRENTLY, which needs the migration to set
+    transactional = False. SQLite has no online build; the statement holds the
+    write lock for the duration, which is short at this table size.
+    """
+    concurrently = " CONCURRENTLY" if conn.dialect.name == "postgresql" else ""
+    conn.exec_driver_sql(
+        f"CREATE {'UNIQUE ' if unique else ''}INDEX{concurrently} IF NOT EXISTS {_quote(conn, name)} "
+        f"ON {_quote(conn, table)} ({', '.join(_quote(conn, column) for column in columns)})"
+    )
+
+
+def drop_index(conn: Connection, name: str):
+    """Counterpart of create_index, with the same transaction requirements"""
+    concurrently = " CONCURRENTLY" if conn.dialect.name == "postgresql" else ""
+    conn.exec_driver_sql(f"DROP INDEX{concurrently} IF EXISTS {_quote(conn, name)}")
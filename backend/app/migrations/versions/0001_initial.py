@@ -0,0 +1,82 @@
+"""Baseline store schema: users, products, carts, orders, favorites and reviews"""
+from datetime import datetime
+
+from sqlalchemy import (
+    Boolean, Column, DateTime, ForeignKey, Integer, MetaData, Numeric, String, Table, Text
+)
+from sqlalchemy.engine import Connection
+
+# Frozen copy of the models as they were at this version; later changes get their own migration
+metadata = MetaData()
+
+Table(
+    "User", metadata,
+    Column("user_id", Integer, primary_key=True, index=True),
+    Column("user_name", String(50), nullable=False, unique=True, index=True),
+    Column("password", String(255), nullable=False),
+    Column("email", String(100), nullable=False, unique=True),
+    Column("tel", String(20), nullable=False),
+    Column("is_member", Boolean, default=False),
+    Column("is_admin", Boolean, default=False),
+)
+
+Table(
+    "Product", metadata,
+    Column("product_id", Integer, primary_key=True, index=True),
+    Column("product_name", String(100), nullable=False),
+    Column("price", Numeric(10, 2), nullable=False),
+    Column("type", String(50), nullable=False),
+    Column("description", Text, nullable=False),
+    Column("stock_quantity", Integer, default=0),
+)
+
+Table(
+    "ShoppingCart", metadata,
+    Column("cart_id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, ForeignKey("User.user_id"), nullable=False),
+)
+
+Table(
+    "CartItem", metadata,
+    Column("cart_id", Integer, ForeignKey("ShoppingCart.cart_id"), primary_key=True),
+    Column("product_id", Integer, ForeignKey("Product.product_id"), primary_key=True),
+    Column("quantity", Integer, nullable=False, default=1),
+)
+
+Table(
+    "Order", metadata,
+    Column("order_id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, ForeignKey("User.user_id"), nullable=False),
+    Column("total_amount", Numeric(10, 2), nullable=False),
+    Column("recipient", String(100), nullable=False),
+    Column("shipping_address", Text, nullable=False),
+    Column("status", String(50), nullable=False, default="pending"),
+    Column("created_at", DateTime, default=datetime.utcnow),
+)
+
+Table(
+    "OrderItem", metadata,
+    Column("order_id", Integer, ForeignKey("Order.order_id"), primary_key=True),
+    Column("product_id", Integer, ForeignKey("Product.product_id"), primary_key=True),
+    Column("quantity", Integer, nullable=False),
+    Column("price", Numeric(10, 2), nullable=False),
+)
+
+Table(
+    "Favorite", metadata,
+    Column("user_id", Integer, ForeignKey("User.user_id"), primary_key=True),
+    Column("product_id", Integer, ForeignKey("Product.product_id"), primary_key=True),
+)
+
+Table(
+    "Review", metadata,
+    Column("user_id", Integer, ForeignKey("User.user_id"), primary_key=True),
+    Column("product_id", Integer, ForeignKey("Product.product_id"), primary_key=True),
+    Column("content", Text, nullable=False),
+    Column("rating", Numeric(2, 1), nullable=False),
+)
+
+
+def upgrade(conn: Connection):
+    # checkfirst adopts databases created by the old create_all call without touching them
+    metadata.create_all(conn, checkfirst=True)
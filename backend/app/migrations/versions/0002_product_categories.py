@@ -0,0 +1,17 @@
+"""Per-type product counts for category navigation"""
+from sqlalchemy import Column, Integer, MetaData, String, Table
+from sqlalchemy.engine import Connection
+
+metadata = MetaData()
+
+Table(
+    "ProductCategory", metadata,
+    Column("type", String(50), primary_key=True),
+    Column("product_count", Integer, nullable=False, default=0),
+    Column("in_stock_count", Integer, nullable=False, default=0),
+)
+
+
+def upgrade(conn: Connection):
+    # Rows are filled in by sync_categories when the app starts
+    metadata.create_all(conn, checkfirst=True)
@@ -0,0 +1,25 @@
+"""Secondary indexes for the order, cart, product, review and favorite query shapes"""
+from sqlalchemy.engine import Connection
+
+from app.migrations.operations import create_index
+
+# Built concurrently on PostgreSQL, which cannot happen inside a transaction
+transactional = False
+
+INDEXES = [
+    ("ix_Order_user_id_status_created_at", "Order", ["user_id", "status", "created_at"]),
+    ("ix_Order_user_id_created_at", "Order", ["user_id", "created_at"]),
+    ("ix_Order_status_created_at", "Order", ["status", "created_at"]),
+    ("ix_Order_created_at_order_id", "Order", ["created_at", "order_id"]),
+    ("ix_OrderItem_product_id", "OrderItem", ["product_id"]),
+    ("ix_ShoppingCart_user_id", "ShoppingCart", ["user_id"]),
+    ("ix_Product_type_price", "Product", ["type", "price"]),
+    ("ix_Product_price", "Product", ["price"]),
+    ("ix_Review_product_id", "Review", ["product_id"]),
+    ("ix_Favorite_product_id", "Favorite", ["product_id"]),
+]
+
+
+def upgrade(conn: Connection):
+    for name, table, columns in INDEXES:
+        create_index(conn, name, table, columns)
@@ -0,0 +1,34 @@
+"""Per-user completed order summary used by the membership check"""
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, MetaData, String, Table, func, insert, select
+from sqlalchemy.engine import Connection
+
+metadata = MetaData()
+
+# Only the columns this migration reads or references
+Table("User", metadata, Column("user_id", Integer, primary_key=True))
+
+order = Table(
+    "Order", metadata,
+    Column("order_id", Integer, primary_key=True),
+    Column("user_id", Integer),
+    Column("status", String(50)),
+    Column("created_at", DateTime),
+)
+
+user_order_stats = Table(
+    "UserOrderStats", metadata,
+    Column("user_id", Integer, ForeignKey("User.user_id"), primary_key=True),
+    Column("completed_count", Integer, nullable=False, default=0),
+    Column("last_completed_at", DateTime, nullable=True),
+)
+
+
+def upgrade(conn: Connection):
+    user_order_stats.create(conn, checkfirst=True)
+    conn.execute(user_order_stats.delete())
+    conn.execute(insert(user_order_stats).from_select(
+        ["user_id", "completed_count", "last_completed_at"],
+        select(order.c.user_id, func.count(), func.max(order.c.created_at))
+        .where(order.c.status == "completed")
+        .group_by(order.c.user_id)
+    ))
@@ -0,0 +1,22 @@
+"""Give every existing user a shopping cart, now that carts are created at registration"""
+from sqlalchemy import Column, ForeignKey, Integer, MetaData, Table, insert, select
+from sqlalchemy.engine import Connection
+
+metadata = MetaData()
+
+user = Table("User", metadata, Column("user_id", Integer, primary_key=True))
+
+shopping_cart = Table(
+    "ShoppingCart", metadata,
+    Column("cart_id", Integer, primary_key=True),
+    Column("user_id", Integer, ForeignKey("User.user_id"), nullable=False),
+)
+
+
+def upgrade(conn: Connection):
+    conn.execute(insert(shopping_cart).from_select(
+        ["user_id"],
+        select(user.c.user_id).where(
+            ~select(shopping_cart.c.cart_id).where(shopping_cart.c.user_id == user.c.user_id).exists()
+        )
+    ))
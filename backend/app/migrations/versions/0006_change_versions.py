@@ -0,0 +1,17 @@
+"""Change counters behind the catalog ETags"""
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table
+from sqlalchemy.engine import Connection
+
+metadata = MetaData()
+
+Table(
+    "ChangeVersion", metadata,
+    Column("scope", String(100), primary_key=True),
+    Column("version", Integer, nullable=False, default=0),
+    Column("updated_at", DateTime, nullable=False),
+)
+
+
+def upgrade(conn: Connection):
+    # Scopes without a row read as version 0 until their first write
+    metadata.create_all(conn, checkfirst=True)
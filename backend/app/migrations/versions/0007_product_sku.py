@@ -0,0 +1,15 @@
+"""Product.sku, the natural key catalog imports upsert on"""
+from sqlalchemy import inspect
+from sqlalchemy.engine import Connection
+
+from app.migrations.operations import create_index
+
+# The unique index is built concurrently on PostgreSQL, which cannot happen inside a transaction
+transactional = False
+
+
+def upgrade(conn: Connection):
+    # Checked by hand so a rerun after a failed index build does not trip over the column
+    if "sku" not in {column["name"] for column in inspect(conn).get_columns("Product")}:
+        conn.exec_driver_sql('ALTER TABLE "Product" ADD COLUMN sku VARCHAR(64)')
+    create_index(conn, "ix_Product_sku", "Product", ["sku"], unique=True)
@@ -0,0 +1,15 @@
+"""
+UserOrderStats.completed_count becomes lifetime_completed_count
+
+The count was always all-time, never the rolling 180-day window the name suggested.
+"""
+from sqlalchemy import inspect
+from sqlalchemy.engine import Connection
+
+
+def upgrade(conn: Connection):
+    columns = {column["name"] for column in inspect(conn).get_columns("UserOrderStats")}
+    if "completed_count" in columns:
+        conn.exec_driver_sql(
+            'ALTER TABLE "UserOrderStats" RENAME COLUMN completed_count TO lifetime_completed_count'
+        )
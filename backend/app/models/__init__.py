@@ -1,12 +1,13 @@
 
 from .user import User
-from .product import Product
+from .product import Product, ProductCategory
 from .cart import ShoppingCart, CartItem
-from .order import Order, OrderItem
+from .order import Order, OrderItem, UserOrderStats
 from .favorite import Favorite
 from .review import Review
+from .change_version import ChangeVersion
 
 __all__ = [
-    "User", "Product", "ShoppingCart", "CartItem",
-    "Order", "OrderItem", "Favorite", "Review"
+    "User", "Product", "ProductCategory", "ShoppingCart", "CartItem",
+    "Order", "OrderItem", "UserOrderStats", "Favorite", "Review", "ChangeVersion"
 ]
@@ -6,7 +6,7 @@ class ShoppingCart(Base):
     __tablename__ = "ShoppingCart"
 
     cart_id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("User.user_id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("User.user_id"), nullable=False, index=True)
 
 
     user = relationship("User", back_populates="carts")
@@ -0,0 +1,18 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, String
+from app.database import Base
+
+
+class ChangeVersion(Base):
+    """
+    Change counter per cached scope (the product list, one product, one product's reviews...).
+
+    Writers bump it in their own transaction; readers turn it into ETag / Last-Modified
+    validators, see app.utils.conditional_utils.
+    """
+    __tablename__ = "ChangeVersion"
+
+    scope = Column(String(100), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
@@ -1,9 +1,13 @@
-from sqlalchemy import Column, Integer, ForeignKey
+from sqlalchemy import Column, Integer, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 
 class Favorite(Base):
     __tablename__ = "Favorite"
+    # the primary key leads with user_id, so per-product lookups need their own index
+    __table_args__ = (
+        Index("ix_Favorite_product_id", "product_id"),
+    )
 
     user_id = Column(Integer, ForeignKey("User.user_id"), primary_key=True)
     product_id = Column(Integer, ForeignKey("Product.product_id"), primary_key=True)
@@ -1,10 +1,20 @@
-from sqlalchemy import Column, Integer, String, Text, Numeric, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Text, Numeric, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 from datetime import datetime
 
 class Order(Base):
     __tablename__ = "Order"
+    __table_args__ = (
+        # member status and purchase checks: user_id + status, newest first
+        Index("ix_Order_user_id_status_created_at", "user_id", "status", "created_at"),
+        # a user's order history, ordered by created_at
+        Index("ix_Order_user_id_created_at", "user_id", "created_at"),
+        # admin status filter and the auto-complete sweep
+        Index("ix_Order_status_created_at", "status", "created_at"),
+        # admin order listing (created_at desc, order_id desc)
+        Index("ix_Order_created_at_order_id", "created_at", "order_id"),
+    )
 
     order_id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("User.user_id"), nullable=False)
@@ -20,6 +30,9 @@ class Order(Base):
 
 class OrderItem(Base):
     __tablename__ = "OrderItem"
+    __table_args__ = (
+        Index("ix_OrderItem_product_id", "product_id"),
+    )
 
     order_id = Column(Integer, ForeignKey("Order.order_id"), primary_key=True)
     product_id = Column(Integer, ForeignKey("Product.product_id"), primary_key=True)
@@ -29,3 +42,15 @@ class OrderItem(Base):
 
     order = relationship("Order", back_populates="order_items")
     product = relationship("Product", back_populates="order_items")
+
+
+class UserOrderStats(Base):
+    """Completed-order summary per user, maintained on order status changes by app.utils.order_stats_utils"""
+    __tablename__ = "UserOrderStats"
+
+    user_id = Column(Integer, ForeignKey("User.user_id"), primary_key=True)
+    # All-time total, not windowed: membership only needs last_completed_at, and a rolling
+    # 180-day count would need a job aging orders out of it every day
+    lifetime_completed_count = Column(Integer, nullable=False, default=0)
+    # created_at of the newest completed order, which is what the membership window is measured on
+    last_completed_at = Column(DateTime, nullable=True)
@@ -1,9 +1,16 @@
-from sqlalchemy import Column, Integer, String, Text, Numeric
+from sqlalchemy import Column, Integer, String, Text, Numeric, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 
 class Product(Base):
     __tablename__ = "Product"
+    __table_args__ = (
+        # type filter, optionally sorted or ranged by price
+        Index("ix_Product_type_price", "type", "price"),
+        Index("ix_Product_price", "price"),
+        # Natural key for catalog imports; NULL for products created one by one
+        Index("ix_Product_sku", "sku", unique=True),
+    )
 
     product_id = Column(Integer, primary_key=True, index=True)
     product_name = Column(String(100), nullable=False)
@@ -11,9 +18,19 @@ class Product(Base):
     type = Column(String(50), nullable=False)
     description = Column(Text, nullable=False)
     stock_quantity = Column(Integer, default=0)
+    sku = Column(String(64), nullable=True)
 
 
     cart_items = relationship("CartItem", back_populates="product")
     order_items = relationship("OrderItem", back_populates="product")
     favorites = relationship("Favorite", back_populates="product")
     reviews = relationship("Review", back_populates="product")
+
+
+class ProductCategory(Base):
+    """Per-type product counts, kept in step with Product by app.utils.category_utils"""
+    __tablename__ = "ProductCategory"
+
+    type = Column(String(50), primary_key=True)
+    product_count = Column(Integer, nullable=False, default=0)
+    in_stock_count = Column(Integer, nullable=False, default=0)
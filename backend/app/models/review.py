@@ -1,9 +1,13 @@
-from sqlalchemy import Column, Integer, Text, Numeric, ForeignKey
+from sqlalchemy import Column, Integer, Text, Numeric, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 
 class Review(Base):
     __tablename__ = "Review"
+    # the primary key leads with user_id, so per-product lookups need their own index
+    __table_args__ = (
+        Index("ix_Review_product_id", "product_id"),
+    )
 
     user_id = Column(Integer, ForeignKey("User.user_id"), primary_key=True)
     product_id = Column(Integer, ForeignKey("Product.product_id"), primary_key=True)
@@ -0,0 +1,35 @@
+"""
+Pytest fixtures for holding endpoints to a query budget.
+
+Load with ``pytest -p app.pytest_plugin`` or ``pytest_plugins = ["app.pytest_plugin"]`` in a
+conftest, then wrap the request under test:
+
+    async def test_order_list(client, query_budget):
+        with query_budget(max_queries=4):
+            await client.get("/api/orders/user/1")
+
+The app has to run in the test's own context, e.g. httpx.AsyncClient with ASGITransport,
+so the statements it runs reach the recorder.
+"""
+from contextlib import contextmanager
+from typing import Optional
+
+import pytest
+
+from app.database import engine, async_engine
+from app.utils.nplusone_utils import QUERY_DETECTOR_THRESHOLD, check_query_budget, install_query_detector, record_queries
+
+
+@pytest.fixture
+def query_budget():
+    """Context manager factory failing the test with a call-site report when the block goes over budget"""
+    install_query_detector(engine)
+    install_query_detector(async_engine.sync_engine)
+
+    @contextmanager
+    def budget(max_queries: Optional[int] = None, allow_repeats: bool = False, threshold: int = QUERY_DETECTOR_THRESHOLD):
+        with record_queries(threshold) as recorder:
+            yield recorder
+        check_query_budget(recorder, max_queries, allow_repeats)
+
+    return budget
@@ -1,16 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 from app.database import get_db
-from app.models import User
+from app.models import User, ShoppingCart
 from app.schemas import Token, UserLogin
-from app.utils import verify_password, create_access_token, get_password_hash, update_member_status
+from app.utils import (
+    verify_password_async, create_access_token, get_password_hash_async, update_member_status,
+    PasswordHasherBusy, TRUST_TOKEN_CLAIMS
+)
+from app.utils.log_utils import get_logger
 from app.dependencies import get_current_user
 from pydantic import BaseModel, EmailStr
 from typing import Optional
 import re
 
 router = APIRouter(tags=["Authentication"])
+logger = get_logger("app.auth")
 
 class RegisterRequest(BaseModel):
     username: str
@@ -52,15 +58,27 @@ def validate_tel(tel: str):
         )
     return tel
 
+def password_pool_busy():
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many sign-in requests, please retry shortly.",
+        headers={"Retry-After": "1"}
+    )
+
 @router.post("/login", response_model=Token)
 async def login(
     login_data: LoginRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
 
-    user = db.query(User).filter(User.user_name == login_data.username).first()
+    user = await db.scalar(select(User).where(User.user_name == login_data.username))
+
+    try:
+        password_ok = user is not None and await verify_password_async(login_data.password, user.password)
+    except PasswordHasherBusy:
+        raise password_pool_busy()
 
-    if not user or not verify_password(login_data.password, user.password):
+    if not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password.",
@@ -87,8 +105,7 @@ async def login(
 @router.post("/register")
 async def register(
     register_data: RegisterRequest,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
 
     validate_username(register_data.username)
@@ -97,10 +114,10 @@ async def register(
         validate_tel(register_data.tel)
 
 
-    existing_user = db.query(User).filter(
+    existing_user = await db.scalar(select(User).where(
         (User.user_name == register_data.username) |
         (User.email == register_data.email)
-    ).first()
+    ))
 
     if existing_user:
         raise HTTPException(
@@ -108,9 +125,13 @@ async def register(
             detail="Username or email has already been registered."
         )
 
+    try:
+        hashed_password = await get_password_hash_async(register_data.password)
+    except PasswordHasherBusy:
+        raise password_pool_busy()
+
     try:
 
-        hashed_password = get_password_hash(register_data.password)
         new_user = User(
             user_name=register_data.username,
             password=hashed_password,
@@ -121,11 +142,10 @@ async def register(
         )
 
         db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
-
- 
-        background_tasks.add_task(initialize_user_data, db, new_user.user_id)
+        # Created with the user so cart reads and writes never have to create one
+        db.add(ShoppingCart(user=new_user))
+        await db.commit()
+        await db.refresh(new_user)
 
         return {
             "message": "User registration successful.",
@@ -133,30 +153,24 @@ async def register(
             "username": new_user.user_name
         }
 
-    except Exception as e:
-        db.rollback()
+    except Exception:
+        await db.rollback()
+        logger.exception("Registration failed for %s", register_data.username)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="An error occurred during the registration process."
         )
 
-def initialize_user_data(db: Session, user_id: int):
-
-    try:
-        from app.models import ShoppingCart
-
-        cart = ShoppingCart(user_id=user_id)
-        db.add(cart)
-        db.commit()
-    except Exception as e:
-        db.rollback()
-        print(f"Failed to initialize user data: {e}")
-
 @router.get("/me")
 async def get_current_user_info(
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
 
+    if TRUST_TOKEN_CLAIMS:
+        # Claims-only principals carry no profile fields; this endpoint needs them
+        current_user = await db.scalar(select(User).where(User.user_id == current_user.user_id)) or current_user
+
     return {
         "user_id": current_user.user_id,
         "user_name": current_user.user_name,
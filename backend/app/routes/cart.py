@@ -1,14 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload
-from pydantic import BaseModel
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select, delete, update, func, join, literal
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional, Tuple
+import os
 from app.database import get_db
 from app.models import ShoppingCart, CartItem, Product, User
 from app.dependencies import get_current_user, validate_positive_quantity, get_current_admin
 from app.schemas import CartItem as CartItemSchema
+from app.utils.common import dialect_insert
 
 router = APIRouter(tags=["Shopping Cart"])
 
+# Upper bound on operations accepted by one PATCH /items call
+CART_BATCH_MAX_OPERATIONS = int(os.getenv("CART_BATCH_MAX_OPERATIONS", "100"))
+
 
 class AddToCartRequest(BaseModel):
     productId: int
@@ -32,58 +38,106 @@ class CartResponse(BaseModel):
     items_count: int
 
 
+class CartItemOperation(BaseModel):
+    op: Literal["add", "set", "remove"]
+    productId: int
+    quantity: int = 0
+
+
+class CartItemsPatchRequest(BaseModel):
+    operations: List[CartItemOperation] = Field(min_length=1, max_length=CART_BATCH_MAX_OPERATIONS)
+
+
+class CartItemOperationResult(BaseModel):
+    op: str
+    productId: int
+    success: bool
+    quantity: int
+    detail: Optional[str] = None
+
+
+def user_cart_id(user_id: int):
+    """Scalar subquery for the user's cart, so statements can resolve it without a separate lookup"""
+    return (
+        select(ShoppingCart.cart_id)
+        .where(ShoppingCart.user_id == user_id)
+        .order_by(ShoppingCart.cart_id)
+        .limit(1)
+        .scalar_subquery()
+    )
+
+
+async def cart_write_error(db: AsyncSession, user_id: int, product_id: int, quantity: int, adding: bool) -> HTTPException:
+    """Work out why a guarded cart write matched no row; only runs on the failure path"""
+    row = (await db.execute(
+        select(ShoppingCart.cart_id, Product.product_id, Product.stock_quantity, CartItem.quantity)
+        .select_from(ShoppingCart)
+        .outerjoin(Product, Product.product_id == product_id)
+        .outerjoin(CartItem, (CartItem.cart_id == ShoppingCart.cart_id) & (CartItem.product_id == product_id))
+        .where(ShoppingCart.cart_id == user_cart_id(user_id))
+    )).first()
+
+    if row is None:
+        return HTTPException(status_code=404, detail="Shopping cart does not exist.")
+    if not adding and row.quantity is None:
+        return HTTPException(status_code=404, detail="Product not found in the shopping cart.")
+    if row.product_id is None:
+        return HTTPException(status_code=404, detail="Product does not exist.")
+    if adding and row.quantity is not None and row.stock_quantity >= quantity:
+        return HTTPException(status_code=400, detail=f"Exceeds stock limit. Current stock: {row.stock_quantity}")
+    return HTTPException(status_code=400, detail=f"Insufficient stock. Current stock: {row.stock_quantity}")
+
+
 @router.get("/{user_id}", response_model=CartResponse)
 async def get_cart(
         user_id: int,
         current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
 ):
 
     if current_user.user_id != user_id:
         raise HTTPException(status_code=403, detail="Unauthorized to access this shopping cart.")
 
- 
-    cart = db.query(ShoppingCart).options(
-        joinedload(ShoppingCart.cart_items).joinedload(CartItem.product)
-    ).filter(ShoppingCart.user_id == user_id).first()
+    # Items whose product is gone drop out of the inner join and so out of the totals
+    subtotal = Product.price * CartItem.quantity
+    rows = (await db.execute(
+        select(
+            ShoppingCart.cart_id,
+            Product.product_id,
+            Product.product_name,
+            Product.price,
+            CartItem.quantity,
+            subtotal.label("subtotal"),
+            func.sum(subtotal).over().label("total"),
+            func.sum(CartItem.quantity).over().label("items_count")
+        )
+        .select_from(ShoppingCart)
+        .outerjoin(
+            join(CartItem, Product, CartItem.product_id == Product.product_id),
+            CartItem.cart_id == ShoppingCart.cart_id
+        )
+        .where(ShoppingCart.cart_id == user_cart_id(user_id))
+    )).all()
 
-    if not cart:
-        cart = ShoppingCart(user_id=user_id)
-        db.add(cart)
-        db.commit()
-        db.refresh(cart)
-
-        cart = db.query(ShoppingCart).options(
-            joinedload(ShoppingCart.cart_items).joinedload(CartItem.product)
-        ).filter(ShoppingCart.user_id == user_id).first()
-
-    items_with_details = []
-    total = 0
-    items_count = 0
-
-    for item in cart.cart_items:
-        product = item.product
-        if not product:
-            continue  
-
-        subtotal = float(product.price * item.quantity)
-        total += subtotal
-        items_count += item.quantity
-
-        items_with_details.append(CartItemResponse(
-            product_id=item.product_id,
-            product_name=product.product_name,
-            price=float(product.price),
-            quantity=item.quantity,
-            subtotal=subtotal
-        ))
+    if not rows:
+        raise HTTPException(status_code=404, detail="Shopping cart does not exist.")
 
+    first = rows[0]
     return CartResponse(
-        cart_id=cart.cart_id,
-        user_id=cart.user_id,
-        items=items_with_details,
-        total=total,
-        items_count=items_count
+        cart_id=first.cart_id,
+        user_id=user_id,
+        items=[
+            CartItemResponse(
+                product_id=row.product_id,
+                product_name=row.product_name,
+                price=float(row.price),
+                quantity=row.quantity,
+                subtotal=float(row.subtotal)
+            )
+            for row in rows if row.product_id is not None
+        ],
+        total=float(first.total or 0),
+        items_count=first.items_count or 0
     )
 
 
@@ -92,7 +146,7 @@ async def add_to_cart(
         user_id: int,
         request: AddToCartRequest,
         current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
 ):
 
     if current_user.user_id != user_id:
@@ -101,61 +155,39 @@ async def add_to_cart(
 
     validate_positive_quantity(request.quantity)
 
-
-    cart = db.query(ShoppingCart).filter(ShoppingCart.user_id == user_id).first()
-    if not cart:
-        cart = ShoppingCart(user_id=user_id)
-        db.add(cart)
-        db.commit()
-        db.refresh(cart)
-
-
-    product = db.query(Product).filter(Product.product_id == request.productId).first()
-    if not product:
-        raise HTTPException(status_code=404, detail="Product does not exist.")
-
-
-    if product.stock_quantity < request.quantity:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Insufficient stock. Current stock: {product.stock_quantity}"
+    # One statement: insert the item or add to its quantity, as long as stock covers the result
+    cart_id = user_cart_id(user_id)
+    stock = select(Product.stock_quantity).where(Product.product_id == request.productId).scalar_subquery()
+    statement = dialect_insert(db)(CartItem).from_select(
+        ["cart_id", "product_id", "quantity"],
+        select(cart_id, Product.product_id, literal(request.quantity))
+        .where(
+            cart_id.isnot(None),
+            Product.product_id == request.productId,
+            Product.stock_quantity >= request.quantity
         )
-
-
-    existing_item = db.query(CartItem).filter(
-        CartItem.cart_id == cart.cart_id,
-        CartItem.product_id == request.productId
-    ).first()
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[CartItem.cart_id, CartItem.product_id],
+        set_={"quantity": CartItem.quantity + statement.excluded.quantity},
+        where=CartItem.quantity + statement.excluded.quantity <= stock
+    ).returning(CartItem.quantity)
 
     try:
-        if existing_item:
-
-            new_quantity = existing_item.quantity + request.quantity
-            if product.stock_quantity < new_quantity:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Exceeds stock limit. Current stock: {product.stock_quantity}"
-                )
-            existing_item.quantity = new_quantity
-        else:
-            new_item = CartItem(
-                cart_id=cart.cart_id,
-                product_id=request.productId,
-                quantity=request.quantity
-            )
-            db.add(new_item)
+        if (await db.execute(statement)).first() is None:
+            raise await cart_write_error(db, user_id, request.productId, request.quantity, adding=True)
 
-        db.commit()
+        await db.commit()
         return {
             "success": True,
             "message": "Product has been added to the shopping cart."
         }
 
     except HTTPException:
-        db.rollback()
+        await db.rollback()
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Failed to add item to the shopping cart.")
 
 
@@ -164,41 +196,27 @@ async def update_cart_item(
         user_id: int,
         request: AddToCartRequest,
         current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
 ):
 
     if current_user.user_id != user_id:
         raise HTTPException(status_code=403, detail="Unauthorized to operate on this shopping cart.")
 
-    cart = db.query(ShoppingCart).filter(ShoppingCart.user_id == user_id).first()
-    if not cart:
-        raise HTTPException(status_code=404, detail="Shopping cart does not exist.")
-
-    cart_item = db.query(CartItem).filter(
-        CartItem.cart_id == cart.cart_id,
-        CartItem.product_id == request.productId
-    ).first()
-
-    if not cart_item:
-        raise HTTPException(status_code=404, detail="Product not found in the shopping cart.")
-
-
-    product = db.query(Product).filter(Product.product_id == request.productId).first()
-    if not product:
-        raise HTTPException(status_code=404, detail="Product does not exist.")
-
+    in_cart = (CartItem.cart_id == user_cart_id(user_id), CartItem.product_id == request.productId)
     if request.quantity <= 0:
-
-        db.delete(cart_item)
+        statement = delete(CartItem).where(*in_cart)
     else:
-        if product.stock_quantity < request.quantity:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Insufficient stock. Current stock: {product.stock_quantity}"
-            )
-        cart_item.quantity = request.quantity
+        statement = update(CartItem).where(
+            *in_cart,
+            select(Product.stock_quantity).where(Product.product_id == request.productId).scalar_subquery()
+            >= request.quantity
+        ).values(quantity=request.quantity)
+
+    if (await db.execute(statement)).rowcount == 0:
+        await db.rollback()
+        raise await cart_write_error(db, user_id, request.productId, request.quantity, adding=False)
 
-    db.commit()
+    await db.commit()
     return {
         "success": True,
         "message": "Shopping cart has been updated."
@@ -210,26 +228,22 @@ async def remove_from_cart(
         user_id: int,
         product_id: int,
         current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
 ):
 
     if current_user.user_id != user_id:
         raise HTTPException(status_code=403, detail="Unauthorized to operate on this shopping cart.")
 
-    cart = db.query(ShoppingCart).filter(ShoppingCart.user_id == user_id).first()
-    if not cart:
-        raise HTTPException(status_code=404, detail="Shopping cart does not exist.")
-
-    cart_item = db.query(CartItem).filter(
-        CartItem.cart_id == cart.cart_id,
+    result = await db.execute(delete(CartItem).where(
+        CartItem.cart_id == user_cart_id(user_id),
         CartItem.product_id == product_id
-    ).first()
+    ))
 
-    if not cart_item:
+    if result.rowcount == 0:
+        await db.rollback()
         raise HTTPException(status_code=404, detail="Product not found in the shopping cart.")
 
-    db.delete(cart_item)
-    db.commit()
+    await db.commit()
 
     return {
         "success": True,
@@ -241,45 +255,138 @@ async def remove_from_cart(
 async def clear_cart(
         user_id: int,
         current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
 ):
     """Clear shopping cart"""
     if current_user.user_id != user_id:
         raise HTTPException(status_code=403, detail="Unauthorized to operate on this shopping cart")
 
-    cart = db.query(ShoppingCart).filter(ShoppingCart.user_id == user_id).first()
-    if not cart:
-        raise HTTPException(status_code=404, detail="Shopping cart does not exist.")
-
     try:
-        db.query(CartItem).filter(CartItem.cart_id == cart.cart_id).delete()
-        db.commit()
+        await db.execute(delete(CartItem).where(CartItem.cart_id == user_cart_id(user_id)))
+        await db.commit()
 
         return {
             "success": True,
             "message": "Shopping cart has been cleared"
         }
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Failed to clear shopping cart")
 
+def apply_cart_operation(operation: CartItemOperation, quantity: Optional[int], stock: Optional[int]) -> Tuple[Optional[int], Optional[str]]:
+    """Return the item's quantity after one operation (None when not in the cart) and an error, if any"""
+    if operation.op == "remove":
+        if quantity is None:
+            return quantity, "Product not found in the shopping cart."
+        return None, None
+
+    if operation.op == "set" and operation.quantity <= 0:
+        return None, None
+    if operation.op == "add" and operation.quantity <= 0:
+        return quantity, "Quantity must be greater than 0"
+    if stock is None:
+        return quantity, "Product does not exist."
+
+    new_quantity = operation.quantity + (quantity or 0) if operation.op == "add" else operation.quantity
+    if stock < new_quantity:
+        if operation.op == "add" and quantity and stock >= operation.quantity:
+            return quantity, f"Exceeds stock limit. Current stock: {stock}"
+        return quantity, f"Insufficient stock. Current stock: {stock}"
+    return new_quantity, None
+
+
+@router.patch("/{user_id}/items")
+async def patch_cart_items(
+        user_id: int,
+        request: CartItemsPatchRequest,
+        atomic: bool = Query(False, description="Apply nothing if any operation fails"),
+        current_user: User = Depends(get_current_user),
+        db: AsyncSession = Depends(get_db)
+):
+    """Apply add/set/remove operations to several cart items in one transaction"""
+    if current_user.user_id != user_id:
+        raise HTTPException(status_code=403, detail="Unauthorized to operate on this shopping cart.")
+
+    product_ids = {operation.productId for operation in request.operations}
+    cart_id = user_cart_id(user_id)
+    # Stock and current quantity for every product named in the batch, in one query
+    rows = (await db.execute(
+        select(cart_id.label("cart_id"), Product.product_id, Product.stock_quantity, CartItem.quantity)
+        .select_from(Product)
+        .outerjoin(CartItem, (CartItem.product_id == Product.product_id) & (CartItem.cart_id == cart_id))
+        .where(Product.product_id.in_(product_ids))
+    )).all()
+    stock = {row.product_id: row.stock_quantity for row in rows}
+    quantities = {row.product_id: row.quantity for row in rows if row.quantity is not None}
+    if rows and rows[0].cart_id is None:
+        raise HTTPException(status_code=404, detail="Shopping cart does not exist.")
+
+    # Operations apply in order, so a later one sees the quantity left by an earlier one
+    results = []
+    for operation in request.operations:
+        quantity, error = apply_cart_operation(operation, quantities.get(operation.productId), stock.get(operation.productId))
+        if error is None:
+            if quantity is None:
+                quantities.pop(operation.productId, None)
+            else:
+                quantities[operation.productId] = quantity
+        results.append(CartItemOperationResult(
+            op=operation.op,
+            productId=operation.productId,
+            success=error is None,
+            quantity=quantity or 0,
+            detail=error
+        ))
+
+    failed = sum(not result.success for result in results)
+    if atomic and failed:
+        raise HTTPException(status_code=400, detail=[result.model_dump() for result in results])
+
+    changed = {result.productId for result in results if result.success}
+    kept = [
+        {"cart_id": rows[0].cart_id, "product_id": product_id, "quantity": quantities[product_id]}
+        for product_id in changed if product_id in quantities
+    ]
+    removed = [product_id for product_id in changed if product_id not in quantities]
+
+    try:
+        if kept:
+            statement = dialect_insert(db)(CartItem).values(kept)
+            await db.execute(statement.on_conflict_do_update(
+                index_elements=[CartItem.cart_id, CartItem.product_id],
+                set_={"quantity": statement.excluded.quantity}
+            ))
+        if removed:
+            await db.execute(delete(CartItem).where(CartItem.cart_id == cart_id, CartItem.product_id.in_(removed)))
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="Failed to update the shopping cart.")
+
+    return {
+        "success": failed == 0,
+        "applied": len(results) - failed,
+        "failed": failed,
+        "results": results
+    }
+
 @router.get("/admin/all")
 async def get_all_carts(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     admin: User = Depends(get_current_admin)
 ):
     """Get all shopping carts (admin only)"""
-    carts = db.query(ShoppingCart).all()
+    carts = (await db.scalars(select(ShoppingCart))).all()
     return carts
 
 @router.get("/admin/user/{user_id}")
 async def get_user_cart_admin(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     admin: User = Depends(get_current_admin)
 ):
     """Get specific user's shopping cart (admin only)"""
-    cart = db.query(ShoppingCart).filter(ShoppingCart.user_id == user_id).first()
+    cart = await db.scalar(select(ShoppingCart).where(ShoppingCart.user_id == user_id))
     if not cart:
         raise HTTPException(status_code=404, detail="User shopping cart does not exist")
     return cart
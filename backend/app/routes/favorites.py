@@ -1,11 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
 from app.models import Favorite, User, Product
 from app.schemas import FavoriteResponse, FavoriteOperationResponse
 from app.dependencies import get_current_user, get_current_admin
+from app.utils import apply_keyset, keyset_page
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 
 router = APIRouter(tags=["Favorites"])
 
@@ -29,24 +31,24 @@ async def check_favorite(
         user_id: int,
         product_id: int,
         current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
 ):
     """Check favorite status"""
     if current_user.user_id != user_id:
         raise HTTPException(status_code=403, detail="Unauthorized to view this user's favorites")
 
-    user = db.query(User).filter(User.user_id == user_id).first()
+    user = await db.scalar(select(User).where(User.user_id == user_id))
     if not user:
         raise HTTPException(status_code=404, detail="User does not exist")
 
-    product = db.query(Product).filter(Product.product_id == product_id).first()
+    product = await db.scalar(select(Product).where(Product.product_id == product_id))
     if not product:
         raise HTTPException(status_code=404, detail="Product does not exist")
 
-    favorite = db.query(Favorite).filter(
+    favorite = await db.scalar(select(Favorite).where(
         Favorite.user_id == user_id,
         Favorite.product_id == product_id
-    ).first()
+    ))
 
     return FavoriteResponse(is_favorite=favorite is not None)
 
@@ -56,24 +58,24 @@ async def add_favorite(
         user_id: int,
         request: FavoriteRequest,
         current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
 ):
     """Add to favorites"""
     if current_user.user_id != user_id:
         raise HTTPException(status_code=403, detail="Unauthorized to operate on this user's favorites")
 
-    user = db.query(User).filter(User.user_id == user_id).first()
+    user = await db.scalar(select(User).where(User.user_id == user_id))
     if not user:
         raise HTTPException(status_code=404, detail="User does not exist")
 
-    product = db.query(Product).filter(Product.product_id == request.product_id).first()
+    product = await db.scalar(select(Product).where(Product.product_id == request.product_id))
     if not product:
         raise HTTPException(status_code=404, detail="Product does not exist")
 
-    existing_favorite = db.query(Favorite).filter(
+    existing_favorite = await db.scalar(select(Favorite).where(
         Favorite.user_id == user_id,
         Favorite.product_id == request.product_id
-    ).first()
+    ))
 
     if existing_favorite:
         raise HTTPException(status_code=400, detail="Product already in favorites")
@@ -81,8 +83,8 @@ async def add_favorite(
     try:
         favorite = Favorite(user_id=user_id, product_id=request.product_id)
         db.add(favorite)
-        db.commit()
-        db.refresh(favorite)
+        await db.commit()
+        await db.refresh(favorite)
 
         return FavoriteOperationResponse(
             success=True,
@@ -90,7 +92,7 @@ async def add_favorite(
         )
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Failed to add to favorites")
 
 
@@ -99,23 +101,23 @@ async def remove_favorite(
         user_id: int,
         product_id: int,
         current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
 ):
     """Remove from favorites"""
     if current_user.user_id != user_id:
         raise HTTPException(status_code=403, detail="Unauthorized to operate on this user's favorites")
 
-    favorite = db.query(Favorite).filter(
+    favorite = await db.scalar(select(Favorite).where(
         Favorite.user_id == user_id,
         Favorite.product_id == product_id
-    ).first()
+    ))
 
     if not favorite:
         raise HTTPException(status_code=404, detail="Favorite record does not exist")
 
     try:
-        db.delete(favorite)
-        db.commit()
+        await db.delete(favorite)
+        await db.commit()
 
         return FavoriteOperationResponse(
             success=True,
@@ -123,7 +125,7 @@ async def remove_favorite(
         )
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Failed to remove from favorites")
 
 
@@ -131,19 +133,19 @@ async def remove_favorite(
 async def get_user_favorites(
         user_id: int,
         current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
 ):
     """Get user's favorites list"""
     if current_user.user_id != user_id:
         raise HTTPException(status_code=403, detail="Unauthorized to view this user's favorites")
 
-    user = db.query(User).filter(User.user_id == user_id).first()
+    user = await db.scalar(select(User).where(User.user_id == user_id))
     if not user:
         raise HTTPException(status_code=404, detail="User does not exist")
 
-    favorites = db.query(Favorite, Product).join(
+    favorites = (await db.execute(select(Favorite, Product).join(
         Product, Favorite.product_id == Product.product_id
-    ).filter(Favorite.user_id == user_id).all()
+    ).where(Favorite.user_id == user_id))).all()
 
     favorite_products = []
     for favorite, product in favorites:
@@ -164,13 +166,15 @@ async def get_user_favorites(
 async def get_favorite_count(
         user_id: int,
         current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
 ):
     """Get user's favorites count"""
     if current_user.user_id != user_id:
         raise HTTPException(status_code=403, detail="Unauthorized to view this user's favorites")
 
-    count = db.query(Favorite).filter(Favorite.user_id == user_id).count()
+    count = await db.scalar(
+        select(func.count()).select_from(Favorite).where(Favorite.user_id == user_id)
+    )
 
     return {
         "user_id": user_id,
@@ -182,19 +186,19 @@ async def get_favorite_count(
 async def add_favorite_compatible(
         request: FavoriteRequest,
         current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
 ):
     """Add to favorites (compatible endpoint)"""
     user_id = current_user.user_id
 
-    product = db.query(Product).filter(Product.product_id == request.product_id).first()
+    product = await db.scalar(select(Product).where(Product.product_id == request.product_id))
     if not product:
         raise HTTPException(status_code=404, detail="Product does not exist")
 
-    existing_favorite = db.query(Favorite).filter(
+    existing_favorite = await db.scalar(select(Favorite).where(
         Favorite.user_id == user_id,
         Favorite.product_id == request.product_id
-    ).first()
+    ))
 
     if existing_favorite:
         raise HTTPException(status_code=400, detail="Product already in favorites")
@@ -202,8 +206,8 @@ async def add_favorite_compatible(
     try:
         favorite = Favorite(user_id=user_id, product_id=request.product_id)
         db.add(favorite)
-        db.commit()
-        db.refresh(favorite)
+        await db.commit()
+        await db.refresh(favorite)
 
         return FavoriteOperationResponse(
             success=True,
@@ -211,7 +215,7 @@ async def add_favorite_compatible(
         )
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Failed to add to favorites")
 
 
@@ -220,23 +224,23 @@ async def remove_favorite_compatible(
         user_id: int = Query(..., description="User ID"),
         product_id: int = Query(..., description="Product ID"),
         current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
 ):
     """Remove from favorites (compatible endpoint)"""
     if current_user.user_id != user_id:
         raise HTTPException(status_code=403, detail="Unauthorized to operate on this user's favorites")
 
-    favorite = db.query(Favorite).filter(
+    favorite = await db.scalar(select(Favorite).where(
         Favorite.user_id == user_id,
         Favorite.product_id == product_id
-    ).first()
+    ))
 
     if not favorite:
         raise HTTPException(status_code=404, detail="Favorite record does not exist")
 
     try:
-        db.delete(favorite)
-        db.commit()
+        await db.delete(favorite)
+        await db.commit()
 
         return FavoriteOperationResponse(
             success=True,
@@ -244,7 +248,7 @@ async def remove_favorite_compatible(
         )
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Failed to remove from favorites")
 
 
@@ -253,44 +257,52 @@ async def check_favorite_compatible(
         user_id: int = Query(..., description="User ID"),
         product_id: int = Query(..., description="Product ID"),
         current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
 ):
     """Check favorite status (compatible endpoint)"""
     if current_user.user_id != user_id:
         raise HTTPException(status_code=403, detail="Unauthorized to view this user's favorites")
 
-    user = db.query(User).filter(User.user_id == user_id).first()
+    user = await db.scalar(select(User).where(User.user_id == user_id))
     if not user:
         raise HTTPException(status_code=404, detail="User does not exist")
 
-    product = db.query(Product).filter(Product.product_id == product_id).first()
+    product = await db.scalar(select(Product).where(Product.product_id == product_id))
     if not product:
         raise HTTPException(status_code=404, detail="Product does not exist")
 
-    favorite = db.query(Favorite).filter(
+    favorite = await db.scalar(select(Favorite).where(
         Favorite.user_id == user_id,
         Favorite.product_id == product_id
-    ).first()
+    ))
 
     return FavoriteResponse(is_favorite=favorite is not None)
 
+FAVORITE_SORT_KEY = [(Favorite.user_id, False), (Favorite.product_id, False)]
+
 @router.get("/admin/all")
 async def get_all_favorites(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="Keyset cursor from next_cursor; pass it empty to start cursor pagination"),
+    db: AsyncSession = Depends(get_db),
     admin: User = Depends(get_current_admin)
 ):
     """Get all users' favorites (admin only)"""
-    favorites = db.query(Favorite).offset(skip).limit(limit).all()
+    if cursor is not None:
+        favorites = (await db.scalars(apply_keyset(select(Favorite), FAVORITE_SORT_KEY, cursor, limit))).all()
+        favorites, next_cursor = keyset_page(favorites, FAVORITE_SORT_KEY, limit)
+        return {"items": favorites, "next_cursor": next_cursor}
+
+    favorites = (await db.scalars(select(Favorite).offset(skip).limit(limit))).all()
     return favorites
 
 @router.get("/admin/user/{user_id}")
 async def get_user_favorites_admin(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     admin: User = Depends(get_current_admin)
 ):
     """Get specific user's favorites (admin only)"""
-    favorites = db.query(Favorite).filter(Favorite.user_id == user_id).all()
+    favorites = (await db.scalars(select(Favorite).where(Favorite.user_id == user_id))).all()
     return favorites
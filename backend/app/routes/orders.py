@@ -1,12 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select, insert, delete, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 from app.database import get_db
 from app.models import Order, OrderItem, Product, ShoppingCart, CartItem, User
 from app.dependencies import get_current_user, get_current_admin
-from app.utils import update_member_status
+from app.jobs.auto_complete import auto_complete_runner, count_stale_orders, stale_cutoff
+from app.jobs.queue import job_queue
+from app.jobs.tasks import refresh_membership
+from app.utils import (
+    apply_keyset, keyset_page, json_response, decrement_stock, get_stock_levels, availability_changes, product_cache,
+    bump_stock_versions, refresh_category_stock, apply_order_status_change
+)
 
 router = APIRouter()
 
@@ -40,54 +48,54 @@ class OrderStatusUpdate(BaseModel):
 async def get_user_orders(
         user_id: int,
         current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
 ):
     """Get user order list"""
     if current_user.user_id != user_id:
         raise HTTPException(status_code=403, detail="Unauthorized to view this user's orders")
 
-    orders = db.query(Order).options(
+    orders = (await db.scalars(select(Order).options(
         joinedload(Order.order_items).joinedload(OrderItem.product)
-    ).filter(Order.user_id == user_id).order_by(Order.created_at.desc()).all()
+    ).where(Order.user_id == user_id).order_by(Order.created_at.desc()))).unique().all()
 
+    # Plain dicts in the OrderResponse shape; the route's response_model still documents them
     orders_with_items = []
     for order in orders:
         items_with_details = []
         for item in order.order_items:
             product = item.product
-            items_with_details.append(OrderItemResponse(
-                product_id=item.product_id,
-                product_name=product.product_name if product else "Unknown product",
-                quantity=item.quantity,
-                price=float(item.price),
-                subtotal=float(item.price * item.quantity)
-            ))
-
-        orders_with_items.append(OrderResponse(
-            order_id=order.order_id,
-            total_amount=float(order.total_amount),
-            recipient=order.recipient,
-            shipping_address=order.shipping_address,
-            status=order.status,
-            created_at=order.created_at.isoformat() if order.created_at else None,
-            items=items_with_details
-        ))
+            items_with_details.append({
+                "product_id": item.product_id,
+                "product_name": product.product_name if product else "Unknown product",
+                "quantity": item.quantity,
+                "price": float(item.price),
+                "subtotal": float(item.price * item.quantity)
+            })
+
+        orders_with_items.append({
+            "order_id": order.order_id,
+            "total_amount": float(order.total_amount),
+            "recipient": order.recipient,
+            "shipping_address": order.shipping_address,
+            "status": order.status,
+            "created_at": order.created_at.isoformat() if order.created_at else None,
+            "items": items_with_details
+        })
 
-    return orders_with_items
+    return json_response(orders_with_items)
 
 
 @router.post("/create")
 async def create_order(
         order_data: OrderCreateRequest,
         current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db),
-        background_tasks: BackgroundTasks = None
+        db: AsyncSession = Depends(get_db)
 ):
     """Create order"""
     try:
-        cart = db.query(ShoppingCart).options(
+        cart = (await db.scalars(select(ShoppingCart).options(
             joinedload(ShoppingCart.cart_items).joinedload(CartItem.product)
-        ).filter(ShoppingCart.user_id == current_user.user_id).first()
+        ).where(ShoppingCart.user_id == current_user.user_id))).unique().first()
 
         if not cart:
             raise HTTPException(status_code=404, detail="Shopping cart does not exist")
@@ -140,34 +148,49 @@ async def create_order(
         )
 
         db.add(new_order)
-        db.flush()
-
-        for item_data in order_items_data:
-            order_item = OrderItem(
-                order_id=new_order.order_id,
-                product_id=item_data["product_id"],
-                quantity=item_data["quantity"],
-                price=item_data["price"]
+        await db.flush()
+
+        # The stock check above may be stale by now; the conditional UPDATE is authoritative
+        quantities = {item_data["product_id"]: item_data["quantity"] for item_data in order_items_data}
+        updated_rows = await decrement_stock(db, quantities)
+        if updated_rows != len(quantities):
+            await db.rollback()
+            available = await get_stock_levels(db, quantities.keys())
+            raise HTTPException(
+                status_code=409,
+                detail={
+                    "message": "Stock changed while placing the order",
+                    "updated_rows": updated_rows,
+                    "expected_rows": len(quantities),
+                    "insufficient_items": [
+                        {
+                            "product_id": product_id,
+                            "requested": quantity,
+                            "available": available.get(product_id, 0)
+                        }
+                        for product_id, quantity in quantities.items()
+                        if available.get(product_id, 0) < quantity
+                    ]
+                }
             )
-            db.add(order_item)
 
-            product = db.query(Product).filter(
-                Product.product_id == item_data["product_id"]
-            ).with_for_update().first()
-            product.stock_quantity -= item_data["quantity"]
+        # Only products that just sold out move the category counts and the listings
+        sold_out = await availability_changes(db, {product_id: -quantity for product_id, quantity in quantities.items()})
+        await refresh_category_stock(db, sold_out)
 
-        for item_data in order_items_data:
-            cart_item = db.query(CartItem).filter(
-                CartItem.cart_id == cart.cart_id,
-                CartItem.product_id == item_data["product_id"]
-            ).first()
-            if cart_item:
-                db.delete(cart_item)
+        await db.execute(insert(OrderItem), [
+            {"order_id": new_order.order_id, **item_data} for item_data in order_items_data
+        ])
+        await db.execute(delete(CartItem).where(
+            CartItem.cart_id == cart.cart_id,
+            CartItem.product_id.in_(list(quantities))
+        ))
 
-        db.commit()
+        await bump_stock_versions(db, quantities, availability_changed=bool(sold_out))
+        await db.commit()
+        await product_cache.invalidate(*quantities, listings=bool(sold_out))
 
-        if background_tasks:
-            background_tasks.add_task(update_member_status, db, current_user.user_id)
+        job_queue.enqueue_batch(refresh_membership, current_user.user_id)
 
         return {
             "success": True,
@@ -177,10 +200,10 @@ async def create_order(
         }
 
     except HTTPException:
-        db.rollback()
+        await db.rollback()
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to create order: {str(e)}")
 
 
@@ -188,12 +211,12 @@ async def create_order(
 async def get_order_detail(
         order_id: int,
         current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
 ):
     """Get order details"""
-    order = db.query(Order).options(
+    order = (await db.scalars(select(Order).options(
         joinedload(Order.order_items).joinedload(OrderItem.product)
-    ).filter(Order.order_id == order_id).first()
+    ).where(Order.order_id == order_id))).unique().first()
 
     if not order:
         raise HTTPException(status_code=404, detail="Order does not exist")
@@ -227,28 +250,50 @@ async def get_order_detail(
 async def cancel_order(
         order_id: int,
         current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
 ):
     """Cancel order"""
     try:
-        order = db.query(Order).filter(Order.order_id == order_id).first()
+        order = await db.scalar(select(Order).where(Order.order_id == order_id))
         if not order:
             raise HTTPException(status_code=404, detail="Order does not exist")
 
         if order.user_id != current_user.user_id:
             raise HTTPException(status_code=403, detail="Unauthorized to cancel this order")
 
-        if order.status != "pending":
+        # Conditional, so of concurrent cancels only one moves the order out of pending and returns its stock
+        claimed = await db.execute(
+            update(Order)
+            .where(Order.order_id == order_id, Order.status == "pending")
+            .values(status="cancelled")
+            .execution_options(synchronize_session=False)
+        )
+        if claimed.rowcount != 1:
             raise HTTPException(status_code=400, detail="Only pending orders can be cancelled")
 
-        order_items = db.query(OrderItem).filter(OrderItem.order_id == order_id).all()
+        order_items = (await db.scalars(select(OrderItem).where(OrderItem.order_id == order_id))).all()
+        returned = (
+            select(func.sum(OrderItem.quantity))
+            .where(OrderItem.order_id == order_id, OrderItem.product_id == Product.product_id)
+            .scalar_subquery()
+        )
+        # One statement returns stock for every line instead of a SELECT per product
+        await db.execute(
+            update(Product)
+            .where(Product.product_id.in_({item.product_id for item in order_items}))
+            .values(stock_quantity=Product.stock_quantity + returned)
+            .execution_options(synchronize_session=False)
+        )
+
+        returned_quantities: Dict[int, int] = {}
         for item in order_items:
-            product = db.query(Product).filter(Product.product_id == item.product_id).first()
-            if product:
-                product.stock_quantity += item.quantity
+            returned_quantities[item.product_id] = returned_quantities.get(item.product_id, 0) + item.quantity
+        restocked = await availability_changes(db, returned_quantities)
+        await refresh_category_stock(db, restocked)
 
-        order.status = "cancelled"
-        db.commit()
+        await bump_stock_versions(db, returned_quantities, availability_changed=bool(restocked))
+        await db.commit()
+        await product_cache.invalidate(*returned_quantities, listings=bool(restocked))
 
         return {
             "success": True,
@@ -256,22 +301,21 @@ async def cancel_order(
         }
 
     except HTTPException:
-        db.rollback()
+        await db.rollback()
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to cancel order: {str(e)}")
 
 
 @router.put("/{order_id}/complete")
 async def complete_order(
         order_id: int,
-        background_tasks: BackgroundTasks,
         current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
 ):
     """Complete order"""
-    order = db.query(Order).filter(Order.order_id == order_id).first()
+    order = await db.scalar(select(Order).where(Order.order_id == order_id))
     if not order:
         raise HTTPException(status_code=404, detail="Order does not exist")
 
@@ -282,10 +326,12 @@ async def complete_order(
         raise HTTPException(status_code=400, detail="Only shipped orders can be completed")
 
     try:
+        old_status = order.status
         order.status = 'completed'
-        db.commit()
+        await apply_order_status_change(db, order, old_status)
+        await db.commit()
 
-        background_tasks.add_task(update_member_status, db, order.user_id)
+        job_queue.enqueue_batch(refresh_membership, order.user_id)
 
         return {
             "success": True,
@@ -293,68 +339,78 @@ async def complete_order(
         }
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to complete order: {str(e)}")
 
 
 @router.put("/auto-complete-old-orders")
 async def auto_complete_old_orders(
-        db: Session = Depends(get_db),
+        wait: bool = Query(False, description="Respond once the job has finished instead of straight away"),
         admin: User = Depends(get_current_admin)
 ):
     """Auto-complete old orders (admin only)"""
-    try:
-        fifteen_days_ago = datetime.utcnow() - timedelta(days=15)
+    if not auto_complete_runner.running:
+        pending = await count_stale_orders(stale_cutoff())
+        if not pending:
+            return {
+                "success": True,
+                "message": "No orders need to be auto-completed",
+                "job": auto_complete_runner.progress.snapshot()
+            }
+        auto_complete_runner.start()
+        message = f"Auto-completing {pending} orders in the background"
+    else:
+        message = "An auto-complete job is already running"
 
-        old_shipped_orders = db.query(Order).filter(
-            Order.status == 'shipped',
-            Order.created_at <= fifteen_days_ago
-        ).all()
+    if wait:
+        await auto_complete_runner.wait()
+        message = f"Auto-completed {auto_complete_runner.progress.updated_orders} orders"
 
-        updated_orders = []
-        updated_users = set()
+    job = auto_complete_runner.progress.snapshot()
+    if job["state"] == "failed":
+        raise HTTPException(status_code=500, detail=f"Failed to auto-complete orders: {job['error']}")
 
-        for order in old_shipped_orders:
-            order.status = 'completed'
-            updated_orders.append(order.order_id)
-            updated_users.add(order.user_id)
+    return {
+        "success": True,
+        "message": message,
+        "job": job
+    }
 
-        if updated_orders:
-            db.commit()
 
-            for user_id in updated_users:
-                update_member_status(db, user_id)
+@router.get("/auto-complete-old-orders/status")
+async def get_auto_complete_status(admin: User = Depends(get_current_admin)):
+    """Get progress of the latest auto-complete job (admin only)"""
+    return auto_complete_runner.progress.snapshot()
 
-            return {
-                "success": True,
-                "message": f"Auto-completed {len(updated_orders)} orders",
-                "updated_orders": updated_orders,
-                "updated_users": list(updated_users)
-            }
-        else:
-            return {
-                "success": True,
-                "message": "No orders need to be auto-completed",
-                "updated_orders": [],
-                "updated_users": []
-            }
 
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=f"Failed to auto-complete orders: {str(e)}")
+@router.get("/admin/jobs/stats")
+async def get_job_queue_stats(admin: User = Depends(get_current_admin)):
+    """Get background job queue depth and outcomes (admin only)"""
+    return job_queue.stats()
+
+
+ORDER_SORT_KEY = [(Order.created_at, True), (Order.order_id, True)]
 
 
 @router.get("/admin/all")
 async def get_all_orders(
         skip: int = 0,
         limit: int = 100,
-        db: Session = Depends(get_db),
+        cursor: Optional[str] = Query(None, description="Keyset cursor from next_cursor; pass it empty to start cursor pagination"),
+        db: AsyncSession = Depends(get_db),
         admin: User = Depends(get_current_admin)
 ):
     """Get all orders (admin only)"""
-    orders = db.query(Order).options(
+    query = select(Order).options(
         joinedload(Order.order_items).joinedload(OrderItem.product)
-    ).order_by(Order.created_at.desc()).offset(skip).limit(limit).all()
+    )
+    if cursor is not None:
+        orders = (await db.scalars(apply_keyset(query, ORDER_SORT_KEY, cursor, limit))).unique().all()
+        orders, next_cursor = keyset_page(orders, ORDER_SORT_KEY, limit)
+    else:
+        orders = (await db.scalars(
+            query.order_by(Order.created_at.desc(), Order.order_id.desc()).offset(skip).limit(limit)
+        )).unique().all()
 
     orders_with_items = []
     for order in orders:
@@ -380,17 +436,19 @@ async def get_all_orders(
             "items": items_with_details
         })
 
-    return orders_with_items
+    if cursor is not None:
+        return json_response({"items": orders_with_items, "next_cursor": next_cursor})
+    return json_response(orders_with_items)
 
 
 @router.get("/admin/status/{status}")
 async def get_orders_by_status(
         status: str,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_db),
         admin: User = Depends(get_current_admin)
 ):
     """Get orders by status (admin only)"""
-    orders = db.query(Order).filter(Order.status == status).all()
+    orders = (await db.scalars(select(Order).where(Order.status == status))).all()
     return orders
 
 
@@ -398,11 +456,11 @@ async def get_orders_by_status(
 async def update_order_status_admin(
         order_id: int,
         status_update: OrderStatusUpdate,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_db),
         admin: User = Depends(get_current_admin)
 ):
     """Update order status (admin only)"""
-    order = db.query(Order).filter(Order.order_id == order_id).first()
+    order = await db.scalar(select(Order).where(Order.order_id == order_id))
     if not order:
         raise HTTPException(status_code=404, detail="Order does not exist")
 
@@ -413,8 +471,13 @@ async def update_order_status_admin(
         raise HTTPException(status_code=400, detail=f"Invalid status, must be one of: {', '.join(valid_statuses)}")
 
     try:
+        old_status = order.status
         order.status = status
-        db.commit()
+        await apply_order_status_change(db, order, old_status)
+        await db.commit()
+
+        if "completed" in (old_status, status) and old_status != status:
+            job_queue.enqueue_batch(refresh_membership, order.user_id)
 
         return {
             "success": True,
@@ -423,18 +486,18 @@ async def update_order_status_admin(
             "status": status
         }
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to update order status: {str(e)}")
 
 
 @router.post("/{order_id}/pay")
 async def pay_order(
         order_id: int,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_db),
         admin: User = Depends(get_current_user)
 ):
     """Pay for order (simulated payment)"""
-    order = db.query(Order).filter(Order.order_id == order_id).first()
+    order = await db.scalar(select(Order).where(Order.order_id == order_id))
     if not order:
         raise HTTPException(status_code=404, detail="Order does not exist")
 
@@ -443,7 +506,7 @@ async def pay_order(
 
     try:
         order.status = 'paid'
-        db.commit()
+        await db.commit()
 
         return {
             "success": True,
@@ -452,5 +515,5 @@ async def pay_order(
             "status": "paid"
         }
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Payment failed: {str(e)}")
@@ -1,20 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, List, Optional, Union
 from app.database import get_db
-from app.models import Product, Favorite, User
+from app.models import Product, ProductCategory, Favorite, User
 from app.schemas import Product as ProductSchema
 from app.dependencies import get_current_user_optional, get_current_admin
+from app.utils import (
+    search_backend, suggestion_index, apply_keyset, keyset_page, product_cache, product_facets,
+    product_to_dict, category_state, apply_category_change, app_cache, cache_key, conditional_get,
+    json_response, bump_product_versions, product_tag, PRODUCT_LIST_TAG, CATEGORY_TAG
+)
 from pydantic import BaseModel
 
 router = APIRouter(tags=["Products"])
 
+# Listings and details show stock, so clients revalidate every time (cheap with the ETags)
+PRODUCT_CACHE_CONTROL = "public, no-cache"
+# Counts move with every stock change; a max-age would hide them behind a fresh-looking copy
+CATEGORY_CACHE_CONTROL = "public, no-cache"
+
 class ProductCreate(BaseModel):
     product_name: str
     price: float
     type: str
     description: str
     stock_quantity: int
+    sku: Optional[str] = None
 
 class ProductUpdate(BaseModel):
     product_name: str = None
@@ -22,70 +35,164 @@ class ProductUpdate(BaseModel):
     type: str = None
     description: str = None
     stock_quantity: int = None
+    sku: str = None
+
+PRODUCT_SORT_COLUMNS = {
+    "product_id": Product.product_id,
+    "product_name": Product.product_name,
+    "price": Product.price,
+    "type": Product.type,
+    "stock_quantity": Product.stock_quantity,
+}
+
+class ProductPage(BaseModel):
+    items: List[ProductSchema]
+    next_cursor: Optional[str] = None
+
+class ProductFacetPage(ProductPage):
+    facets: Dict[str, Any]
 
-@router.get("/", response_model=List[ProductSchema])
+@router.get("/", response_model=Union[List[ProductSchema], ProductFacetPage, ProductPage])
 async def get_products(
+        request: Request,
+        response: Response,
         skip: int = 0,
         limit: int = 100,
+        cursor: Optional[str] = Query(None, description="Keyset cursor from next_cursor; pass it empty to start cursor pagination"),
         type: Optional[str] = Query(None, description="Product type filter"),
-        search: Optional[str] = Query(None, description="Product name search"),
+        search: Optional[str] = Query(None, description="Full-text search over name, type and description"),
         min_price: Optional[float] = Query(None, ge=0, description="Minimum price"),
         max_price: Optional[float] = Query(None, ge=0, description="Maximum price"),
         in_stock: Optional[bool] = Query(None, description="Only show in-stock items"),
-        sort_by: Optional[str] = Query("product_id", description="Sort field"),
+        sort_by: Optional[str] = Query(None, description="Sort field (defaults to relevance when searching, otherwise product_id)"),
         sort_order: Optional[str] = Query("asc", regex="^(asc|desc)$", description="Sort direction"),
-        db: Session = Depends(get_db),
+        facets: bool = Query(False, description="Also return type counts, price histogram and stock counts for the filters"),
+        price_bucket_size: float = Query(100.0, gt=0, description="Price histogram bucket width when facets=true"),
+        db: AsyncSession = Depends(get_db),
         current_user: Optional[User] = Depends(get_current_user_optional)
 ):
     """Get product list"""
-    query = db.query(Product)
+    rank_by_relevance = bool(search) and sort_by in (None, "relevance")
+    if rank_by_relevance and cursor is not None:
+        raise HTTPException(
+            status_code=400,
+            detail="Cursor pagination needs an explicit sort_by when searching"
+        )
+
+    not_modified, etag = await conditional_get(request, response, db, [PRODUCT_LIST_TAG], PRODUCT_CACHE_CONTROL)
+    if not_modified:
+        return not_modified
+
+    async def load():
+        query = select(Product)
 
-    if type:
-        query = query.filter(Product.type == type)
-    if search:
-        query = query.filter(Product.product_name.contains(search))
-    if min_price is not None:
-        query = query.filter(Product.price >= min_price)
-    if max_price is not None:
-        query = query.filter(Product.price <= max_price)
-    if in_stock:
-        query = query.filter(Product.stock_quantity > 0)
+        if type:
+            query = query.where(Product.type == type)
+        if min_price is not None:
+            query = query.where(Product.price >= min_price)
+        if max_price is not None:
+            query = query.where(Product.price <= max_price)
+        if in_stock:
+            query = query.where(Product.stock_quantity > 0)
+        if search:
+            query = search_backend.apply(query, search, rank=rank_by_relevance)
 
-    sort_column = getattr(Product, sort_by, Product.product_id)
-    if sort_order == "desc":
-        sort_column = sort_column.desc()
-    query = query.order_by(sort_column)
+        page = {"facets": await product_facets(db, query, price_bucket_size)} if facets else {}
+        sort_column = PRODUCT_SORT_COLUMNS.get(sort_by, Product.product_id)
 
-    products = query.offset(skip).limit(limit).all()
-    return products
+        if cursor is not None:
+            sort_key = [(sort_column, sort_order == "desc")]
+            if sort_column is not Product.product_id:
+                sort_key.append((Product.product_id, sort_order == "desc"))
+            products = (await db.scalars(apply_keyset(query, sort_key, cursor, limit))).all()
+            products, next_cursor = keyset_page(products, sort_key, limit)
+            return {"items": [product_to_dict(product) for product in products], "next_cursor": next_cursor, **page}
+
+        if not rank_by_relevance:
+            query = query.order_by(sort_column.desc() if sort_order == "desc" else sort_column)
+
+        products = (await db.scalars(query.offset(skip).limit(limit))).all()
+        if facets:
+            return {"items": [product_to_dict(product) for product in products], "next_cursor": None, **page}
+        return [product_to_dict(product) for product in products]
+
+    # Cached as plain data so the entry can be shared through the Redis backend too
+    key = cache_key(
+        "products", skip=skip, limit=limit, cursor=cursor, type=type, search=search, min_price=min_price,
+        max_price=max_price, in_stock=in_stock, sort_by=sort_by, sort_order=sort_order,
+        facets=facets, price_bucket_size=price_bucket_size if facets else None, version=etag
+    )
+    # The cached data is already JSON-shaped, so send it without re-validating every row
+    return json_response(await app_cache.get_or_load(key, load, tags=[PRODUCT_LIST_TAG]), response)
+
+
+@router.get("/categories")
+async def get_categories(request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    """Get product categories with product and in-stock counts"""
+    not_modified, etag = await conditional_get(request, response, db, [CATEGORY_TAG], CATEGORY_CACHE_CONTROL)
+    if not_modified:
+        return not_modified
+
+    async def load():
+        categories = (await db.scalars(
+            select(ProductCategory).where(ProductCategory.product_count > 0).order_by(ProductCategory.type)
+        )).all()
+        return [
+            {
+                "type": category.type,
+                "product_count": category.product_count,
+                "in_stock_count": category.in_stock_count
+            }
+            for category in categories
+        ]
+
+    return await app_cache.get_or_load(f"categories@{etag}", load, tags=[CATEGORY_TAG])
 
 
 @router.get("/{product_id}", response_model=ProductSchema)
 async def get_product(
         product_id: int,
-        db: Session = Depends(get_db)
+        request: Request,
+        response: Response,
+        db: AsyncSession = Depends(get_db)
 ):
     """Get single product details"""
-    product = db.query(Product).filter(Product.product_id == product_id).first()
+    not_modified, etag = await conditional_get(request, response, db, [product_tag(product_id)], PRODUCT_CACHE_CONTROL)
+    if not_modified:
+        return not_modified
+
+    product = await product_cache.get(db, product_id, version=etag)
     if not product:
         raise HTTPException(status_code=404, detail="Product does not exist")
     return product
 
 
 @router.get("/categories/types")
-async def get_product_types(db: Session = Depends(get_db)):
+async def get_product_types(request: Request, response: Response, db: AsyncSession = Depends(get_db)):
     """Get all product categories"""
-    types = db.query(Product.type).distinct().all()
-    return [type[0] for type in types if type[0]]
+    not_modified, etag = await conditional_get(request, response, db, [CATEGORY_TAG], CATEGORY_CACHE_CONTROL)
+    if not_modified:
+        return not_modified
+
+    async def load():
+        types = (await db.scalars(
+            select(ProductCategory.type).where(ProductCategory.product_count > 0).order_by(ProductCategory.type)
+        )).all()
+        return [type for type in types if type]
+
+    return await app_cache.get_or_load(f"categories:types@{etag}", load, tags=[CATEGORY_TAG])
 
 
 @router.get("/{product_id}/stock")
 async def get_product_stock(
         product_id: int,
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
 ):
     """Get product stock information"""
-    product = db.query(Product).filter(Product.product_id == product_id).first()
+    # Read through to the table: a cached entry could predate a purchase on another worker
+    product = (await db.execute(
+        select(Product.product_name, Product.stock_quantity).where(Product.product_id == product_id)
+    )).first()
     if not product:
         raise HTTPException(status_code=404, detail="Product does not exist")
 
@@ -93,39 +200,34 @@ async def get_product_stock(
         "product_id": product_id,
         "product_name": product.product_name,
         "stock_quantity": product.stock_quantity,
-        "in_stock": product.stock_quantity > 0
+        "in_stock": (product.stock_quantity or 0) > 0
     }
 
 
 @router.get("/search/suggestions")
 async def get_search_suggestions(
         q: str = Query(..., min_length=1, description="Search keyword"),
-        limit: int = Query(10, le=50, description="Suggestion count"),
-        db: Session = Depends(get_db)
+        limit: int = Query(10, le=50, description="Suggestion count")
 ):
     """Get search suggestions"""
-    products = db.query(Product).filter(
-        Product.product_name.contains(q)
-    ).limit(limit).all()
+    await suggestion_index.ensure_loaded()
 
     return {
         "query": q,
-        "suggestions": [
-            {
-                "product_id": p.product_id,
-                "product_name": p.product_name,
-                "type": p.type,
-                "price": float(p.price)
-            }
-            for p in products
-        ]
+        "suggestions": suggestion_index.lookup(q, limit)
     }
 
 
+@router.get("/admin/cache/stats")
+async def get_product_cache_stats(admin: User = Depends(get_current_admin)):
+    """Get product cache statistics (admin only)"""
+    return product_cache.stats()
+
+
 @router.post("/admin/create")
 async def create_product(
         product_data: ProductCreate,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_db),
         admin: User = Depends(get_current_admin)
 ):
     """Create product (admin only)"""
@@ -135,19 +237,30 @@ async def create_product(
             price=product_data.price,
             type=product_data.type,
             description=product_data.description,
-            stock_quantity=product_data.stock_quantity
+            stock_quantity=product_data.stock_quantity,
+            sku=product_data.sku
         )
         db.add(new_product)
-        db.commit()
-        db.refresh(new_product)
+        await db.flush()
+        await search_backend.index_product(db, new_product)
+        await apply_category_change(db, None, category_state(new_product))
+        await bump_product_versions(db, new_product.product_id)
+        await db.commit()
+        await db.refresh(new_product)
+        suggestion_index.add(new_product)
+        # SQLite may hand out a deleted product's id again; never serve its old entry
+        await product_cache.invalidate(new_product.product_id)
 
         return {
             "success": True,
             "message": "Product created successfully",
             "product_id": new_product.product_id
         }
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="A product with this SKU already exists")
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to create product: {str(e)}")
 
 
@@ -155,21 +268,27 @@ async def create_product(
 async def update_product(
         product_id: int,
         product_data: ProductUpdate,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_db),
         admin: User = Depends(get_current_admin)
 ):
     """Update product information (admin only)"""
-    product = db.query(Product).filter(Product.product_id == product_id).first()
+    product = await db.scalar(select(Product).where(Product.product_id == product_id))
     if not product:
         raise HTTPException(status_code=404, detail="Product does not exist")
 
     try:
-        update_data = product_data.dict(exclude_unset=True)
+        before = category_state(product)
+        update_data = product_data.model_dump(exclude_unset=True)
         for field, value in update_data.items():
             setattr(product, field, value)
 
-        db.commit()
-        db.refresh(product)
+        await search_backend.index_product(db, product)
+        await apply_category_change(db, before, category_state(product))
+        await bump_product_versions(db, product_id)
+        await db.commit()
+        await db.refresh(product)
+        suggestion_index.add(product)
+        await product_cache.invalidate(product_id)
 
         return {
             "success": True,
@@ -179,33 +298,42 @@ async def update_product(
                 "product_name": product.product_name,
                 "price": float(product.price),
                 "type": product.type,
-                "stock_quantity": product.stock_quantity
+                "stock_quantity": product.stock_quantity,
+                "sku": product.sku
             }
         }
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="A product with this SKU already exists")
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to update product: {str(e)}")
 
 
 @router.delete("/admin/{product_id}")
 async def delete_product(
         product_id: int,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_db),
         admin: User = Depends(get_current_admin)
 ):
     """Delete product (admin only)"""
-    product = db.query(Product).filter(Product.product_id == product_id).first()
+    product = await db.scalar(select(Product).where(Product.product_id == product_id))
     if not product:
         raise HTTPException(status_code=404, detail="Product does not exist")
 
     try:
-        db.delete(product)
-        db.commit()
+        await db.delete(product)
+        await search_backend.remove_product(db, product_id)
+        await apply_category_change(db, category_state(product), None)
+        await bump_product_versions(db, product_id)
+        await db.commit()
+        suggestion_index.remove(product_id)
+        await product_cache.invalidate(product_id)
 
         return {
             "success": True,
             "message": "Product deleted successfully"
         }
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to delete product: {str(e)}")
@@ -1,15 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
 from app.models import Review, User, Product, Order, OrderItem
 from app.schemas import Review as ReviewSchema, ReviewCreate
 from app.dependencies import get_current_user, get_current_admin
+from app.utils import (
+    apply_keyset, keyset_page, app_cache, bump_versions, conditional_get, product_tag, product_reviews_tag
+)
 from pydantic import BaseModel
 from typing import List, Optional
 from decimal import Decimal
 
 router = APIRouter(tags=["Reviews"])
 
+# Revalidated on every use, so a reviewer sees their own review at once; unchanged lists cost a 304
+REVIEWS_CACHE_CONTROL = "public, no-cache"
+
 class ReviewResponse(BaseModel):
     user_id: int
     user_name: str
@@ -24,17 +31,17 @@ async def add_review(
     user_id: int,
     review_data: ReviewCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Add product review"""
     if current_user.user_id != user_id:
         raise HTTPException(status_code=403, detail="Unauthorized to add review")
 
-    has_purchased = db.query(Order).join(OrderItem).filter(
+    has_purchased = await db.scalar(select(Order).join(OrderItem).where(
         Order.user_id == user_id,
         Order.status == 'completed',
         OrderItem.product_id == review_data.product_id
-    ).first()
+    ).limit(1))
 
     if not has_purchased:
         raise HTTPException(
@@ -42,10 +49,10 @@ async def add_review(
             detail="Only users who have purchased this product can leave a review"
         )
 
-    existing_review = db.query(Review).filter(
+    existing_review = await db.scalar(select(Review).where(
         Review.user_id == user_id,
         Review.product_id == review_data.product_id
-    ).first()
+    ))
 
     if existing_review:
         raise HTTPException(status_code=400, detail="Already reviewed this product")
@@ -61,56 +68,75 @@ async def add_review(
             rating=review_data.rating
         )
         db.add(review)
-        db.commit()
-        db.refresh(review)
+        await bump_versions(db, product_reviews_tag(review.product_id))
+        await db.commit()
+        await db.refresh(review)
+        await app_cache.invalidate_tags(product_reviews_tag(review.product_id))
 
         return review
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Failed to add review")
 
 @router.get("/product/{product_id}", response_model=List[ReviewResponse])
 async def get_product_reviews(
     product_id: int,
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db)
 ):
     """Get product review list"""
-    product = db.query(Product).filter(Product.product_id == product_id).first()
-    if not product:
+    # The list also shows the product name, so a product change counts too
+    not_modified, etag = await conditional_get(
+        request, response, db, [product_tag(product_id), product_reviews_tag(product_id)], REVIEWS_CACHE_CONTROL
+    )
+    if not_modified:
+        return not_modified
+
+    async def load():
+        product = await db.scalar(select(Product).where(Product.product_id == product_id))
+        if not product:
+            return None
+
+        reviews = (await db.execute(select(Review, User).join(
+            User, Review.user_id == User.user_id
+        ).where(Review.product_id == product_id))).all()
+
+        review_responses = []
+        for review, user in reviews:
+            review_responses.append(ReviewResponse(
+                user_id=user.user_id,
+                user_name=user.user_name,
+                product_id=review.product_id,
+                product_name=product.product_name,
+                content=review.content,
+                rating=review.rating,
+                created_at=review.created_at.isoformat() if hasattr(review, 'created_at') and review.created_at else None
+            ).model_dump(mode="json"))
+
+        return review_responses
+
+    review_responses = await app_cache.get_or_load(
+        f"reviews:product:{product_id}@{etag}", load, tags=[product_reviews_tag(product_id)]
+    )
+    if review_responses is None:
         raise HTTPException(status_code=404, detail="Product does not exist")
-
-    reviews = db.query(Review, User).join(
-        User, Review.user_id == User.user_id
-    ).filter(Review.product_id == product_id).all()
-
-    review_responses = []
-    for review, user in reviews:
-        review_responses.append(ReviewResponse(
-            user_id=user.user_id,
-            user_name=user.user_name,
-            product_id=review.product_id,
-            product_name=product.product_name,
-            content=review.content,
-            rating=review.rating,
-            created_at=review.created_at.isoformat() if hasattr(review, 'created_at') and review.created_at else None
-        ))
-
     return review_responses
 
 @router.get("/{user_id}/reviews", response_model=List[ReviewResponse])
 async def get_user_reviews(
     user_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get user review list"""
     if current_user.user_id != user_id:
         raise HTTPException(status_code=403, detail="Unauthorized to view this user's reviews")
 
-    reviews = db.query(Review, Product).join(
+    reviews = (await db.execute(select(Review, Product).join(
         Product, Review.product_id == Product.product_id
-    ).filter(Review.user_id == user_id).all()
+    ).where(Review.user_id == user_id))).all()
 
     review_responses = []
     for review, product in reviews:
@@ -127,15 +153,24 @@ async def get_user_reviews(
     return review_responses
 
 
+REVIEW_SORT_KEY = [(Review.user_id, False), (Review.product_id, False)]
+
+
 @router.get("/admin/all")
 async def get_all_reviews(
         skip: int = 0,
         limit: int = 100,
-        db: Session = Depends(get_db),
+        cursor: Optional[str] = Query(None, description="Keyset cursor from next_cursor; pass it empty to start cursor pagination"),
+        db: AsyncSession = Depends(get_db),
         admin: User = Depends(get_current_admin)
 ):
     """Get all reviews (admin only)"""
-    reviews = db.query(Review).offset(skip).limit(limit).all()
+    if cursor is not None:
+        reviews = (await db.scalars(apply_keyset(select(Review), REVIEW_SORT_KEY, cursor, limit))).all()
+        reviews, next_cursor = keyset_page(reviews, REVIEW_SORT_KEY, limit)
+        return {"items": reviews, "next_cursor": next_cursor}
+
+    reviews = (await db.scalars(select(Review).offset(skip).limit(limit))).all()
     return reviews
 
 
@@ -143,26 +178,28 @@ async def get_all_reviews(
 async def delete_review_admin(
         user_id: int,
         product_id: int,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_db),
         admin: User = Depends(get_current_admin)
 ):
     """Delete review (admin only)"""
-    review = db.query(Review).filter(
+    review = await db.scalar(select(Review).where(
         Review.user_id == user_id,
         Review.product_id == product_id
-    ).first()
+    ))
 
     if not review:
         raise HTTPException(status_code=404, detail="Review does not exist")
 
     try:
-        db.delete(review)
-        db.commit()
+        await db.delete(review)
+        await bump_versions(db, product_reviews_tag(product_id))
+        await db.commit()
+        await app_cache.invalidate_tags(product_reviews_tag(product_id))
 
         return {
             "success": True,
             "message": "Review deleted successfully"
         }
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to delete review: {str(e)}")
@@ -1,33 +1,49 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Union
 from app.database import get_db
 from app.models import User
 from app.schemas import User as UserSchema
 from app.dependencies import get_current_user, get_current_admin, validate_resource_ownership
-from app.utils import update_member_status
+from app.utils import update_member_status, apply_keyset, keyset_page, invalidate_cached_user
+from pydantic import BaseModel
 
 router = APIRouter(tags=["Users"])
 
 
-@router.get("/", response_model=List[UserSchema])
+USER_SORT_KEY = [(User.user_id, False)]
+
+
+class UserPage(BaseModel):
+    items: List[UserSchema]
+    next_cursor: Optional[str] = None
+
+
+@router.get("/", response_model=Union[List[UserSchema], UserPage])
 async def get_users(
         skip: int = 0,
         limit: int = 100,
+        cursor: Optional[str] = Query(None, description="Keyset cursor from next_cursor; pass it empty to start cursor pagination"),
         search: Optional[str] = Query(None),
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_db),
         admin: User = Depends(get_current_admin)
 ):
     """Get user list (admin only)"""
-    query = db.query(User)
+    query = select(User)
 
     if search:
-        query = query.filter(
+        query = query.where(
             User.user_name.contains(search) |
             User.email.contains(search)
         )
 
-    users = query.offset(skip).limit(limit).all()
+    if cursor is not None:
+        users = (await db.scalars(apply_keyset(query, USER_SORT_KEY, cursor, limit))).all()
+        users, next_cursor = keyset_page(users, USER_SORT_KEY, limit)
+        return UserPage(items=users, next_cursor=next_cursor)
+
+    users = (await db.scalars(query.offset(skip).limit(limit))).all()
     return users
 
 
@@ -35,10 +51,10 @@ async def get_users(
 async def get_user(
         user_id: int,
         current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
 ):
     """Get user information"""
-    user = db.query(User).filter(User.user_id == user_id).first()
+    user = await db.scalar(select(User).where(User.user_id == user_id))
     if not user:
         raise HTTPException(status_code=404, detail="User does not exist")
 
@@ -52,16 +68,16 @@ async def get_user(
 async def get_member_status(
         user_id: int,
         current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
 ):
     """Get user membership status"""
     validate_resource_ownership(user_id, current_user)
 
-    user = db.query(User).filter(User.user_id == user_id).first()
+    user = await db.scalar(select(User).where(User.user_id == user_id))
     if not user:
         raise HTTPException(status_code=404, detail="User does not exist")
 
-    is_member = update_member_status(db, user_id)
+    is_member = await update_member_status(db, user_id)
 
     return {
         "user_id": user_id,
@@ -74,16 +90,16 @@ async def get_member_status(
 async def update_member_status_manual(
         user_id: int,
         current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
 ):
     """Manually update user membership status"""
     validate_resource_ownership(user_id, current_user)
 
-    user = db.query(User).filter(User.user_id == user_id).first()
+    user = await db.scalar(select(User).where(User.user_id == user_id))
     if not user:
         raise HTTPException(status_code=404, detail="User does not exist")
 
-    new_status = update_member_status(db, user_id)
+    new_status = await update_member_status(db, user_id)
 
     return {
         "success": True,
@@ -99,12 +115,12 @@ async def update_user_profile(
         user_id: int,
         profile_data: dict,
         current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
 ):
     """Update user profile information"""
     validate_resource_ownership(user_id, current_user)
 
-    user = db.query(User).filter(User.user_id == user_id).first()
+    user = await db.scalar(select(User).where(User.user_id == user_id))
     if not user:
         raise HTTPException(status_code=404, detail="User does not exist")
 
@@ -114,8 +130,9 @@ async def update_user_profile(
             if field in profile_data:
                 setattr(user, field, profile_data[field])
 
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
+        invalidate_cached_user(user_id)
 
         return {
             "success": True,
@@ -131,7 +148,7 @@ async def update_user_profile(
         }
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to update profile: {str(e)}")
 
 @router.put("/{user_id}/set-admin")
@@ -139,16 +156,17 @@ async def set_user_admin_status(
         user_id: int,
         is_admin: bool,
         current_admin: User = Depends(get_current_admin),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
 ):
     """Set user admin status (super admin only)"""
-    user = db.query(User).filter(User.user_id == user_id).first()
+    user = await db.scalar(select(User).where(User.user_id == user_id))
     if not user:
         raise HTTPException(status_code=404, detail="User does not exist")
 
     try:
         user.is_admin = is_admin
-        db.commit()
+        await db.commit()
+        invalidate_cached_user(user_id)
 
         return {
             "success": True,
@@ -161,17 +179,17 @@ async def set_user_admin_status(
         }
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to update admin status: {str(e)}")
 
 @router.get("/{user_id}/admin-status")
 async def get_user_admin_status(
         user_id: int,
         current_admin: User = Depends(get_current_admin),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
 ):
     """Get user admin status (admin only)"""
-    user = db.query(User).filter(User.user_id == user_id).first()
+    user = await db.scalar(select(User).where(User.user_id == user_id))
     if not user:
         raise HTTPException(status_code=404, detail="User does not exist")
 
@@ -33,6 +33,7 @@ class ProductBase(BaseModel):
     price: Decimal
     type: str
     description: str
+    sku: Optional[str] = None
 
 
 class ProductCreate(ProductBase):
@@ -2,16 +2,73 @@
 from .auth_utils import (
     verify_password,
     get_password_hash,
+    verify_password_async,
+    get_password_hash_async,
+    password_pool,
+    PasswordHasherBusy,
     create_access_token,
-    verify_token
+    verify_token,
+    token_cache,
+    user_cache,
+    invalidate_cached_user,
+    TRUST_TOKEN_CLAIMS
 )
-from .member_utils import update_member_status
+from .member_utils import update_member_status, refresh_member_status
+from .search_utils import search_backend, suggestion_index
+from .pagination_utils import apply_keyset, keyset_page
+from .stock_utils import availability_changes, decrement_stock, get_stock_levels
+from .cache_utils import app_cache, cache_key
+from .conditional_utils import bump_versions, conditional_get
+from .response_utils import FastJSONResponse, json_response
+from .product_utils import (
+    product_cache, product_facets, product_to_dict, product_tag, product_reviews_tag, bump_product_versions,
+    bump_stock_versions, PRODUCT_LIST_TAG, CATEGORY_TAG
+)
+from .order_stats_utils import apply_order_status_change, recompute_order_stats
+from .category_utils import category_state, apply_category_change, refresh_category_stock, sync_categories
 
 
 __all__ = [
     "verify_password",
     "get_password_hash", 
+    "verify_password_async",
+    "get_password_hash_async",
+    "password_pool",
+    "PasswordHasherBusy",
     "create_access_token",
     "verify_token",
-    "update_member_status"
+    "token_cache",
+    "user_cache",
+    "invalidate_cached_user",
+    "TRUST_TOKEN_CLAIMS",
+    "update_member_status",
+    "refresh_member_status",
+    "search_backend",
+    "suggestion_index",
+    "apply_keyset",
+    "keyset_page",
+    "decrement_stock",
+    "get_stock_levels",
+    "availability_changes",
+    "app_cache",
+    "cache_key",
+    "bump_versions",
+    "conditional_get",
+    "FastJSONResponse",
+    "json_response",
+    "product_cache",
+    "product_facets",
+    "product_to_dict",
+    "product_tag",
+    "product_reviews_tag",
+    "bump_product_versions",
+    "bump_stock_versions",
+    "PRODUCT_LIST_TAG",
+    "CATEGORY_TAG",
+    "category_state",
+    "apply_category_change",
+    "refresh_category_stock",
+    "sync_categories",
+    "apply_order_status_change",
+    "recompute_order_stats"
 ]
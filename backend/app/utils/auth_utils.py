@@ -1,14 +1,39 @@
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from collections import deque
 from datetime import datetime, timedelta
+import asyncio
+import hashlib
+import time
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from typing import Optional, Dict, Any
 import os
+from .cache_utils import TTLCache
 
 
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Principal cache used by get_current_user; entries are dropped on user writes
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+# Opt-in: build the current user from token claims without touching the database
+TRUST_TOKEN_CLAIMS = os.getenv("AUTH_TRUST_TOKEN_CLAIMS", "false").lower() in ("1", "true", "yes")
+
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+# Verified token payloads keyed by token digest; never outlives the token's exp
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "50000"))
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "300"))
+
+token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL)
+
+# bcrypt runs off the event loop on this pool; beyond MAX_PENDING callers get a 503
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -17,6 +42,124 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing pool already has PASSWORD_HASH_MAX_PENDING operations queued"""
+
+
+def _timed_call(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+class OperationStats:
+    """Count, queue wait and service time for one kind of pooled operation"""
+
+    def __init__(self, window: int = 1024):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.service_seconds = 0.0
+        self.max_seconds = 0.0
+        self._recent = deque(maxlen=window)
+
+    def record(self, total: float, service: float):
+        self.count += 1
+        self.total_seconds += total
+        self.service_seconds += service
+        self.max_seconds = max(self.max_seconds, total)
+        self._recent.append(total)
+
+    def snapshot(self) -> Dict[str, Any]:
+        recent = sorted(self._recent)
+
+        def pct(p):
+            return round(recent[min(len(recent) - 1, int(p * len(recent)))] * 1000, 2) if recent else 0.0
+
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_seconds / self.count * 1000, 2) if self.count else 0.0,
+            "avg_service_ms": round(self.service_seconds / self.count * 1000, 2) if self.count else 0.0,
+            "p50_ms": pct(0.50),
+            "p99_ms": pct(0.99),
+            "max_ms": round(self.max_seconds * 1000, 2),
+        }
+
+
+class PasswordHashPool:
+
+    def __init__(self, kind: str = "thread", workers: int = 1, max_pending: int = 32):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"PASSWORD_HASH_EXECUTOR must be 'thread' or 'process', got '{kind}'")
+        self.kind = kind
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        self.operations = {"hash": OperationStats(), "verify": OperationStats()}
+        self._executor: Optional[Executor] = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    async def run(self, operation: str, fn, *args):
+        # Only touched from the event loop, so the counter needs no lock
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise PasswordHasherBusy()
+
+        self.pending += 1
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            result, service = await loop.run_in_executor(self._get_executor(), _timed_call, fn, *args)
+        finally:
+            self.pending -= 1
+        self.operations[operation].record(time.perf_counter() - start, service)
+        return result
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "executor": self.kind,
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+            "operations": {name: stats.snapshot() for name, stats in self.operations.items()},
+        }
+
+    def flat_stats(self) -> Dict[str, float]:
+        """stats() with one number per key, e.g. verify_p99_ms, for the /metrics gauges"""
+        values = {key: value for key, value in self.stats().items() if key not in ("executor", "operations")}
+        for name, stats in self.operations.items():
+            values.update({f"{name}_{key}": value for key, value in stats.snapshot().items()})
+        return values
+
+
+password_pool = PasswordHashPool(
+    kind=PASSWORD_HASH_EXECUTOR,
+    workers=PASSWORD_HASH_WORKERS,
+    max_pending=PASSWORD_HASH_MAX_PENDING
+)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_pool.run("verify", verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await password_pool.run("hash", get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
     to_encode = data.copy()
     if expires_delta:
@@ -29,8 +172,22 @@ def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
 
 def verify_token(token: str) -> Optional[Dict[str, Any]]:
 
+    digest = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(digest)
+    if payload is not None:
+        return dict(payload)
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
     except JWTError:
         return None
+
+    exp = payload.get("exp")
+    ttl = TOKEN_CACHE_TTL if exp is None else min(TOKEN_CACHE_TTL, exp - time.time())
+    if ttl > 0:
+        token_cache.set(digest, payload, ttl=ttl)
+    return dict(payload)
+
+
+def invalidate_cached_user(user_id: int):
+    user_cache.delete(user_id)
@@ -0,0 +1,325 @@
+import asyncio
+import json
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Set
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_MISSING = object()
+
+# Shared response cache for product, category and review reads
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", os.getenv("PRODUCT_CACHE_BACKEND", "memory"))
+CACHE_SIZE = int(os.getenv("CACHE_SIZE", os.getenv("PRODUCT_CACHE_SIZE", "10000")))
+CACHE_TTL = float(os.getenv("CACHE_TTL", "30"))
+CACHE_URL = os.getenv("CACHE_URL", os.getenv("PRODUCT_CACHE_URL", os.getenv("REDIS_URL")))
+# Encoded values at least this large are zlib-compressed before they go over the wire
+CACHE_COMPRESS_MIN_BYTES = int(os.getenv("CACHE_COMPRESS_MIN_BYTES", "1024"))
+
+_RAW = b"j"
+_COMPRESSED = b"z"
+
+
+def encode_value(value: Any) -> bytes:
+    """Compact wire format: one marker byte, then JSON bytes, deflated when they are large"""
+    raw = orjson.dumps(value) if orjson else json.dumps(value, separators=(",", ":")).encode()
+    if len(raw) >= CACHE_COMPRESS_MIN_BYTES:
+        return _COMPRESSED + zlib.compress(raw, 1)
+    return _RAW + raw
+
+
+def decode_value(data: bytes) -> Any:
+    marker, body = data[:1], data[1:]
+    if marker == _COMPRESSED:
+        body = zlib.decompress(body)
+    return orjson.loads(body) if orjson else json.loads(body)
+
+
+class TTLCache:
+    """
+    Bounded LRU cache whose entries also expire after ttl seconds.
+
+    Safe to share between the event loop and threadpool workers.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                self.misses += 1
+                return default
+
+            value, expires_at = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def reset_stats(self):
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class CacheBackend:
+    """Async key/value store behind the read-through caches; values are JSON-serialisable"""
+
+    name = "base"
+
+    async def get(self, key: str) -> Any:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None, tags: Iterable[str] = ()):
+        raise NotImplementedError
+
+    async def delete(self, *keys: str):
+        raise NotImplementedError
+
+    async def invalidate_tags(self, *tags: str):
+        """Delete every key that was set with any of the tags"""
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Per-process backend on top of TTLCache; also the stand-in for the shared one in tests"""
+
+    name = "memory"
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._tags: Dict[str, Set[str]] = {}
+
+    async def get(self, key: str) -> Any:
+        return self.cache.get(key)
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None, tags: Iterable[str] = ()):
+        self.cache.set(key, value, ttl=ttl)
+        for tag in tags:
+            keys = self._tags.setdefault(tag, set())
+            keys.add(key)
+            if len(keys) > self.cache.maxsize:
+                # Forget keys the LRU has already dropped
+                keys.intersection_update(self.cache._data.keys())
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self.cache.delete(key)
+
+    async def invalidate_tags(self, *tags: str):
+        for tag in tags:
+            for key in self._tags.pop(tag, ()):
+                self.cache.delete(key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, **self.cache.stats()}
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Shared backend so every worker sees the same entries and invalidations.
+
+    Needs the optional redis package; values are stored with encode_value, and each
+    tag is a Redis set holding the keys written under it.
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str, ttl: float = 60.0, prefix: str = "store:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("The redis cache backend needs the 'redis' package installed") from e
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self.prefix}tag:{tag}"
+
+    async def get(self, key: str) -> Any:
+        raw = await self.client.get(self.prefix + key)
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return decode_value(raw)
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None, tags: Iterable[str] = ()):
+        ttl_ms = int((self.ttl if ttl is None else ttl) * 1000)
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.set(self.prefix + key, encode_value(value), px=ttl_ms)
+            for tag in tags:
+                pipe.sadd(self._tag_key(tag), self.prefix + key)
+                pipe.pexpire(self._tag_key(tag), ttl_ms)
+            await pipe.execute()
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self.client.delete(*[self.prefix + key for key in keys])
+
+    async def invalidate_tags(self, *tags: str):
+        for tag in tags:
+            keys = await self.client.smembers(self._tag_key(tag))
+            await self.client.delete(self._tag_key(tag), *keys)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def create_cache_backend(name: str, maxsize: int, ttl: float, url: Optional[str] = None) -> CacheBackend:
+    if name == MemoryCacheBackend.name:
+        return MemoryCacheBackend(maxsize=maxsize, ttl=ttl)
+    if name == RedisCacheBackend.name:
+        return RedisCacheBackend(url or "redis://localhost:6379/0", ttl=ttl)
+    raise ValueError(f"Unknown cache backend '{name}', expected 'memory' or 'redis'")
+
+
+class Cache:
+    """
+    Read-through cache over a CacheBackend with tag invalidation and single-flight loads.
+
+    Concurrent misses for the same key in this process share one loader call instead of
+    all hitting the database. A load that overlaps an invalidation is returned to its
+    callers but not stored, so it cannot put back data the invalidation meant to drop.
+    Cached values are shared; callers must not mutate them.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: Optional[float] = None):
+        self.backend = backend
+        self.ttl = ttl
+        self._flights: Dict[str, asyncio.Future] = {}
+        self._generation = 0
+        self.loads = 0
+        self.shared_loads = 0
+
+    async def get(self, key: str) -> Any:
+        return await self.backend.get(key)
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None, tags: Iterable[str] = ()):
+        await self.backend.set(key, value, ttl=self.ttl if ttl is None else ttl, tags=tags)
+
+    async def delete(self, *keys: str):
+        self._generation += 1
+        await self.backend.delete(*keys)
+
+    async def invalidate_tags(self, *tags: str):
+        self._generation += 1
+        await self.backend.invalidate_tags(*tags)
+
+    async def get_or_load(
+            self,
+            key: str,
+            loader: Callable[[], Awaitable[Any]],
+            ttl: Optional[float] = None,
+            tags: Iterable[str] = ()
+    ) -> Any:
+        """Return the cached value for key, or the result of loader(); None results are not cached"""
+        value = await self.backend.get(key)
+        if value is not None:
+            return value
+
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.shared_loads += 1
+            return await asyncio.shield(flight)
+
+        flight = asyncio.get_running_loop().create_future()
+        self._flights[key] = flight
+        generation = self._generation
+        try:
+            self.loads += 1
+            value = await loader()
+            if value is not None and generation == self._generation:
+                await self.set(key, value, ttl=ttl, tags=tags)
+            flight.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except Exception as e:
+            flight.set_exception(e)
+            # Nobody may be waiting; don't let the loop log the exception as unretrieved
+            flight.exception()
+            raise
+        finally:
+            del self._flights[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.backend.stats(),
+            "loads": self.loads,
+            "shared_loads": self.shared_loads,
+            "loads_in_flight": len(self._flights),
+        }
+
+
+def cache_key(prefix: str, **params: Any) -> str:
+    """Stable key for a parameterised read; None parameters are left out"""
+    parts = [f"{name}={value}" for name, value in sorted(params.items()) if value is not None]
+    return f"{prefix}?{'&'.join(parts)}" if parts else prefix
+
+
+app_cache = Cache(create_cache_backend(CACHE_BACKEND, maxsize=CACHE_SIZE, ttl=CACHE_TTL, url=CACHE_URL))
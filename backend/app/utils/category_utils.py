@@ -0,0 +1,84 @@
+from typing import Iterable, Optional, Tuple
+
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app.models import Product, ProductCategory
+from .common import dialect_insert
+
+# (type, in_stock) of a product as seen by the category counts; None when there is no product
+CategoryState = Optional[Tuple[str, bool]]
+
+
+def category_state(product: Optional[Product]) -> CategoryState:
+    if product is None:
+        return None
+    return product.type, (product.stock_quantity or 0) > 0
+
+
+async def _adjust(db: AsyncSession, type: str, products: int, in_stock: int):
+    statement = dialect_insert(db)(ProductCategory).values(type=type, product_count=products, in_stock_count=in_stock)
+    await db.execute(statement.on_conflict_do_update(
+        index_elements=[ProductCategory.type],
+        set_={
+            "product_count": ProductCategory.product_count + products,
+            "in_stock_count": ProductCategory.in_stock_count + in_stock,
+        }
+    ))
+
+
+async def apply_category_change(db: AsyncSession, before: CategoryState, after: CategoryState):
+    """Move one product between category counts inside the caller's transaction"""
+    if before == after:
+        return
+    if before is not None:
+        await _adjust(db, before[0], -1, -int(before[1]))
+    if after is not None:
+        await _adjust(db, after[0], 1, int(after[1]))
+
+
+async def refresh_category_stock(db: AsyncSession, product_ids: Iterable[int]):
+    """Recount in_stock_count for the categories of products whose stock was changed in bulk"""
+    product_ids = list(product_ids)
+    if not product_ids:
+        return
+
+    in_stock = (
+        select(func.count())
+        .where(Product.type == ProductCategory.type, Product.stock_quantity > 0)
+        .scalar_subquery()
+    )
+    await db.execute(
+        update(ProductCategory)
+        .where(ProductCategory.type.in_(
+            select(Product.type).where(Product.product_id.in_(product_ids)).distinct()
+        ))
+        .values(in_stock_count=in_stock)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def rebuild_categories(conn: AsyncConnection):
+    await conn.execute(delete(ProductCategory))
+    await conn.execute(insert(ProductCategory).from_select(
+        ["type", "product_count", "in_stock_count"],
+        select(
+            Product.type,
+            func.count(),
+            func.sum(case((Product.stock_quantity > 0, 1), else_=0))
+        ).group_by(Product.type)
+    ))
+
+
+async def sync_categories(conn: AsyncConnection):
+    """Rebuild the category table when its totals no longer match Product, e.g. after a bulk load"""
+    expected = (await conn.execute(select(
+        func.count(),
+        func.coalesce(func.sum(case((Product.stock_quantity > 0, 1), else_=0)), 0)
+    ).select_from(Product))).one()
+    stored = (await conn.execute(select(
+        func.coalesce(func.sum(ProductCategory.product_count), 0),
+        func.coalesce(func.sum(ProductCategory.in_stock_count), 0)
+    ))).one()
+    if tuple(expected) != tuple(stored):
+        await rebuild_categories(conn)
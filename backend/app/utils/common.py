@@ -1,4 +1,5 @@
 from fastapi import HTTPException, status
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 from typing import Any, Optional
 
@@ -16,3 +17,7 @@ def validate_ownership(current_user_id: int, resource_user_id: int):
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Unauthorized to access this resource"
         )
+
+def dialect_insert(db: Any):
+    """insert() for the session's dialect, so callers can use on_conflict_do_update"""
+    return postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
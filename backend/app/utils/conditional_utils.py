@@ -0,0 +1,94 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import ChangeVersion
+from .common import dialect_insert
+
+
+async def bump_versions(db: AsyncSession, *scopes: str):
+    """Advance the change counters of the scopes inside the caller's transaction"""
+    scopes = sorted(set(scopes))
+    if not scopes:
+        return
+    now = datetime.utcnow()
+    statement = dialect_insert(db)(ChangeVersion.__table__)
+    # Parameters rather than a literal VALUES list, so the statement compiles once however many scopes there are
+    await db.execute(statement.on_conflict_do_update(
+        index_elements=[ChangeVersion.scope],
+        set_={"version": ChangeVersion.version + 1, "updated_at": statement.excluded.updated_at}
+    ), [{"scope": scope, "version": 1, "updated_at": now} for scope in scopes])
+
+
+async def read_versions(db: AsyncSession, scopes: List[str]) -> Tuple[str, Optional[datetime]]:
+    """ETag and last change time for the scopes; scopes never written count as version 0"""
+    rows = (await db.execute(
+        select(ChangeVersion.scope, ChangeVersion.version, ChangeVersion.updated_at)
+        .where(ChangeVersion.scope.in_(scopes))
+    )).all()
+    found: Dict[str, Tuple[int, datetime]] = {scope: (version, updated_at) for scope, version, updated_at in rows}
+    # Weak, because compression may change the bytes but never the content
+    etag = 'W/"' + ".".join(str(found.get(scope, (0, None))[0]) for scope in scopes) + '"'
+    last_modified = max((updated_at for _, updated_at in found.values()), default=None)
+    return etag, last_modified
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    return any(
+        (candidate[2:] if candidate.startswith("W/") else candidate) == opaque
+        for candidate in (part.strip() for part in header.split(","))
+    )
+
+
+def _not_modified_since(header: str, last_modified: Optional[datetime]) -> bool:
+    if last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # Full precision: HTTP dates drop the fraction, so a change later in the same second
+    # as the client's copy must still count as modified
+    return last_modified.replace(tzinfo=timezone.utc) <= since
+
+
+async def conditional_get(
+        request: Request,
+        response: Response,
+        db: AsyncSession,
+        scopes: Iterable[str],
+        cache_control: str
+) -> Tuple[Optional[Response], str]:
+    """
+    Answer a GET from its change counters before the route loads anything.
+
+    Returns (304 response, etag) when the client's copy is current, otherwise
+    (None, etag) with the validators and Cache-Control already set on response.
+    The etag also makes a good cache key suffix: it changes whenever the data does.
+    """
+    etag, last_modified = await read_versions(db, list(scopes))
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True)
+
+    # If-None-Match wins over If-Modified-Since when a client sends both
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_none_match is not None:
+        not_modified = _etag_matches(if_none_match, etag)
+    else:
+        not_modified = if_modified_since is not None and _not_modified_since(if_modified_since, last_modified)
+
+    if not_modified:
+        return Response(status_code=304, headers=headers), etag
+    response.headers.update(headers)
+    return None, etag
@@ -0,0 +1,111 @@
+import os
+import sys
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+from sqlalchemy import exists, or_, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlalchemy.sql import Select
+
+from app.models import Order, OrderItem, Product, ShoppingCart, Review, Favorite, User, UserOrderStats
+from .log_utils import get_logger
+
+# Log full-scan warnings for QUERY_SHAPES when the app starts (SQLite only)
+INDEX_ADVISOR_ON_STARTUP = os.getenv("INDEX_ADVISOR_ON_STARTUP", "false").lower() in ("1", "true", "yes")
+
+logger = get_logger("app.index_advisor")
+
+
+def _recent():
+    return datetime.utcnow() - timedelta(days=180)
+
+
+# The filters and orderings the routers actually run, with representative parameters
+QUERY_SHAPES: Dict[str, Callable[[], Select]] = {
+    "member_status": lambda: select(UserOrderStats.last_completed_at).where(UserOrderStats.user_id == 1),
+    "member_status_refresh": lambda: select(User.user_id).where(
+        User.user_id.in_([1, 2, 3]),
+        or_(User.is_member.is_(None), User.is_member != exists().where(
+            UserOrderStats.user_id == User.user_id, UserOrderStats.last_completed_at >= _recent()
+        ))
+    ),
+    "user_orders": lambda: select(Order).where(Order.user_id == 1).order_by(Order.created_at.desc()),
+    "orders_by_status": lambda: select(Order).where(Order.status == "pending"),
+    "auto_complete_orders": lambda: select(Order).where(
+        Order.status == "shipped", Order.created_at <= datetime.utcnow() - timedelta(days=15)
+    ),
+    "admin_orders_page": lambda: select(Order).order_by(
+        Order.created_at.desc(), Order.order_id.desc()
+    ).limit(20),
+    "purchased_product": lambda: select(Order).join(OrderItem).where(
+        Order.user_id == 1, Order.status == "completed", OrderItem.product_id == 1
+    ).limit(1),
+    "cart_by_user": lambda: select(ShoppingCart).where(ShoppingCart.user_id == 1),
+    "products_by_type": lambda: select(Product).where(Product.type == "Electronics").order_by(Product.price),
+    "products_by_price": lambda: select(Product).where(Product.price >= 100, Product.price <= 500),
+    "product_reviews": lambda: select(Review, User).join(User, Review.user_id == User.user_id).where(
+        Review.product_id == 1
+    ),
+    "product_favorites": lambda: select(Favorite).where(Favorite.product_id == 1),
+    "user_by_name": lambda: select(User).where(User.user_name == "testuser"),
+}
+
+
+def explain(conn: Connection, statement: Select) -> List[str]:
+    sql = statement.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+    return [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+
+
+def is_full_scan(detail: str) -> bool:
+    # "SCAN Order" reads every row; "SCAN Order USING INDEX ..." only walks an index in order
+    return detail.startswith("SCAN ") and " USING " not in detail
+
+
+def advise(conn: Connection) -> Dict[str, dict]:
+    """Run EXPLAIN QUERY PLAN over QUERY_SHAPES and flag full table scans and temp sorts"""
+    if conn.dialect.name != "sqlite":
+        raise RuntimeError("The index advisor reads SQLite's EXPLAIN QUERY PLAN output")
+
+    report = {}
+    for name, build in QUERY_SHAPES.items():
+        plan = explain(conn, build())
+        report[name] = {
+            "plan": plan,
+            "full_scans": [detail for detail in plan if is_full_scan(detail)],
+            "temp_sorts": [detail for detail in plan if detail.startswith("USE TEMP B-TREE")],
+        }
+    return report
+
+
+def print_report(report: Dict[str, dict]) -> int:
+    """Print one line per query shape, with the plan for flagged ones; returns the full-scan count"""
+    full_scans = 0
+    for name, result in report.items():
+        if result["full_scans"]:
+            label = "FULL SCAN"
+            full_scans += 1
+        elif result["temp_sorts"]:
+            label = "TEMP SORT"
+        else:
+            label = "ok"
+        print(f"{label:9}  {name}")
+        if label != "ok":
+            for detail in result["plan"]:
+                print(f"           {detail}")
+    return full_scans
+
+
+async def run_startup_advisor(conn: AsyncConnection):
+    report = await conn.run_sync(advise)
+    for name, result in report.items():
+        for detail in result["full_scans"]:
+            logger.warning("Index advisor: query shape '%s' does a full scan: %s", name, detail)
+
+
+# python -m app.utils.index_utils
+if __name__ == "__main__":
+    from app.database import engine
+
+    with engine.connect() as connection:
+        sys.exit(1 if print_report(advise(connection)) else 0)
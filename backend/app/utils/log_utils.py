@@ -0,0 +1,180 @@
+import contextvars
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "json" for log shippers, "text" for reading in a terminal
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+# Records waiting for the writer thread; beyond this they are dropped rather than blocking a request
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Fraction of DEBUG/INFO records kept per logger, e.g. "app.member=0.1,app.jobs=0.5"; warnings always pass
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+
+# Attributes every LogRecord has; anything else came in through extra= and goes into the JSON
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+current_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_request_id", default=None)
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    rates = {}
+    for part in spec.split(","):
+        name, _, rate = part.partition("=")
+        if name.strip() and rate.strip():
+            rates[name.strip()] = min(max(float(rate), 0.0), 1.0)
+    return rates
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamp each record with the id of the request that produced it, if any"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = current_request_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of low-severity records per logger; the longest matching logger prefix wins"""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def rate_for(self, name: str) -> float:
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition(".")[0]
+        return 1.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        rate = self.rate_for(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        if orjson is not None:
+            return orjson.dumps(entry, default=str).decode()
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that never waits: a full queue drops the record and counts it"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve arguments and tracebacks now, while they still describe this request
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self):
+        # Shutdown may wait for room; only the request path must not
+        self.queue.put(self._sentinel)
+
+
+class LogSubsystem:
+    """
+    Logging for everything under the "app" logger.
+
+    Request handlers only resolve the record and put it on a bounded queue; a
+    QueueListener thread does the stdout writes. configure() is idempotent and
+    stop() flushes what is still queued.
+    """
+
+    def __init__(self):
+        self.handler: Optional[DroppingQueueHandler] = None
+        self.listener: Optional[_Listener] = None
+
+    def configure(
+            self,
+            level: str = LOG_LEVEL,
+            fmt: str = LOG_FORMAT,
+            sample_rates: str = LOG_SAMPLE_RATES,
+            queue_size: int = LOG_QUEUE_SIZE,
+            stream=None
+    ):
+        if self.listener is not None:
+            return
+        writer = logging.StreamHandler(stream or sys.stdout)
+        writer.setFormatter(
+            JSONFormatter() if fmt == "json"
+            else logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s")
+        )
+
+        self.handler = DroppingQueueHandler(queue.Queue(queue_size))
+        self.handler.addFilter(SamplingFilter(parse_sample_rates(sample_rates)))
+        self.handler.addFilter(RequestIdFilter())
+
+        root = logging.getLogger("app")
+        root.setLevel(level)
+        root.addHandler(self.handler)
+        root.propagate = False
+
+        self.listener = _Listener(self.handler.queue, writer)
+        self.listener.start()
+
+    def stop(self):
+        if self.listener is None:
+            return
+        self.listener.stop()
+        logging.getLogger("app").removeHandler(self.handler)
+        logging.getLogger("app").propagate = True
+        self.listener = None
+
+    def stats(self) -> Dict[str, int]:
+        if self.handler is None:
+            return {"queued": 0, "dropped": 0}
+        return {"queued": self.handler.queue.qsize(), "dropped": self.handler.dropped}
+
+
+log_subsystem = LogSubsystem()
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger under the "app" hierarchy, so it goes through the queue once configured"""
+    return logging.getLogger(name if name == "app" or name.startswith("app.") else f"app.{name}")
@@ -1,44 +1,82 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import exists, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
+from typing import Iterable, List
+from .auth_utils import invalidate_cached_user
+from .log_utils import get_logger
 
-def update_member_status(db: Session, user_id: int):
+logger = get_logger("app.member")
+
+
+async def update_member_status(db: AsyncSession, user_id: int):
 
     try:
-        from app.models import User, Order
+        from app.models import User, UserOrderStats
 
 
-        user = db.query(User).filter(User.user_id == user_id).first()
+        user = await db.scalar(select(User).where(User.user_id == user_id))
         if not user:
-            print(f"User {user_id} not exist")
+            logger.warning("Membership check for unknown user %s", user_id)
             return False
 
 
         six_months_ago = datetime.utcnow() - timedelta(days=180)
 
-        print(f"Check the membership status of user {user_id}, timestamp (six months ago): {six_months_ago}")
-
+        last_completed_at = await db.scalar(
+            select(UserOrderStats.last_completed_at).where(UserOrderStats.user_id == user_id)
+        )
 
-        recent_completed_orders = db.query(Order).filter(
-            Order.user_id == user_id,
-            Order.status == 'completed',
-            Order.created_at >= six_months_ago
-        ).all()
+        new_member_status = last_completed_at is not None and last_completed_at >= six_months_ago
 
-        new_member_status = len(recent_completed_orders) > 0
-
-        print(f"User {user_id} has {len(recent_completed_orders)} completed orders within the past six months.")
-        print(f"Current membership status: {user.is_member}, New membership status: {new_member_status}")
+        logger.debug(
+            "Membership check for user %s", user_id,
+            extra={"user_id": user_id, "last_completed_at": last_completed_at, "cutoff": six_months_ago,
+                   "is_member": user.is_member, "new_is_member": new_member_status}
+        )
 
         if user.is_member != new_member_status:
             user.is_member = new_member_status
-            db.commit()
-            print(f"User {user_id}'s membership status has been updated to: {new_member_status}")
+            await db.commit()
+            invalidate_cached_user(user_id)
+            logger.info("Membership for user %s changed to %s", user_id, new_member_status,
+                        extra={"user_id": user_id, "is_member": new_member_status})
             return True
         else:
-            print(f"User {user_id}'s membership status does not require an update.")
             return False
 
     except Exception as e:
-        print(f"Failed to update membership status: {e}")
-        db.rollback()
+        logger.exception("Failed to update membership status for user %s", user_id, extra={"user_id": user_id})
+        await db.rollback()
         return False
+
+
+async def refresh_member_status(db: AsyncSession, user_ids: Iterable[int]) -> List[int]:
+    """
+    Set-based membership refresh for many users, inside the caller's transaction.
+
+    Returns the ids whose is_member flag changed; their cached principals are dropped
+    by the caller once the transaction commits.
+    """
+    from app.models import User, UserOrderStats
+
+    user_ids = list(user_ids)
+    if not user_ids:
+        return []
+
+    six_months_ago = datetime.utcnow() - timedelta(days=180)
+    is_member = exists().where(
+        UserOrderStats.user_id == User.user_id,
+        UserOrderStats.last_completed_at >= six_months_ago
+    )
+    changed = (await db.execute(
+        select(User.user_id).where(
+            User.user_id.in_(user_ids),
+            or_(User.is_member.is_(None), User.is_member != is_member)
+        )
+    )).scalars().all()
+    if changed:
+        await db.execute(
+            update(User).where(User.user_id.in_(changed)).values(is_member=is_member)
+            .execution_options(synchronize_session=False)
+        )
+    return list(changed)
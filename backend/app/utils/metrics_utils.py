@@ -0,0 +1,182 @@
+import bisect
+import contextvars
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .log_utils import get_logger
+
+# Requests issuing at least this many SQL statements are reported as they finish, to catch N+1 loops early
+METRICS_QUERY_WARN_THRESHOLD = int(os.getenv("METRICS_QUERY_WARN_THRESHOLD", "25"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+logger = get_logger("app.metrics")
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Sequence[float], labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        # labels -> (per-bucket counts with a trailing +Inf slot, sum)
+        self._series: Dict[LabelValues, List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = 'le="%s"' % _number(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            cumulative += counts[-1]
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class RequestStats:
+    """SQL work done on behalf of one request, filled in by the engine hooks"""
+
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+# Mutable object in a context var: the copies SQLAlchemy's greenlets and the threadpool make
+# of the context still point at the request's one instance
+current_request_stats: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar(
+    "current_request_stats", default=None
+)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        route = ("method", "route")
+        self.requests = Counter("http_requests_total", "HTTP requests handled", route + ("status",))
+        self.latency = Histogram("http_request_duration_seconds", "Time spent handling a request", LATENCY_BUCKETS, route)
+        self.response_size = Histogram("http_response_size_bytes", "Response body bytes sent", SIZE_BUCKETS, route)
+        self.queries = Histogram("db_queries_per_request", "SQL statements executed per request", QUERY_COUNT_BUCKETS, route)
+        self.db_time = Histogram("db_time_per_request_seconds", "Cumulative SQL time per request", LATENCY_BUCKETS, route)
+        self.statements = Counter("db_statements_total", "SQL statements executed, inside requests or not")
+        self.statement_time = Counter("db_statement_seconds_total", "Total time spent in SQL statements")
+        self._collectors: List[Callable[[], Iterable[str]]] = []
+
+    def add_collector(self, collector: Callable[[], Iterable[str]]):
+        """Register a callable that returns extra exposition lines at scrape time"""
+        self._collectors.append(collector)
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, size: int, stats: RequestStats):
+        self.requests.inc(method, route, str(status))
+        self.latency.observe(seconds, method, route)
+        self.response_size.observe(size, method, route)
+        self.queries.observe(stats.queries, method, route)
+        self.db_time.observe(stats.db_seconds, method, route)
+        if stats.queries >= METRICS_QUERY_WARN_THRESHOLD:
+            logger.warning(
+                "%s %s ran %s SQL statements (%.1fms in the database)", method, route, stats.queries, stats.db_seconds * 1000,
+                extra={"method": method, "route": route, "queries": stats.queries}
+            )
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in (self.requests, self.latency, self.response_size, self.queries, self.db_time,
+                       self.statements, self.statement_time):
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+def gauge_lines(name: str, help: str, values: Dict[str, float], label: str) -> List[str]:
+    """Exposition lines for a gauge family read from a stats dict at scrape time"""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} gauge"]
+    for key, value in sorted(values.items()):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            lines.append(f'{name}{{{label}="{_escape(key)}"}} {_number(value)}')
+    return lines
+
+
+def instrument_engine(engine: Engine, registry: MetricsRegistry = metrics):
+    """Count statements and their time, per request when one is active; pass async_engine.sync_engine for the async engine"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        registry.statements.inc()
+        registry.statement_time.inc(amount=elapsed)
+        stats = current_request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+        if started:
+            started.pop()
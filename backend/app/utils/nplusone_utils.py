@@ -0,0 +1,128 @@
+import contextvars
+import os
+import re
+import sys
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+try:
+    import greenlet
+except ImportError:
+    greenlet = None
+
+# Development only: print a report for every request that repeats a statement shape
+QUERY_DETECTOR = os.getenv("QUERY_DETECTOR", "false").lower() in ("1", "true", "yes")
+# The same statement shape this many times in one scope counts as an N+1
+QUERY_DETECTOR_THRESHOLD = int(os.getenv("QUERY_DETECTOR_THRESHOLD", "3"))
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_SKIP_FILES = {os.path.abspath(__file__), os.path.join(_APP_DIR, "middleware.py")}
+_IN_LIST = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)|\((?:\s*%\(\w+\)s\s*,)+\s*%\(\w+\)s\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """Statement text with IN lists collapsed, so batches of different sizes compare equal"""
+    return _IN_LIST.sub("(?)", _WHITESPACE.sub(" ", statement).strip())
+
+
+def _call_site() -> str:
+    """First frame in app code that led to the statement, looking through SQLAlchemy's greenlets to the coroutine"""
+    frame = sys._getframe(2)
+    current = greenlet.getcurrent() if greenlet else None
+    while True:
+        while frame is not None:
+            filename = os.path.abspath(frame.f_code.co_filename)
+            if filename.startswith(_APP_DIR) and filename not in _SKIP_FILES:
+                return f"{os.path.relpath(filename, os.path.dirname(_APP_DIR))}:{frame.f_lineno} in {frame.f_code.co_name}"
+            frame = frame.f_back
+        if current is None or current.parent is None:
+            return "<outside app code>"
+        current = current.parent
+        frame = current.gr_frame
+
+
+class QueryRecorder:
+    """Statements seen in one scope (a request or a test block), grouped by shape and call site"""
+
+    def __init__(self, threshold: int = QUERY_DETECTOR_THRESHOLD):
+        self.threshold = threshold
+        self.statements: List[Tuple[str, str]] = []
+
+    def record(self, statement: str):
+        self.statements.append((statement_shape(statement), _call_site()))
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def repeated(self) -> List[Tuple[str, int, Dict[str, int]]]:
+        """(shape, times run, call sites) for each shape run at least threshold times, most frequent first"""
+        shapes = Counter(shape for shape, _ in self.statements)
+        result = []
+        for shape, times in shapes.most_common():
+            if times < self.threshold:
+                break
+            sites = Counter(site for other, site in self.statements if other == shape)
+            result.append((shape, times, dict(sites.most_common())))
+        return result
+
+    def report(self, title: str = "Query report") -> str:
+        lines = [f"{title}: {self.count} statements"]
+        for shape, times, sites in self.repeated():
+            lines.append(f"  {times}x {shape[:200]}")
+            for site, site_times in sites.items():
+                lines.append(f"      {site_times}x at {site}")
+        return "\n".join(lines)
+
+
+current_query_recorder: contextvars.ContextVar[Optional[QueryRecorder]] = contextvars.ContextVar(
+    "current_query_recorder", default=None
+)
+
+_installed = set()
+
+
+def install_query_detector(engine: Engine):
+    """Feed statements on engine to the active QueryRecorder; safe to call more than once"""
+    if id(engine) in _installed:
+        return
+    _installed.add(id(engine))
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        recorder = current_query_recorder.get()
+        if recorder is not None:
+            recorder.record(statement)
+
+
+@contextmanager
+def record_queries(threshold: int = QUERY_DETECTOR_THRESHOLD) -> Iterator[QueryRecorder]:
+    """Record every statement run in this context, including inside ASGI apps called from it"""
+    recorder = QueryRecorder(threshold)
+    token = current_query_recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        current_query_recorder.reset(token)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def check_query_budget(
+        recorder: QueryRecorder,
+        max_queries: Optional[int] = None,
+        allow_repeats: bool = False,
+        title: str = "Query budget exceeded"
+):
+    """Raise QueryBudgetExceeded, with the report, when the scope ran too many or repeated statements"""
+    over_budget = max_queries is not None and recorder.count > max_queries
+    if over_budget or (not allow_repeats and recorder.repeated()):
+        limit = f" (budget {max_queries})" if max_queries is not None else ""
+        raise QueryBudgetExceeded(recorder.report(title + limit))
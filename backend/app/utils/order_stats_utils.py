@@ -0,0 +1,68 @@
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import case, delete, func, insert, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Order, UserOrderStats
+from .common import dialect_insert
+
+COMPLETED = "completed"
+
+
+async def record_completed_order(db: AsyncSession, user_id: int, created_at: Optional[datetime]):
+    """Count one more completed order for the user, inside the caller's transaction"""
+    statement = dialect_insert(db)(UserOrderStats).values(
+        user_id=user_id, lifetime_completed_count=1, last_completed_at=created_at
+    )
+    newer = statement.excluded.last_completed_at
+    await db.execute(statement.on_conflict_do_update(
+        index_elements=[UserOrderStats.user_id],
+        set_={
+            "lifetime_completed_count": UserOrderStats.lifetime_completed_count + 1,
+            "last_completed_at": case(
+                (or_(UserOrderStats.last_completed_at.is_(None), newer > UserOrderStats.last_completed_at), newer),
+                else_=UserOrderStats.last_completed_at
+            ),
+        }
+    ))
+
+
+async def recompute_order_stats(db: AsyncSession, user_ids: Optional[Iterable[int]] = None):
+    """
+    Rebuild UserOrderStats from Order for the given users, or for everyone.
+
+    Used for backfill and whenever an order leaves the completed status, since the
+    newest completed timestamp cannot be decremented in place.
+    """
+    summary = select(
+        Order.user_id,
+        func.count(),
+        func.max(Order.created_at)
+    ).where(Order.status == COMPLETED).group_by(Order.user_id)
+    clear = delete(UserOrderStats)
+
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        summary = summary.where(Order.user_id.in_(user_ids))
+        clear = clear.where(UserOrderStats.user_id.in_(user_ids))
+
+    # The session does not autoflush, and the recount must see pending status changes
+    await db.flush()
+    await db.execute(clear)
+    await db.execute(insert(UserOrderStats).from_select(
+        ["user_id", "lifetime_completed_count", "last_completed_at"], summary
+    ))
+
+
+async def apply_order_status_change(db: AsyncSession, order: Order, old_status: str):
+    """Keep UserOrderStats in step with one order's status change; call before commit"""
+    if old_status == order.status:
+        return
+    if order.status == COMPLETED:
+        await record_completed_order(db, order.user_id, order.created_at)
+    elif old_status == COMPLETED:
+        await recompute_order_stats(db, [order.user_id])
+
@@ -0,0 +1,111 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, false, or_
+from sqlalchemy.sql import Select
+
+# (column, descending) pairs; the last pair must be unique so the order is total
+SortKey = Sequence[Tuple[Any, bool]]
+
+
+def _encode_value(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _decode_value(column, value):
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type is Decimal:
+        return Decimal(value)
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    return python_type(value)
+
+
+def _signature(sort_key: SortKey) -> str:
+    return ",".join(f"{column.key}:{'desc' if descending else 'asc'}" for column, descending in sort_key)
+
+
+def encode_cursor(sort_key: SortKey, values: Sequence[Any]) -> str:
+    payload = {"s": _signature(sort_key), "v": [_encode_value(value) for value in values]}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(sort_key: SortKey, cursor: str) -> List[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        values = payload["v"]
+        if payload["s"] != _signature(sort_key) or len(values) != len(sort_key):
+            raise ValueError("cursor does not match the requested sort order")
+        return [_decode_value(column, value) for (column, _), value in zip(sort_key, values)]
+    except (binascii.Error, ValueError, KeyError, TypeError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid pagination cursor: {e}"
+        )
+
+
+def _nullable(column) -> bool:
+    return getattr(getattr(column, "expression", column), "nullable", True)
+
+
+def _order_by(column, descending: bool):
+    if not _nullable(column):
+        return column.desc() if descending else column.asc()
+    # NULL sorts as the smallest value on every database, matching the predicates below
+    return column.desc().nulls_last() if descending else column.asc().nulls_first()
+
+
+def _equal(column, value):
+    return column.is_(None) if value is None else column == value
+
+
+def _beyond(column, descending: bool, value):
+    """Rows strictly after value in the column's sort direction, NULL being the smallest value"""
+    if value is None:
+        return false() if descending else column.is_not(None)
+    if descending:
+        return or_(column < value, column.is_(None)) if _nullable(column) else column < value
+    return column > value
+
+
+def apply_keyset(query: Select, sort_key: SortKey, cursor: Optional[str], limit: int) -> Select:
+    """
+    Order the query by sort_key and, when a cursor is given, keep only rows after it.
+
+    Fetches limit + 1 rows so keyset_page can tell whether another page exists.
+    """
+    query = query.order_by(*[_order_by(column, descending) for column, descending in sort_key])
+
+    if cursor:
+        values = decode_cursor(sort_key, cursor)
+        clauses = []
+        for i, (column, descending) in enumerate(sort_key):
+            equal_prefix = [_equal(sort_key[j][0], values[j]) for j in range(i)]
+            clauses.append(and_(*equal_prefix, _beyond(column, descending, values[i])))
+        query = query.where(or_(*clauses))
+
+    return query.limit(limit + 1)
+
+
+def keyset_page(rows: Sequence[Any], sort_key: SortKey, limit: int) -> Tuple[List[Any], Optional[str]]:
+    """Trim the extra look-ahead row and build next_cursor from the last row kept"""
+    rows = list(rows)
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    values = [getattr(rows[-1], column.key) for column, _ in sort_key]
+    return rows, encode_cursor(sort_key, values)
@@ -0,0 +1,135 @@
+import os
+from typing import Any, Dict, Iterable, Optional
+
+from sqlalchemy import Integer, cast, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+from app.models import Product
+from .cache_utils import Cache, app_cache
+from .conditional_utils import bump_versions
+
+# Product detail entries live this long; admin writes and stock changes invalidate them sooner
+PRODUCT_CACHE_TTL = float(os.getenv("PRODUCT_CACHE_TTL", "30"))
+
+# Tags on cached reads, invalidated by the writes that change them
+PRODUCT_LIST_TAG = "products"
+CATEGORY_TAG = "categories"
+
+
+def product_tag(product_id: int) -> str:
+    return f"product:{product_id}"
+
+
+def product_reviews_tag(product_id: int) -> str:
+    return f"reviews:product:{product_id}"
+
+
+async def bump_product_versions(db: AsyncSession, *product_ids: int):
+    """Record a change to listing fields for the catalog ETags; call before commit"""
+    await bump_versions(db, PRODUCT_LIST_TAG, CATEGORY_TAG, *[product_tag(product_id) for product_id in product_ids])
+
+
+async def bump_stock_versions(db: AsyncSession, product_ids: Iterable[int], availability_changed: bool):
+    """
+    Record a stock-only change; call before commit.
+
+    Checkouts would otherwise all write the same list and category rows. Those
+    scopes only move when a product sold out or came back, so the stock counts
+    shown in listings may trail the product's own response until then.
+    """
+    scopes = [product_tag(product_id) for product_id in product_ids]
+    if availability_changed:
+        scopes += [PRODUCT_LIST_TAG, CATEGORY_TAG]
+    await bump_versions(db, *scopes)
+
+
+def product_to_dict(product: Product) -> Dict[str, Any]:
+    return {
+        "product_id": product.product_id,
+        "product_name": product.product_name,
+        "price": str(product.price),
+        "type": product.type,
+        "description": product.description,
+        "stock_quantity": product.stock_quantity,
+        "sku": product.sku,
+    }
+
+
+class ProductCache:
+    """
+    Read-through cache of product rows, keyed by product_id.
+
+    Invalidation happens after the writing transaction commits and also drops the
+    cached listings and category counts unless listings=False, which stock changes
+    pass when no product's availability moved. Other workers using the memory backend see the change once their entry's
+    TTL runs out.
+    """
+
+    def __init__(self, cache: Cache):
+        self.cache = cache
+
+    async def get(self, db: AsyncSession, product_id: int, version: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """version, e.g. the request's ETag, keeps workers from serving an entry older than it"""
+        async def load():
+            product = await db.scalar(select(Product).where(Product.product_id == product_id))
+            return product_to_dict(product) if product else None
+
+        key = product_tag(product_id) if version is None else f"{product_tag(product_id)}@{version}"
+        return await self.cache.get_or_load(
+            key, load, ttl=PRODUCT_CACHE_TTL, tags=[product_tag(product_id)]
+        )
+
+    async def invalidate(self, *product_ids: int, listings: bool = True):
+        await self.cache.invalidate_tags(
+            *((PRODUCT_LIST_TAG, CATEGORY_TAG) if listings else ()),
+            *[product_tag(product_id) for product_id in product_ids],
+            *[product_reviews_tag(product_id) for product_id in product_ids]
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return self.cache.stats()
+
+
+product_cache = ProductCache(app_cache)
+
+
+async def product_facets(db: AsyncSession, query: Select, price_bucket_size: float) -> Dict[str, Any]:
+    """
+    Type counts, price histogram and stock split for everything the filtered query matches.
+
+    One GROUP BY over (type, price bucket, in stock) is folded into the three facets here,
+    so the product rows are only scanned once whatever facets the sidebar shows.
+    """
+    bucket = cast(Product.price / price_bucket_size, Integer)
+    in_stock = Product.stock_quantity > 0
+    rows = (await db.execute(
+        query.with_only_columns(Product.type, bucket, in_stock, func.count())
+        .order_by(None)
+        .group_by(Product.type, bucket, in_stock)
+    )).all()
+
+    types: Dict[str, int] = {}
+    buckets: Dict[int, int] = {}
+    stock = {"in_stock": 0, "out_of_stock": 0}
+    for type, bucket_index, available, count in rows:
+        types[type] = types.get(type, 0) + count
+        buckets[bucket_index] = buckets.get(bucket_index, 0) + count
+        stock["in_stock" if available else "out_of_stock"] += count
+
+    return {
+        "total": sum(types.values()),
+        "types": [
+            {"type": type, "count": count}
+            for type, count in sorted(types.items(), key=lambda item: (-item[1], item[0]))
+        ],
+        "price_histogram": [
+            {
+                "min": round(bucket_index * price_bucket_size, 2),
+                "max": round((bucket_index + 1) * price_bucket_size, 2),
+                "count": count
+            }
+            for bucket_index, count in sorted(buckets.items())
+        ],
+        "stock": stock,
+    }
@@ -0,0 +1,47 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Optional
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    # Same shapes jsonable_encoder produces, so plain data renders as it did before the fast path
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered by orjson when it is installed.
+
+    As the app's default response class it only speeds up the final dump; routes that
+    return it directly with plain data also skip response_model validation and
+    jsonable_encoder, which is where most of the time goes for long lists.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(
+            jsonable_encoder(content), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode("utf-8")
+
+
+def json_response(content: Any, response: Optional[Response] = None, status_code: int = 200) -> FastJSONResponse:
+    """Return content as-is; response is the route's injected Response, whose headers are carried over"""
+    return FastJSONResponse(content, status_code=status_code, headers=dict(response.headers) if response else None)
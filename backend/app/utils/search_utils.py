@@ -0,0 +1,289 @@
+import asyncio
+import bisect
+import os
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import Column, Integer, MetaData, Table, Text, func, select, text, or_
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from sqlalchemy.sql import Select
+
+from app.database import AsyncSessionLocal, DATABASE_URL
+from app.models import Product
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# Rows per query when the suggestion index is (re)built from the Product table
+SEARCH_SUGGEST_PAGE_SIZE = int(os.getenv("SEARCH_SUGGEST_PAGE_SIZE", "10000"))
+
+# Kept out of Base.metadata so create_all never tries to build the virtual table
+_search_metadata = MetaData()
+product_search_table = Table(
+    "ProductSearch",
+    _search_metadata,
+    Column("rowid", Integer),
+    Column("product_name", Text),
+    Column("type", Text),
+    Column("description", Text),
+    Column("rank"),
+)
+
+
+def tokenize(value: str) -> List[str]:
+    return [token.lower() for token in _TOKEN_RE.findall(value or "")]
+
+
+class SearchBackend:
+    """Keeps a product search index in sync and turns a search term into a filtered query"""
+
+    name = "base"
+
+    async def setup(self, conn: AsyncConnection):
+        pass
+
+    async def rebuild(self, conn: AsyncConnection):
+        """Reindex every product, e.g. after a bulk load that bypassed index_product"""
+        pass
+
+    async def index_product(self, db: AsyncSession, product: Product):
+        pass
+
+    async def remove_product(self, db: AsyncSession, product_id: int):
+        pass
+
+    def apply(self, query: Select, term: str, rank: bool = True) -> Select:
+        raise NotImplementedError
+
+
+class LikeSearchBackend(SearchBackend):
+    """Fallback for databases without FTS5: substring match, no ranking"""
+
+    name = "like"
+
+    def apply(self, query: Select, term: str, rank: bool = True) -> Select:
+        return query.where(or_(
+            Product.product_name.contains(term),
+            Product.type.contains(term),
+            Product.description.contains(term)
+        ))
+
+
+class FTS5SearchBackend(SearchBackend):
+    """SQLite FTS5 index over product_name, type and description, ranked by bm25"""
+
+    name = "fts5"
+    # bm25 column weights: product_name, type, description
+    rank_weights = (10.0, 4.0, 1.0)
+
+    async def setup(self, conn: AsyncConnection):
+        await conn.execute(text(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS "ProductSearch" USING fts5('
+            "product_name, type, description, tokenize='unicode61 remove_diacritics 2')"
+        ))
+        weights = ", ".join(str(weight) for weight in self.rank_weights)
+        await conn.execute(text(
+            'INSERT INTO "ProductSearch"("ProductSearch", rank) VALUES (\'rank\', :rank)'
+        ), {"rank": f"bm25({weights})"})
+
+        indexed = await conn.scalar(text('SELECT count(*) FROM "ProductSearch"'))
+        products = await conn.scalar(select(func.count()).select_from(Product))
+        if indexed != products:
+            await self.rebuild(conn)
+
+    async def rebuild(self, conn: AsyncConnection):
+        await conn.execute(text('DELETE FROM "ProductSearch"'))
+        await conn.execute(text(
+            'INSERT INTO "ProductSearch"(rowid, product_name, type, description) '
+            'SELECT product_id, product_name, type, description FROM "Product"'
+        ))
+
+    async def index_product(self, db: AsyncSession, product: Product):
+        await self.remove_product(db, product.product_id)
+        await db.execute(product_search_table.insert().values(
+            rowid=product.product_id,
+            product_name=product.product_name,
+            type=product.type,
+            description=product.description
+        ))
+
+    async def remove_product(self, db: AsyncSession, product_id: int):
+        await db.execute(product_search_table.delete().where(product_search_table.c.rowid == product_id))
+
+    @staticmethod
+    def match_expression(term: str) -> Optional[str]:
+        tokens = tokenize(term)
+        if not tokens:
+            return None
+        return " ".join(f'"{token}"*' for token in tokens)
+
+    def apply(self, query: Select, term: str, rank: bool = True) -> Select:
+        expression = self.match_expression(term)
+        if expression is None:
+            return query.where(Product.product_name.contains(term))
+
+        query = query.join(
+            product_search_table, product_search_table.c.rowid == Product.product_id
+        ).where(text('"ProductSearch" MATCH :search_expression').bindparams(search_expression=expression))
+        if rank:
+            query = query.order_by(product_search_table.c.rank)
+        return query
+
+
+SEARCH_BACKENDS = {
+    FTS5SearchBackend.name: FTS5SearchBackend,
+    LikeSearchBackend.name: LikeSearchBackend,
+}
+
+
+def create_search_backend(database_url: str) -> SearchBackend:
+    default = FTS5SearchBackend.name if database_url.startswith("sqlite") else LikeSearchBackend.name
+    name = os.getenv("SEARCH_BACKEND", default)
+    if name not in SEARCH_BACKENDS:
+        raise ValueError(f"Unknown SEARCH_BACKEND '{name}', expected one of: {', '.join(SEARCH_BACKENDS)}")
+    return SEARCH_BACKENDS[name]()
+
+
+class PrefixIndex:
+    """
+    In-memory type-ahead index over product names.
+
+    Every word boundary of a name becomes a key ("smart phone", "phone"), kept in a
+    sorted list so a lookup is a bisect plus a short forward scan.
+    """
+
+    def __init__(self, max_age: float = 300.0):
+        self.max_age = max_age
+        self._keys: List[Tuple[str, int]] = []
+        self._entries: Dict[int, dict] = {}
+        self._loaded_at: Optional[float] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        # Changes made while load() runs, replayed once the new index is in place
+        self._pending: Optional[list] = None
+
+    @staticmethod
+    def _keys_for(product_id: int, name: str) -> List[Tuple[str, int]]:
+        words = (name or "").lower().split()
+        return [(" ".join(words[i:]), product_id) for i in range(len(words))]
+
+    @staticmethod
+    def _entry(product_id: int, name: str, type: str, price) -> dict:
+        return {"product_id": product_id, "product_name": name, "type": type, "price": float(price)}
+
+    @classmethod
+    def _prepare(cls, rows) -> Tuple[List[Tuple[str, int]], Dict[int, dict]]:
+        keys = []
+        entries = {}
+        for product_id, name, type, price in rows:
+            entries[product_id] = cls._entry(product_id, name, type, price)
+            keys.extend(cls._keys_for(product_id, name))
+        keys.sort()
+        return keys, entries
+
+    def _swap(self, keys: List[Tuple[str, int]], entries: Dict[int, dict]) -> None:
+        # Plain assignments with no await in between: lookups see the old index or the new one
+        self._keys = keys
+        self._entries = entries
+        self._loaded_at = time.monotonic()
+
+    def _build(self, rows) -> None:
+        self._swap(*self._prepare(rows))
+
+    async def load(self, db: AsyncSession):
+        """
+        Rebuild from the Product table without holding up the event loop.
+
+        Rows are fetched a page at a time and the keys built on a worker thread;
+        add/remove calls made meanwhile are replayed onto the new index.
+        """
+        self._pending = []
+        try:
+            rows = []
+            last_id = None
+            while True:
+                query = select(Product.product_id, Product.product_name, Product.type, Product.price)
+                if last_id is not None:
+                    query = query.where(Product.product_id > last_id)
+                page = (await db.execute(
+                    query.order_by(Product.product_id).limit(SEARCH_SUGGEST_PAGE_SIZE)
+                )).all()
+                rows.extend(page)
+                if len(page) < SEARCH_SUGGEST_PAGE_SIZE:
+                    break
+                last_id = page[-1][0]
+
+            keys, entries = await asyncio.get_running_loop().run_in_executor(None, self._prepare, rows)
+            pending = self._pending
+            self._swap(keys, entries)
+        finally:
+            self._pending = None
+        for change in pending:
+            if change[0] == "add":
+                self._add(*change[1:])
+            else:
+                self._remove(change[1])
+
+    async def _refresh(self):
+        async with AsyncSessionLocal() as db:
+            await self.load(db)
+
+    async def ensure_loaded(self):
+        if self._refresh_task is None or self._refresh_task.done():
+            if self._loaded_at is None or time.monotonic() - self._loaded_at > self.max_age:
+                self._refresh_task = asyncio.create_task(self._refresh())
+        if self._loaded_at is None:
+            # Concurrent first requests share one build; shielded so a dropped request does not cancel it
+            await asyncio.shield(self._refresh_task)
+        # Otherwise keep answering from the current index while another worker's writes are picked up
+
+    def mark_stale(self):
+        """Rebuild in the background on the next lookup, e.g. after a bulk import"""
+        if self._loaded_at is not None:
+            self._loaded_at = float("-inf")
+
+    def add(self, product: Product):
+        if self._pending is not None:
+            self._pending.append(("add", product.product_id, product.product_name, product.type, product.price))
+        if self._loaded_at is not None:
+            self._add(product.product_id, product.product_name, product.type, product.price)
+
+    def remove(self, product_id: int):
+        if self._pending is not None:
+            self._pending.append(("remove", product_id))
+        self._remove(product_id)
+
+    def _add(self, product_id: int, name: str, type: str, price):
+        self._remove(product_id)
+        self._entries[product_id] = self._entry(product_id, name, type, price)
+        for key in self._keys_for(product_id, name):
+            bisect.insort(self._keys, key)
+
+    def _remove(self, product_id: int):
+        entry = self._entries.pop(product_id, None)
+        if entry is None:
+            return
+        for key in self._keys_for(product_id, entry["product_name"]):
+            index = bisect.bisect_left(self._keys, key)
+            if index < len(self._keys) and self._keys[index] == key:
+                del self._keys[index]
+
+    def lookup(self, prefix: str, limit: int = 10) -> List[dict]:
+        prefix = " ".join(prefix.lower().split())
+        if not prefix:
+            return []
+
+        results = []
+        seen = set()
+        index = bisect.bisect_left(self._keys, (prefix,))
+        while index < len(self._keys) and len(results) < limit:
+            key, product_id = self._keys[index]
+            if not key.startswith(prefix):
+                break
+            if product_id not in seen:
+                seen.add(product_id)
+                results.append(self._entries[product_id])
+            index += 1
+        return results
+
+
+search_backend = create_search_backend(DATABASE_URL)
+suggestion_index = PrefixIndex(max_age=float(os.getenv("SEARCH_SUGGEST_REFRESH_SECONDS", "300")))
@@ -0,0 +1,48 @@
+from typing import Dict, Iterable, List
+
+from sqlalchemy import case, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Product
+
+
+async def decrement_stock(db: AsyncSession, quantities: Dict[int, int]) -> int:
+    """
+    Take quantities[product_id] units off every product in one conditional UPDATE.
+
+    A row is only touched when it still has enough stock, so the return value
+    (rows updated) is smaller than len(quantities) exactly when something would
+    have been oversold. The caller decides whether to roll back.
+    """
+    if not quantities:
+        return 0
+
+    requested = case(quantities, value=Product.product_id)
+    result = await db.execute(
+        update(Product)
+        .where(Product.product_id.in_(list(quantities)), Product.stock_quantity >= requested)
+        .values(stock_quantity=Product.stock_quantity - requested)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+async def get_stock_levels(db: AsyncSession, product_ids: Iterable[int]) -> Dict[int, int]:
+    rows = await db.execute(
+        select(Product.product_id, Product.stock_quantity).where(Product.product_id.in_(list(product_ids)))
+    )
+    return {product_id: stock for product_id, stock in rows}
+
+
+async def availability_changes(db: AsyncSession, deltas: Dict[int, int]) -> List[int]:
+    """
+    Products whose stock crossed zero with the change just applied; deltas maps
+    product_id to the signed amount that was added to its stock.
+    """
+    levels = await get_stock_levels(db, deltas)
+    changed = []
+    for product_id, delta in deltas.items():
+        after = levels.get(product_id) or 0
+        if (after > 0) != (after - delta > 0):
+            changed.append(product_id)
+    return changed
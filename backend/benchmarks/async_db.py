@@ -0,0 +1,174 @@
+"""
+Compare request latency under concurrent traffic when handlers use the
+blocking SessionLocal (old pattern) versus the AsyncSession pipeline.
+
+Each variant is served by a single uvicorn worker in a child process so the
+client-side timings include the time a request spends queued behind a
+blocked event loop.
+
+    python -m benchmarks.async_db --products 50000 --concurrency 50 --requests 2000
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine, select, insert
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import Product
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def seed(db_path: str, product_count: int):
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    rows = [
+        {
+            "product_name": f"Product {i}",
+            "price": round(random.uniform(1, 1000), 2),
+            "type": random.choice(["Electronics", "Apparel", "Books", "Home"]),
+            "description": f"Description for product {i}",
+            "stock_quantity": random.randint(0, 100),
+        }
+        for i in range(product_count)
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(Product), rows)
+    engine.dispose()
+
+
+def build_app(db_path: str, mode: str) -> FastAPI:
+    app = FastAPI()
+
+    if mode == "sync":
+        engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+        session_factory = sessionmaker(bind=engine)
+
+        @app.get("/products/{product_id}")
+        async def detail(product_id: int):
+            with session_factory() as db:
+                return db.scalar(select(Product.product_name).where(Product.product_id == product_id))
+
+        @app.get("/search")
+        async def search(q: str):
+            with session_factory() as db:
+                return db.scalars(select(Product.product_id).where(Product.description.contains(q)).limit(20)).all()
+    else:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+        session_factory = async_sessionmaker(bind=engine, class_=AsyncSession)
+
+        @app.get("/products/{product_id}")
+        async def detail(product_id: int):
+            async with session_factory() as db:
+                return await db.scalar(select(Product.product_name).where(Product.product_id == product_id))
+
+        @app.get("/search")
+        async def search(q: str):
+            async with session_factory() as db:
+                return (await db.scalars(select(Product.product_id).where(Product.description.contains(q)).limit(20))).all()
+
+    return app
+
+
+def serve(db_path: str, mode: str, port: int):
+    import uvicorn
+
+    uvicorn.run(build_app(db_path, mode), host="127.0.0.1", port=port, log_level="warning")
+
+
+def wait_until_ready(base_url: str, timeout: float = 10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            httpx.get(f"{base_url}/docs")
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server at {base_url} did not start")
+
+
+async def drive(base_url: str, product_count: int, concurrency: int, total: int, search_ratio: float):
+    latencies = {"detail": [], "search": []}
+    counter = iter(range(total))
+    limits = httpx.Limits(max_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def worker():
+            for _ in counter:
+                if random.random() < search_ratio:
+                    kind, url = "search", "/search?q=no-such-text"
+                else:
+                    kind, url = "detail", f"/products/{random.randint(1, product_count)}"
+                start = time.perf_counter()
+                response = await client.get(url)
+                latencies[kind].append((time.perf_counter() - start) * 1000)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return latencies, elapsed
+
+
+def report(mode: str, latencies, elapsed: float, total: int):
+    print(f"[{mode}] {total / elapsed:.0f} req/s")
+    for kind, values in latencies.items():
+        if not values:
+            continue
+        print(
+            f"  {kind:<7} n={len(values):<5} "
+            f"p50={statistics.median(values):7.2f}ms "
+            f"p95={percentile(values, 95):7.2f}ms "
+            f"p99={percentile(values, 99):7.2f}ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=50000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--search-ratio", type=float, default=0.05)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        seed(db_path, args.products)
+
+        for mode in ("sync", "async"):
+            random.seed(42)
+            base_url = f"http://127.0.0.1:{args.port}"
+            server = multiprocessing.Process(target=serve, args=(db_path, mode, args.port), daemon=True)
+            server.start()
+            try:
+                wait_until_ready(base_url)
+                latencies, elapsed = asyncio.run(
+                    drive(base_url, args.products, args.concurrency, args.requests, args.search_ratio)
+                )
+            finally:
+                server.terminate()
+                server.join()
+            report(mode, latencies, elapsed, args.requests)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Closed-loop load test of the whole API: virtual users log in, then repeatedly
+run journeys drawn from --mix until --duration runs out. Results are written as
+JSON; diff two of them with `python -m benchmarks.load.compare`.
+
+    python -m benchmarks.load --driver asgi --users 2000 --products 10000 --virtual-users 20 --duration 30
+    python -m benchmarks.load --driver http --workers 4 --virtual-users 100 --duration 60
+    python -m benchmarks.load --driver http --url http://127.0.0.1:8000 --users 2000 --products 10000
+
+Without --db a fresh data set is generated in a temporary directory. Against
+--url the server must already hold a data set from benchmarks.load.datagen
+with the same --users and --products.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from contextlib import nullcontext
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from benchmarks.load.datagen import Popularity, generate
+from benchmarks.load.drivers import UvicornServer, asgi_client, http_client
+from benchmarks.load.journeys import DEFAULT_MIX, VirtualUser, parse_mix, run_journey
+from benchmarks.load.report import Recorder, environment, print_summary, summarize, write_report
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+async def drive(client, args, mix) -> Recorder:
+    popularity = Popularity(args.products, args.seed)
+    # Fills caches and connection pools; its samples are thrown away
+    warmup = Recorder()
+    virtual_users = [
+        VirtualUser(client, warmup, user_id=(index % args.users) + 1, popularity=popularity, seed=args.seed + index)
+        for index in range(args.virtual_users)
+    ]
+    await asyncio.gather(*(vu.login() for vu in virtual_users))
+
+    names, weights = list(mix), list(mix.values())
+
+    async def loop(vu: VirtualUser, deadline: float):
+        while time.perf_counter() < deadline:
+            await run_journey(vu, vu.rng.choices(names, weights)[0])
+            if args.think_ms:
+                await asyncio.sleep(vu.rng.expovariate(1000 / args.think_ms))
+
+    if args.warmup:
+        deadline = time.perf_counter() + args.warmup
+        await asyncio.gather(*(loop(vu, deadline) for vu in virtual_users))
+
+    recorder = Recorder()
+    for vu in virtual_users:
+        vu.recorder = recorder
+    deadline = time.perf_counter() + args.duration
+    await asyncio.gather(*(loop(vu, deadline) for vu in virtual_users))
+    recorder.stop()
+    return recorder
+
+
+async def run(args, database_url: str):
+    mix = parse_mix(args.mix)
+    if args.driver == "asgi":
+        client_context = asgi_client()
+        server = nullcontext()
+    elif args.url:
+        client_context = http_client(args.url, args.virtual_users)
+        server = nullcontext()
+    else:
+        server = UvicornServer(database_url, args.port, args.workers)
+        client_context = None
+
+    with server as running:
+        if client_context is None:
+            client_context = http_client(running.base_url, args.virtual_users)
+        async with client_context as client:
+            return await drive(client, args, mix)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--driver", choices=("asgi", "http"), default="asgi")
+    parser.add_argument("--url", help="Drive an already running server instead of starting one (http driver)")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the http driver")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--db", help="SQLite file to run against; generated first when it does not exist")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--orders-per-user", type=float, default=3.0)
+    parser.add_argument("--virtual-users", type=int, default=20, help="Concurrent simulated shoppers")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Unmeasured seconds before the run")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="Mean pause between journeys")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Journey weights, e.g. browse=5,checkout=1")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Report path (default: benchmarks/load/results/<time>-<commit>-<driver>.json)")
+    args = parser.parse_args()
+    if args.url and args.driver != "http":
+        parser.error("--url needs --driver http")
+    try:
+        parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.abspath(args.db or os.path.join(tmp, "load.db"))
+        database_url = f"sqlite:///{db_path}"
+        # The app reads DATABASE_URL at import time; the child server gets it explicitly
+        os.environ["DATABASE_URL"] = database_url
+        if not args.url and not os.path.exists(db_path):
+            from app.database import engine
+            from app.migrations import upgrade
+
+            with engine.connect() as conn:
+                upgrade(conn)
+            start = time.perf_counter()
+            counts = generate(engine, args.users, args.products, args.orders_per_user, seed=args.seed)
+            engine.dispose()
+            print(f"Seeded in {time.perf_counter() - start:.1f}s: " + ", ".join(f"{t}={n}" for t, n in counts.items()))
+
+        recorder = asyncio.run(run(args, database_url))
+
+    summary = summarize(recorder)
+    print_summary(summary)
+    commit = (environment()["commit"] or "nogit")[:10]
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{commit}-{args.driver}.json")
+    config = {key: value for key, value in vars(args).items() if key != "output"}
+    write_report(output, config, summary)
+    print(f"Report written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Diff two load-test reports, e.g. from the commits before and after a change.
+
+    python -m benchmarks.load.compare results/before.json results/after.json --threshold 10
+
+Exits with status 1 when throughput dropped, or a step's p95/p99 grew, by more
+than --threshold percent, or when the new run has errors the old one did not.
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict, List, Tuple
+
+# (metric, True when larger is better)
+METRICS = (("rps", True), ("p50_ms", False), ("p95_ms", False), ("p99_ms", False))
+# Steps with fewer samples than this are shown but never flagged; their percentiles are noise
+MIN_SAMPLES = 30
+
+
+def load(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def change(old: float, new: float) -> float:
+    return (new - old) / old * 100 if old else 0.0
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any], threshold: float) -> Tuple[List[str], List[str]]:
+    """Table rows for every step both reports share, plus the regressions among them"""
+    rows, regressions = [], []
+    sections = [("TOTAL", old["total"], new["total"])] + [
+        (step, old["steps"][step], new["steps"][step]) for step in sorted(set(old["steps"]) & set(new["steps"]))
+    ]
+    for name, before, after in sections:
+        cells = []
+        for metric, higher_is_better in METRICS:
+            if metric not in before or metric not in after:
+                cells.append(f"{'-':>22}")
+                continue
+            delta = change(before[metric], after[metric])
+            worse = -delta if higher_is_better else delta
+            flag = worse > threshold and after.get("count", MIN_SAMPLES) >= MIN_SAMPLES
+            cells.append(f"{before[metric]:>8.1f} -> {after[metric]:>8.1f}{'!' if flag else ' '}")
+            if flag:
+                regressions.append(f"{name} {metric}: {before[metric]} -> {after[metric]} ({delta:+.1f}%)")
+        if after.get("errors", 0) > before.get("errors", 0):
+            regressions.append(f"{name} errors: {before.get('errors', 0)} -> {after['errors']}")
+        rows.append(f"{name:<24} " + " ".join(cells))
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed regression in percent")
+    args = parser.parse_args()
+
+    old, new = load(args.old), load(args.new)
+    for label, report in (("old", old), ("new", new)):
+        env = report["environment"]
+        print(f"{label}: {env['commit'] or '?'}{' (dirty)' if env['dirty'] else ''} at {env['timestamp']}")
+    if old["config"] != new["config"]:
+        differing = sorted(k for k in set(old["config"]) | set(new["config"]) if old["config"].get(k) != new["config"].get(k))
+        print(f"warning: configs differ in {', '.join(differing)}")
+
+    rows, regressions = compare(old, new, args.threshold)
+    print(f"{'step':<24} " + " ".join(f"{metric:>22}" for metric, _ in METRICS))
+    print("\n".join(rows))
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.threshold}%:")
+        print("\n".join(f"  {line}" for line in regressions))
+        sys.exit(1)
+    print("\nNo regressions")
+
+
+if __name__ == "__main__":
+    main()
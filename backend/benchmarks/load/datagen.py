@@ -0,0 +1,183 @@
+"""
+Seed a database at benchmark scale: users with carts, products, and orders,
+reviews and favorites skewed towards a small set of popular products.
+
+    python -m benchmarks.load.datagen --db /tmp/load.db --users 10000 --products 50000
+
+Every user can log in as user<N> with BENCH_PASSWORD. The same --seed always
+produces the same rows.
+"""
+import argparse
+import asyncio
+import bisect
+import itertools
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+BENCH_PASSWORD = "benchpass"
+ORDER_STATUSES = {"completed": 60, "shipped": 15, "pending": 10, "paid": 5, "cancelled": 10}
+PRODUCT_TYPES = ["Electronics", "Shoes", "Bags", "Books", "Home", "Toys", "Sports", "Beauty", "Garden", "Music"]
+ADJECTIVES = ["classic", "wireless", "leather", "compact", "vintage", "premium", "travel", "smart", "organic", "rugged"]
+NOUNS = ["speaker", "sneaker", "backpack", "novel", "lamp", "puzzle", "racket", "serum", "planter", "guitar"]
+# Terms the search journey draws from; all of them occur in generated names or descriptions
+SEARCH_TERMS = ADJECTIVES + NOUNS + ["gift", "bestseller", "limited"]
+# Popularity falls off as 1 / rank ** POPULARITY_SKEW, so a few products get most of the traffic
+POPULARITY_SKEW = 1.1
+
+
+class Popularity:
+    """Weighted product picker shared by the generator and the journeys"""
+
+    def __init__(self, products: int, seed: int = 0):
+        ranked = list(range(1, products + 1))
+        random.Random(seed).shuffle(ranked)
+        self.ranked = ranked
+        self.cumulative = list(itertools.accumulate(1 / (rank ** POPULARITY_SKEW) for rank in range(1, products + 1)))
+
+    def pick(self, rng: random.Random) -> int:
+        return self.ranked[bisect.bisect(self.cumulative, rng.random() * self.cumulative[-1])]
+
+    def sample(self, rng: random.Random, count: int) -> List[int]:
+        """Up to count distinct products, popular ones more likely"""
+        picked = {self.pick(rng) for _ in range(count * 2)}
+        return list(picked)[:count]
+
+
+def _chunks(rows: List[dict], size: int):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def generate(
+        engine,
+        users: int,
+        products: int,
+        orders_per_user: float = 3.0,
+        reviews_per_user: float = 2.0,
+        favorites_per_user: float = 4.0,
+        seed: int = 42,
+        batch_size: int = 5000
+) -> Dict[str, int]:
+    """Bulk-insert the data set into an empty, migrated database; returns row counts per table"""
+    from sqlalchemy import insert
+    from app.models import CartItem, Favorite, Order, OrderItem, Product, Review, ShoppingCart, User
+    from app.utils import get_password_hash
+
+    rng = random.Random(seed)
+    popularity = Popularity(products, seed)
+    password = get_password_hash(BENCH_PASSWORD)
+    now = datetime.utcnow()
+    counts: Dict[str, int] = {}
+
+    def load(conn, model, rows: List[dict]):
+        for chunk in _chunks(rows, batch_size):
+            conn.execute(insert(model), chunk)
+        counts[model.__tablename__] = counts.get(model.__tablename__, 0) + len(rows)
+
+    prices = {}
+    product_rows = []
+    for product_id in range(1, products + 1):
+        adjective, noun = rng.choice(ADJECTIVES), rng.choice(NOUNS)
+        prices[product_id] = round(rng.lognormvariate(3.5, 1.0), 2)
+        product_rows.append({
+            "product_id": product_id,
+            "product_name": f"{adjective.title()} {noun} {product_id}",
+            "price": prices[product_id],
+            "type": rng.choice(PRODUCT_TYPES),
+            "description": f"A {adjective} {noun}. {rng.choice(['Great gift.', 'Store bestseller.', 'Limited run.', ''])}",
+            # A few products are sold out, as in a real catalogue
+            "stock_quantity": 0 if rng.random() < 0.05 else rng.randint(100, 5000),
+        })
+
+    with engine.begin() as conn:
+        load(conn, Product, product_rows)
+        load(conn, User, [
+            {"user_id": user_id, "user_name": f"user{user_id}", "password": password,
+             "email": f"user{user_id}@example.com", "tel": "13800000000", "is_member": False, "is_admin": False}
+            for user_id in range(1, users + 1)
+        ])
+        load(conn, ShoppingCart, [{"cart_id": user_id, "user_id": user_id} for user_id in range(1, users + 1)])
+
+    orders, order_items, cart_items, reviews, favorites = [], [], [], [], []
+    order_id = 0
+    for user_id in range(1, users + 1):
+        # Exponential order counts: most users buy a little, a few buy a lot
+        for _ in range(int(rng.expovariate(1 / orders_per_user)) if orders_per_user else 0):
+            order_id += 1
+            lines = popularity.sample(rng, rng.choice((1, 1, 2, 2, 3, 4)))
+            quantities = {product_id: rng.randint(1, 3) for product_id in lines}
+            orders.append({
+                "order_id": order_id, "user_id": user_id, "recipient": f"user{user_id}", "shipping_address": "1 Bench St",
+                "total_amount": round(sum(prices[p] * q for p, q in quantities.items()), 2),
+                "status": rng.choices(list(ORDER_STATUSES), weights=list(ORDER_STATUSES.values()))[0],
+                "created_at": now - timedelta(minutes=rng.randint(0, 365 * 24 * 60)),
+            })
+            order_items.extend(
+                {"order_id": order_id, "product_id": p, "quantity": q, "price": prices[p]} for p, q in quantities.items()
+            )
+        for product_id in popularity.sample(rng, int(rng.expovariate(1 / reviews_per_user)) if reviews_per_user else 0):
+            reviews.append({"user_id": user_id, "product_id": product_id, "rating": rng.choice((1, 2, 3, 3.5, 4, 4, 4.5, 5, 5)),
+                            "content": rng.choice(["Great value.", "Does the job.", "Would buy again.", "Not as described."])})
+        for product_id in popularity.sample(rng, int(rng.expovariate(1 / favorites_per_user)) if favorites_per_user else 0):
+            favorites.append({"user_id": user_id, "product_id": product_id})
+        if rng.random() < 0.3:
+            cart_items.extend({"cart_id": user_id, "product_id": p, "quantity": 1} for p in popularity.sample(rng, 2))
+
+    with engine.begin() as conn:
+        load(conn, Order, orders)
+        load(conn, OrderItem, order_items)
+        load(conn, Review, reviews)
+        load(conn, Favorite, favorites)
+        load(conn, CartItem, cart_items)
+
+    asyncio.run(_derive(users, batch_size))
+    return counts
+
+
+async def _derive(users: int, batch_size: int):
+    """Fill the tables the app keeps in step with orders: order stats and membership flags"""
+    from app.database import AsyncSessionLocal
+    from app.utils import recompute_order_stats, refresh_member_status
+
+    async with AsyncSessionLocal() as db:
+        await recompute_order_stats(db)
+        for start in range(1, users + 1, batch_size):
+            await refresh_member_status(db, range(start, min(start + batch_size, users + 1)))
+        await db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", required=True, help="SQLite file to create; must not exist yet")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--products", type=int, default=50000)
+    parser.add_argument("--orders-per-user", type=float, default=3.0)
+    parser.add_argument("--reviews-per-user", type=float, default=2.0)
+    parser.add_argument("--favorites-per-user", type=float, default=4.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        parser.error(f"{args.db} already exists")
+    # The app reads DATABASE_URL at import time
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath(args.db)}"
+    from app.database import engine
+    from app.migrations import upgrade
+
+    with engine.connect() as conn:
+        upgrade(conn)
+    start = time.perf_counter()
+    counts = generate(engine, args.users, args.products, args.orders_per_user, args.reviews_per_user,
+                      args.favorites_per_user, args.seed)
+    print(f"Seeded {args.db} in {time.perf_counter() - start:.1f}s: "
+          + ", ".join(f"{table}={rows}" for table, rows in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
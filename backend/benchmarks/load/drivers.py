@@ -0,0 +1,87 @@
+"""
+Ways to reach the API under test. All of them yield an httpx.AsyncClient, so the
+journeys do not know which one they run against.
+
+- asgi: the app in this process through ASGITransport; no sockets, so it measures
+  the app and database alone
+- http: a uvicorn server in a child process, or an already running one at --url
+"""
+import os
+import subprocess
+import sys
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@asynccontextmanager
+async def asgi_client() -> AsyncIterator[httpx.AsyncClient]:
+    # Imported late: the app reads DATABASE_URL at import time
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            yield client
+
+
+@asynccontextmanager
+async def http_client(base_url: str, concurrency: int) -> AsyncIterator[httpx.AsyncClient]:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        yield client
+
+
+def wait_until_ready(base_url: str, server: Optional[subprocess.Popen] = None, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if server is not None and server.poll() is not None:
+            raise RuntimeError(f"Server exited with status {server.returncode} before it was ready")
+        try:
+            httpx.get(f"{base_url}/health")
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server at {base_url} did not start")
+
+
+class UvicornServer:
+    """uvicorn serving app.main:app against database_url in a child process"""
+
+    def __init__(self, database_url: str, port: int, workers: int = 1):
+        self.database_url = database_url
+        self.port = port
+        self.workers = workers
+        self.process: Optional[subprocess.Popen] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "UvicornServer":
+        env = {**os.environ, "DATABASE_URL": self.database_url, "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING")}
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(self.port),
+             "--workers", str(self.workers), "--log-level", "warning", "--no-access-log"],
+            cwd=BACKEND_DIR, env=env
+        )
+        try:
+            wait_until_ready(self.base_url, self.process)
+        except Exception:
+            self.__exit__()
+            raise
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.process is not None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+            self.process = None
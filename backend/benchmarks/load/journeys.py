@@ -0,0 +1,126 @@
+"""
+Scripted user journeys. Each one is an async function taking a VirtualUser and
+issuing the requests a shopper would, in order; every request is timed as a
+named step and the journey as a whole under its own name.
+"""
+import random
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+import httpx
+
+from .datagen import BENCH_PASSWORD, SEARCH_TERMS, Popularity
+from .report import Recorder
+
+
+class VirtualUser:
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, user_id: int, popularity: Popularity, seed: int):
+        self.client = client
+        self.recorder = recorder
+        self.user_id = user_id
+        self.popularity = popularity
+        self.rng = random.Random(seed)
+        self.headers: Dict[str, str] = {}
+
+    async def login(self):
+        """Not timed: password hashing would swamp the steps being measured"""
+        response = await self.client.post(
+            "/api/auth/login", json={"username": f"user{self.user_id}", "password": BENCH_PASSWORD}
+        )
+        response.raise_for_status()
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def call(self, step: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=self.headers, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.record(step, 0, (time.perf_counter() - start) * 1000)
+            return None
+        self.recorder.record(step, response.status_code, (time.perf_counter() - start) * 1000)
+        return response
+
+    def product(self) -> int:
+        return self.popularity.pick(self.rng)
+
+
+def _json(response: Optional[httpx.Response]):
+    return response.json() if response is not None and response.status_code == 200 else None
+
+
+async def browse(vu: VirtualUser):
+    """Category list, two pages of the catalogue, then a product with its reviews"""
+    await vu.call("categories", "GET", "/api/products/categories")
+    page = _json(await vu.call("product_list", "GET", "/api/products/", params={"limit": 20, "cursor": ""}))
+    if page and page.get("next_cursor"):
+        await vu.call("product_list_next", "GET", "/api/products/", params={"limit": 20, "cursor": page["next_cursor"]})
+    product_id = vu.product()
+    await vu.call("product_detail", "GET", f"/api/products/{product_id}")
+    await vu.call("product_reviews", "GET", f"/api/reviews/product/{product_id}")
+
+
+async def search(vu: VirtualUser):
+    """Type-ahead on a prefix, the full search, then open the top hit"""
+    term = vu.rng.choice(SEARCH_TERMS)
+    await vu.call("search_suggestions", "GET", "/api/products/search/suggestions", params={"q": term[:3]})
+    products = _json(await vu.call("search", "GET", "/api/products/", params={"search": term, "limit": 20}))
+    if products:
+        await vu.call("product_detail", "GET", f"/api/products/{products[0]['product_id']}")
+
+
+async def add_to_cart(vu: VirtualUser):
+    product_id = vu.product()
+    await vu.call("product_detail", "GET", f"/api/products/{product_id}")
+    await vu.call("cart_add", "POST", f"/api/cart/{vu.user_id}/add", json={"productId": product_id, "quantity": 1})
+    await vu.call("cart_view", "GET", f"/api/cart/{vu.user_id}")
+
+
+async def checkout(vu: VirtualUser):
+    """Fill the cart, place the order, pay for it and look at the order history"""
+    for product_id in vu.popularity.sample(vu.rng, vu.rng.randint(1, 3)):
+        await vu.call("cart_add", "POST", f"/api/cart/{vu.user_id}/add", json={"productId": product_id, "quantity": 1})
+    await vu.call("cart_view", "GET", f"/api/cart/{vu.user_id}")
+    order = _json(await vu.call(
+        "order_create", "POST", "/api/orders/create", json={"recipient": f"user{vu.user_id}", "shipping_address": "1 Bench St"}
+    ))
+    if order:
+        await vu.call("order_pay", "POST", f"/api/orders/{order['order_id']}/pay")
+    await vu.call("order_history", "GET", f"/api/orders/user/{vu.user_id}")
+
+
+async def review(vu: VirtualUser):
+    """Review a product; a product the user already reviewed comes back as a 4xx rejection"""
+    product_id = vu.product()
+    await vu.call("review_add", "POST", f"/api/reviews/{vu.user_id}/add", json={
+        "product_id": product_id, "rating": vu.rng.choice((3, 4, 5)), "content": "Benchmark review"
+    })
+    await vu.call("product_reviews", "GET", f"/api/reviews/product/{product_id}")
+
+
+JOURNEYS: Dict[str, Callable[[VirtualUser], Awaitable[None]]] = {
+    "browse": browse,
+    "search": search,
+    "add_to_cart": add_to_cart,
+    "checkout": checkout,
+    "review": review,
+}
+
+# Relative weights: mostly reading, as on a real storefront
+DEFAULT_MIX = "browse=50,search=20,add_to_cart=15,checkout=10,review=5"
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in JOURNEYS:
+            raise ValueError(f"Unknown journey '{name}'; choose from {', '.join(JOURNEYS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+async def run_journey(vu: VirtualUser, name: str):
+    start = time.perf_counter()
+    await JOURNEYS[name](vu)
+    vu.recorder.record_journey(name, (time.perf_counter() - start) * 1000)
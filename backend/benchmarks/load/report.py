@@ -0,0 +1,123 @@
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Recorder:
+    """Latency samples and status codes per step; status 0 stands for a transport error"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+        self.journeys: Dict[str, List[float]] = defaultdict(list)
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+
+    def record(self, step: str, status: int, ms: float):
+        self.samples[step].append(ms)
+        self.statuses[step][status] += 1
+
+    def record_journey(self, name: str, ms: float):
+        self.journeys[name].append(ms)
+
+    def stop(self):
+        self.finished = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+
+def _latency(values: List[float]) -> Dict[str, float]:
+    stats = {"mean_ms": round(sum(values) / len(values), 3)}
+    stats.update({f"p{pct}_ms": round(percentile(values, pct), 3) for pct in PERCENTILES})
+    stats["max_ms"] = round(max(values), 3)
+    return stats
+
+
+def summarize(recorder: Recorder) -> Dict[str, Any]:
+    """Throughput, errors and latency percentiles per step and per journey"""
+    elapsed = recorder.elapsed
+    steps = {}
+    for step, values in sorted(recorder.samples.items()):
+        statuses = recorder.statuses[step]
+        steps[step] = {
+            "count": len(values),
+            "rps": round(len(values) / elapsed, 2),
+            # 4xx are the app refusing a request (sold out, already reviewed); 5xx and transport errors are failures
+            "rejected": sum(n for status, n in statuses.items() if 400 <= status < 500),
+            "errors": sum(n for status, n in statuses.items() if status == 0 or status >= 500),
+            "statuses": {str(status): n for status, n in sorted(statuses.items())},
+            **_latency(values),
+        }
+    all_samples = [ms for values in recorder.samples.values() for ms in values]
+    total = {
+        "requests": len(all_samples),
+        "elapsed_seconds": round(elapsed, 3),
+        "rps": round(len(all_samples) / elapsed, 2) if elapsed else 0.0,
+        "errors": sum(step["errors"] for step in steps.values()),
+        "rejected": sum(step["rejected"] for step in steps.values()),
+        **(_latency(all_samples) if all_samples else {}),
+    }
+    journeys = {
+        name: {"count": len(values), "per_second": round(len(values) / elapsed, 2), **_latency(values)}
+        for name, values in sorted(recorder.journeys.items())
+    }
+    return {"total": total, "steps": steps, "journeys": journeys}
+
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", *args], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> Dict[str, Any]:
+    """What the numbers were measured against, so two reports can be told apart"""
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def write_report(path: str, config: Dict[str, Any], summary: Dict[str, Any]) -> Dict[str, Any]:
+    report = {"environment": environment(), "config": config, **summary}
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    return report
+
+
+def print_summary(summary: Dict[str, Any]):
+    total = summary["total"]
+    print(f"{total['requests']} requests in {total['elapsed_seconds']:.1f}s: {total['rps']:.1f} req/s, "
+          f"{total['errors']} errors, {total['rejected']} rejected")
+    print(f"  {'step':<28} {'n':>7} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'err':>5}")
+    for step, stats in summary["steps"].items():
+        print(f"  {step:<28} {stats['count']:>7} {stats['rps']:>8.1f} {stats['p50_ms']:>7.2f}ms "
+              f"{stats['p95_ms']:>7.2f}ms {stats['p99_ms']:>7.2f}ms {stats['errors']:>5}")
+    for name, stats in summary["journeys"].items():
+        print(f"  journey {name:<20} {stats['count']:>7} {stats['per_second']:>8.1f} {stats['p50_ms']:>7.2f}ms "
+              f"{stats['p95_ms']:>7.2f}ms {stats['p99_ms']:>7.2f}ms")
@@ -0,0 +1,92 @@
+"""
+Deep-page latency: offset/limit versus keyset cursors for the product list.
+
+    python -m benchmarks.pagination --products 200000 --page 1000 --page-size 100
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+from app.database import Base
+from app.models import Product
+from app.utils.pagination_utils import apply_keyset, encode_cursor
+
+
+def seed(engine, count: int):
+    random.seed(3)
+    rows = [
+        {
+            "product_name": f"Product {i}",
+            "price": round(random.uniform(1, 1000), 2),
+            "type": random.choice(["Electronics", "Apparel", "Books", "Home"]),
+            "description": "x" * 200,
+            "stock_quantity": random.randint(0, 100),
+        }
+        for i in range(count)
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(Product), rows)
+
+
+def median_ms(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=200000)
+    parser.add_argument("--page", type=int, default=1000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'pagination.db')}")
+        Base.metadata.create_all(bind=engine)
+        seed(engine, args.products)
+        skip = (args.page - 1) * args.page_size
+
+        sort_keys = {
+            "product_id": [(Product.product_id, False)],
+            "price": [(Product.price, False), (Product.product_id, False)],
+        }
+
+        with Session(engine) as db:
+            for name, sort_key in sort_keys.items():
+                columns = [column for column, _ in sort_key]
+                offset_query = select(Product).order_by(*columns).offset(skip).limit(args.page_size)
+
+                # The cursor a client would hold after reading page - 1
+                last_row = db.execute(select(*columns).order_by(*columns).offset(skip - 1).limit(1)).one()
+                cursor = encode_cursor(sort_key, list(last_row))
+                keyset_query = apply_keyset(select(Product), sort_key, cursor, args.page_size)
+
+                offset_ids = [p.product_id for p in db.scalars(offset_query)]
+                keyset_ids = [p.product_id for p in db.scalars(keyset_query)][:args.page_size]
+                assert offset_ids == keyset_ids, "offset and keyset pages differ"
+
+                offset_ms = median_ms(lambda: db.scalars(offset_query).all(), args.repeat)
+                keyset_ms = median_ms(lambda: db.scalars(keyset_query).all(), args.repeat)
+                db.expunge_all()
+                print(
+                    f"sort_by={name:<10} page {args.page}: "
+                    f"offset {offset_ms:8.2f}ms  keyset {keyset_ms:8.2f}ms"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Search benchmarks: type-ahead lookups against the in-memory PrefixIndex and
+full-text queries against the FTS5 index versus the old LIKE '%q%' scan.
+
+    python -m benchmarks.search --suggest-products 1000000 --search-products 200000
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.database import Base
+from app.models import Product
+from app.utils.search_utils import PrefixIndex, FTS5SearchBackend, LikeSearchBackend
+
+ADJECTIVES = ["smart", "wireless", "portable", "classic", "compact", "premium", "ultra", "mini", "pro", "eco"]
+NOUNS = ["phone", "laptop", "sneakers", "backpack", "earbuds", "watch", "camera", "lamp", "kettle", "jacket"]
+TYPES = ["Electronics", "Apparel", "Bags and Accessories", "Home", "Books"]
+
+
+def product_rows(count: int):
+    random.seed(7)
+    for i in range(count):
+        yield {
+            "product_id": i + 1,
+            "product_name": f"{random.choice(ADJECTIVES)} {random.choice(NOUNS)} {i}",
+            "price": round(random.uniform(1, 1000), 2),
+            "type": random.choice(TYPES),
+            "description": f"{random.choice(ADJECTIVES)} {random.choice(NOUNS)} for everyday use",
+            "stock_quantity": random.randint(0, 100),
+        }
+
+
+def timed(fn, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def bench_prefix_index(count: int, repeat: int):
+    index = PrefixIndex()
+    start = time.perf_counter()
+    index._build(
+        (row["product_id"], row["product_name"], row["type"], row["price"]) for row in product_rows(count)
+    )
+    print(f"PrefixIndex: built {count} products in {time.perf_counter() - start:.1f}s")
+
+    prefixes = ["s", "sm", "smart p", "wire", "lap", "phone 12", "zzz"]
+    for prefix in prefixes:
+        p50, p99 = timed(lambda: index.lookup(prefix, 10), repeat)
+        print(f"  lookup {prefix!r:<12} p50={p50:.4f}ms p99={p99:.4f}ms")
+
+
+async def bench_full_text(count: int, repeat: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "search.db")
+        sync_engine = create_engine(f"sqlite:///{db_path}")
+        Base.metadata.create_all(bind=sync_engine)
+        rows = list(product_rows(count))
+        with sync_engine.begin() as conn:
+            conn.execute(insert(Product), rows)
+        sync_engine.dispose()
+
+        engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+        fts = FTS5SearchBackend()
+        async with engine.begin() as conn:
+            await fts.setup(conn)
+
+        async with engine.connect() as conn:
+            for term in ["phone", "wireless camera", "kettle 123", "nomatch"]:
+                for backend in (LikeSearchBackend(), fts):
+                    query = backend.apply(select(Product.product_id), term).limit(100)
+                    samples = []
+                    for _ in range(repeat):
+                        start = time.perf_counter()
+                        (await conn.execute(query)).all()
+                        samples.append((time.perf_counter() - start) * 1000)
+                    print(f"  {backend.name:<5} {term!r:<18} p50={statistics.median(samples):8.2f}ms")
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suggest-products", type=int, default=1000000)
+    parser.add_argument("--search-products", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    bench_prefix_index(args.suggest_products, args.repeat)
+    print(f"Full-text search over {args.search_products} products:")
+    asyncio.run(bench_full_text(args.search_products, max(5, args.repeat // 20)))
+
+
+if __name__ == "__main__":
+    main()
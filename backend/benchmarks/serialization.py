@@ -0,0 +1,184 @@
+"""
+Serialization time and bytes on the wire for the 100-item product list and the admin order list.
+
+Compares FastAPI's default path (response_model validation or jsonable_encoder, then json.dumps)
+with FastJSONResponse on plain data, and the body sizes with gzip / brotli.
+
+    python -m benchmarks.serialization --items 100 --repeat 200
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def seed(engine, items: int):
+    from sqlalchemy import insert
+    from app.models import Order, OrderItem, Product, User
+
+    random.seed(7)
+    words = ["wireless", "compact", "durable", "premium", "lightweight", "classic", "smart", "portable"]
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{
+            "user_id": 1, "user_name": "admin", "password": "-", "email": "admin@example.com",
+            "tel": "13800000000", "is_member": False, "is_admin": True
+        }])
+        conn.execute(insert(Product), [
+            {
+                "product_id": i,
+                "product_name": f"{random.choice(words).title()} product {i}",
+                "price": round(random.uniform(5, 5000), 2),
+                "type": random.choice(["Electronics", "Apparel", "Books", "Home"]),
+                "description": " ".join(random.choice(words) for _ in range(40)),
+                "stock_quantity": random.randint(0, 100),
+            }
+            for i in range(1, items + 1)
+        ])
+        conn.execute(insert(Order), [
+            {"order_id": i, "user_id": 1, "total_amount": 100, "recipient": f"Recipient {i}",
+             "shipping_address": f"{i} Example Street, Example City", "status": "paid",
+             "created_at": now - timedelta(minutes=i)}
+            for i in range(1, items + 1)
+        ])
+        conn.execute(insert(OrderItem), [
+            {"order_id": i, "product_id": product_id, "quantity": random.randint(1, 3),
+             "price": round(random.uniform(5, 500), 2)}
+            for i in range(1, items + 1) for product_id in random.sample(range(1, items + 1), 3)
+        ])
+
+
+def median_ms(samples):
+    return statistics.median(samples) * 1000
+
+
+async def time_async(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - start)
+    return median_ms(samples)
+
+
+def wire_sizes(body: bytes) -> str:
+    sizes = [f"raw={len(body):,}B", f"gzip={len(gzip.compress(body, 6)):,}B"]
+    try:
+        import brotli
+        sizes.append(f"br={len(brotli.compress(body, quality=4)):,}B")
+    except ImportError:
+        sizes.append("br=n/a (brotli not installed)")
+    return " ".join(sizes)
+
+
+async def run(args):
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from sqlalchemy import select
+    from sqlalchemy.orm import joinedload
+
+    from app.database import AsyncSessionLocal
+    from app.main import app
+    from app.models import Order, OrderItem, Product
+    from app.utils import FastJSONResponse, create_access_token, product_to_dict
+
+    product_route = next(route for route in app.routes if getattr(route, "path", None) == "/api/products/")
+
+    async with AsyncSessionLocal() as db:
+        products = (await db.scalars(select(Product).order_by(Product.product_id).limit(args.items))).all()
+        orders = (await db.scalars(select(Order).options(
+            joinedload(Order.order_items).joinedload(OrderItem.product)
+        ).order_by(Order.created_at.desc()).limit(args.items))).unique().all()
+
+    order_dicts = [
+        {
+            "order_id": order.order_id,
+            "user_id": order.user_id,
+            "total_amount": float(order.total_amount),
+            "recipient": order.recipient,
+            "shipping_address": order.shipping_address,
+            "status": order.status,
+            "created_at": order.created_at.isoformat() if order.created_at else None,
+            "items": [
+                {"product_id": item.product_id, "product_name": item.product.product_name, "quantity": item.quantity,
+                 "price": float(item.price), "subtotal": float(item.price * item.quantity)}
+                for item in order.order_items
+            ],
+        }
+        for order in orders
+    ]
+
+    async def products_default():
+        content = await serialize_response(field=product_route.response_field, response_content=products, is_coroutine=True)
+        return JSONResponse(content).body
+
+    async def products_fast():
+        return FastJSONResponse([product_to_dict(product) for product in products]).body
+
+    async def orders_default():
+        return JSONResponse(await serialize_response(response_content=order_dicts, is_coroutine=True)).body
+
+    async def orders_fast():
+        return FastJSONResponse(order_dicts).body
+
+    print(f"Serialization, median of {args.repeat} runs:")
+    for name, default, fast in [
+        (f"product list ({len(products)} items)", products_default, products_fast),
+        (f"admin order list ({len(orders)} orders)", orders_default, orders_fast),
+    ]:
+        # Same document either way; key order may differ
+        assert json.loads(await default()) == json.loads(await fast()), name
+        before = await time_async(default, args.repeat)
+        after = await time_async(fast, args.repeat)
+        print(f"  {name:<32} default={before:.3f}ms fast={after:.3f}ms ({before / after:.1f}x)")
+        print(f"  {'':<32} {wire_sizes(await fast())}")
+
+    import httpx
+    token = create_access_token({"user_id": 1, "username": "admin", "is_admin": True})
+    transport = httpx.ASGITransport(app=app)
+    print("Through the app (compression middleware):")
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for path in [f"/api/products/?limit={args.items}", f"/api/orders/admin/all?limit={args.items}"]:
+                for encoding in ["identity", "gzip", "br"]:
+                    headers = {"Accept-Encoding": encoding, "Authorization": f"Bearer {token}"}
+                    samples = []
+                    for _ in range(max(5, args.repeat // 10)):
+                        start = time.perf_counter()
+                        response = await client.get(path, headers=headers)
+                        samples.append(time.perf_counter() - start)
+                    response.raise_for_status()
+                    print(f"  {path:<36} Accept-Encoding={encoding:<8} "
+                          f"{response.headers.get('content-encoding', 'identity'):<8} "
+                          f"{response.num_bytes_downloaded:>7,}B p50={median_ms(samples):.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'serialization.db')}"
+        os.environ.setdefault("INDEX_ADVISOR_ON_STARTUP", "false")
+        from app.database import engine
+        from app.migrations import upgrade
+
+        with engine.connect() as conn:
+            upgrade(conn)
+        seed(engine, args.items)
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
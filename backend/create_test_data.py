@@ -5,11 +5,13 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from app.database import SessionLocal, engine
-from app.models import Base, User, Product
+from app.migrations import upgrade
+from app.models import User, Product, ShoppingCart
 from app.utils import get_password_hash
 
 
-Base.metadata.create_all(bind=engine)
+with engine.connect() as connection:
+    upgrade(connection)
 
 
 def create_test_data():
@@ -28,6 +30,7 @@ def create_test_data():
                 is_member=True
             )
             db.add(test_user)
+            db.add(ShoppingCart(user=test_user))
             print("Create test user: testuser / testpassword")
         else:
             print("Test user already exists, skipping creation.")
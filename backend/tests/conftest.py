@@ -0,0 +1,148 @@
+"""
+Shared fixtures. The suite runs against a throwaway SQLite file migrated to the
+latest version, with the app driven in-process through httpx's ASGITransport.
+
+Tests may be plain functions or ``async def``; coroutines run on one event loop
+for the whole session, the one the app's async engine and caches are bound to.
+Tests share the database, so each one creates the rows it needs and filters on
+them (a unique product type, fresh users) rather than assuming an empty table.
+
+    cd backend && python -m pytest tests
+"""
+import asyncio
+import inspect
+import itertools
+import os
+import sys
+import tempfile
+from contextlib import AsyncExitStack
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The app reads DATABASE_URL at import time, so it has to be set before the first app import
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'test.db')}"
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import httpx  # noqa: E402
+from sqlalchemy import insert, select  # noqa: E402
+
+from app.database import SessionLocal, engine  # noqa: E402
+from app.migrations import upgrade  # noqa: E402
+from app.models import CartItem, Product, ShoppingCart, User  # noqa: E402
+from app.utils import create_access_token  # noqa: E402
+
+pytest_plugins = ["app.pytest_plugin"]
+
+_ids = itertools.count(1)
+
+
+def unique(prefix: str) -> str:
+    return f"{prefix}-{next(_ids)}"
+
+
+@pytest.fixture(scope="session", autouse=True)
+def loop():
+    with engine.connect() as conn:
+        upgrade(conn)
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+    engine.dispose()
+    _tmp.cleanup()
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_pyfunc_call(pyfuncitem):
+    if not inspect.iscoroutinefunction(pyfuncitem.obj):
+        return None
+    arguments = {name: pyfuncitem.funcargs[name] for name in pyfuncitem._fixtureinfo.argnames}
+    pyfuncitem.funcargs["loop"].run_until_complete(pyfuncitem.obj(**arguments))
+    return True
+
+
+@pytest.fixture(scope="session")
+def client(loop):
+    """httpx.AsyncClient talking to the app, with its startup and shutdown hooks run once"""
+    from app.main import app
+
+    stack = AsyncExitStack()
+
+    async def start():
+        await stack.enter_async_context(app.router.lifespan_context(app))
+        return await stack.enter_async_context(
+            httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test", timeout=60)
+        )
+
+    yield loop.run_until_complete(start())
+    loop.run_until_complete(stack.aclose())
+
+
+@pytest.fixture
+def auth_headers():
+    def headers(user_id: int, is_admin: bool = False) -> dict:
+        token = create_access_token({"user_id": user_id, "username": f"user{user_id}", "is_admin": is_admin})
+        return {"Authorization": f"Bearer {token}"}
+
+    return headers
+
+
+@pytest.fixture
+def make_users():
+    """Insert count users, each with an empty cart; returns their ids"""
+
+    def make(count: int = 1, is_admin: bool = False):
+        with SessionLocal() as db:
+            ids = []
+            for _ in range(count):
+                name = unique("user")
+                user = User(user_name=name, password="-", email=f"{name}@example.com", tel="13800000000", is_admin=is_admin)
+                db.add(user)
+                db.flush()
+                ids.append(user.user_id)
+            db.execute(insert(ShoppingCart), [{"user_id": user_id} for user_id in ids])
+            db.commit()
+        return ids
+
+    return make
+
+
+@pytest.fixture
+def make_products():
+    """Insert one product per stock value under a fresh type; returns (type, ids)"""
+
+    def make(*stock_quantities, price: float = 10):
+        product_type = unique("type")
+        with SessionLocal() as db:
+            # Core inserts, so a None stock is stored as NULL instead of the column default
+            ids = [
+                db.execute(insert(Product).values(
+                    product_name=f"{product_type} item {i}", price=price, type=product_type,
+                    description="test product", stock_quantity=stock
+                )).inserted_primary_key[0]
+                for i, stock in enumerate(stock_quantities)
+            ]
+            db.commit()
+        return product_type, ids
+
+    return make
+
+
+
+@pytest.fixture
+def fill_carts():
+    """Put quantity of product_id in each user's cart"""
+
+    def fill(user_ids, product_id: int, quantity: int = 1):
+        with SessionLocal() as db:
+            carts = dict(db.execute(
+                select(ShoppingCart.user_id, ShoppingCart.cart_id).where(ShoppingCart.user_id.in_(user_ids))
+            ).all())
+            db.execute(insert(CartItem), [
+                {"cart_id": carts[user_id], "product_id": product_id, "quantity": quantity} for user_id in user_ids
+            ])
+            db.commit()
+
+    return fill
@@ -0,0 +1,54 @@
+import time
+from datetime import timedelta
+
+from app.database import SessionLocal
+from app.models import User
+from app.utils import create_access_token, get_password_hash, token_cache, verify_token
+
+
+def test_repeated_token_is_served_from_the_cache():
+    token = create_access_token({"user_id": 1, "username": "cached"})
+    assert verify_token(token)["username"] == "cached"
+    hits = token_cache.hits
+
+    assert verify_token(token)["username"] == "cached"
+    assert token_cache.hits == hits + 1
+
+
+def test_expired_token_is_not_served_from_the_cache():
+    token = create_access_token({"user_id": 1, "username": "short"}, expires_delta=timedelta(seconds=1))
+    payload = verify_token(token)
+    assert payload is not None
+
+    # The entry's ttl is capped at the token's exp; jose rejects the token once that whole second has passed
+    while time.time() < payload["exp"] + 1:
+        time.sleep(0.05)
+    hits = token_cache.hits
+    assert verify_token(token) is None
+    assert token_cache.hits == hits
+
+
+async def test_token_cache_counters_are_exported(client):
+    token = create_access_token({"user_id": 1, "username": "scraped"})
+    verify_token(token)
+    verify_token(token)
+
+    body = (await client.get("/metrics")).text
+    for stat in ("hits", "misses", "hit_rate", "size"):
+        assert f'token_cache{{stat="{stat}"}}' in body
+
+
+async def test_password_hash_latency_is_exported_after_login(client):
+    with SessionLocal() as db:
+        db.add(User(user_name="metrics-login", password=get_password_hash("secret123"),
+                    email="metrics-login@example.com", tel="13800000000"))
+        db.commit()
+
+    response = await client.post("/api/auth/login", json={"username": "metrics-login", "password": "secret123"})
+    assert response.status_code == 200, response.text
+
+    body = (await client.get("/metrics")).text
+    for stat in ("pending", "rejected", "verify_count", "verify_p50_ms", "verify_p99_ms", "hash_count"):
+        assert f'password_hash{{stat="{stat}"}}' in body
+    verify_count = next(line for line in body.splitlines() if line.startswith('password_hash{stat="verify_count"}'))
+    assert int(verify_count.split()[-1]) >= 1
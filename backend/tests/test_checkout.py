@@ -0,0 +1,95 @@
+"""Stock under concurrent checkouts and cancellations: never oversold, restored exactly once"""
+import asyncio
+
+from sqlalchemy import func, select
+
+from app.database import SessionLocal
+from app.models import Order, OrderItem, Product
+
+ORDER = {"recipient": "r", "shipping_address": "a"}
+
+
+def stock_of(product_id: int) -> int:
+    with SessionLocal() as db:
+        return db.scalar(select(Product.stock_quantity).where(Product.product_id == product_id))
+
+
+def units_held(product_id: int) -> int:
+    """Units of product_id in orders that were not cancelled"""
+    with SessionLocal() as db:
+        return db.scalar(
+            select(func.coalesce(func.sum(OrderItem.quantity), 0))
+            .join(Order, Order.order_id == OrderItem.order_id)
+            .where(OrderItem.product_id == product_id, Order.status != "cancelled")
+        )
+
+
+async def checkout_all(client, auth_headers, user_ids):
+    responses = await asyncio.gather(*(
+        client.post("/api/orders/create", json=ORDER, headers=auth_headers(user_id)) for user_id in user_ids
+    ))
+    return [response.status_code for response in responses], responses
+
+
+async def test_concurrent_checkouts_do_not_oversell(client, auth_headers, make_users, make_products, fill_carts):
+    stock, clients = 5, 40
+    _, (product_id,) = make_products(stock)
+    user_ids = make_users(clients)
+    fill_carts(user_ids, product_id)
+
+    statuses, _ = await checkout_all(client, auth_headers, user_ids)
+
+    assert statuses.count(200) == stock
+    assert set(statuses) <= {200, 400, 409}
+    assert stock_of(product_id) == 0
+    assert units_held(product_id) == stock
+
+
+async def test_multi_unit_orders_do_not_oversell(client, auth_headers, make_users, make_products, fill_carts):
+    _, (product_id,) = make_products(7)
+    user_ids = make_users(10)
+    fill_carts(user_ids, product_id, quantity=3)
+
+    statuses, _ = await checkout_all(client, auth_headers, user_ids)
+
+    assert statuses.count(200) == 2
+    assert stock_of(product_id) == 1
+    assert units_held(product_id) == 6
+
+
+async def test_repeated_cancel_restores_stock_once(client, auth_headers, make_users, make_products, fill_carts):
+    _, (product_id,) = make_products(3)
+    user_id, = make_users()
+    fill_carts([user_id], product_id, quantity=2)
+    statuses, (response,) = await checkout_all(client, auth_headers, [user_id])
+    assert statuses == [200]
+    order_id = response.json()["order_id"]
+
+    cancels = await asyncio.gather(*(
+        client.put(f"/api/orders/{order_id}/cancel", headers=auth_headers(user_id)) for _ in range(8)
+    ))
+
+    assert sorted(response.status_code for response in cancels) == [200] + [400] * 7
+    assert stock_of(product_id) == 3
+    assert units_held(product_id) == 0
+
+
+async def test_cancels_racing_checkouts_keep_stock_balanced(client, auth_headers, make_users, make_products, fill_carts):
+    stock = 4
+    _, (product_id,) = make_products(stock)
+    first_buyers = make_users(stock)
+    fill_carts(first_buyers, product_id)
+    statuses, responses = await checkout_all(client, auth_headers, first_buyers)
+    assert statuses == [200] * stock
+    late_buyers = make_users(20)
+    fill_carts(late_buyers, product_id)
+
+    await asyncio.gather(
+        *(client.put(f"/api/orders/{response.json()['order_id']}/cancel", headers=auth_headers(user_id))
+          for user_id, response in zip(first_buyers, responses)),
+        checkout_all(client, auth_headers, late_buyers),
+    )
+
+    remaining = stock_of(product_id)
+    assert remaining >= 0
+    assert remaining + units_held(product_id) == stock
@@ -0,0 +1,137 @@
+"""ETag revalidation: unchanged resources answer 304, writes move the validator"""
+from datetime import datetime
+
+from sqlalchemy import insert, update
+
+from app.database import SessionLocal
+from app.models import ChangeVersion, Order, OrderItem
+from app.utils import product_tag
+
+
+async def revalidate(client, url, etag, **kwargs):
+    return await client.get(url, headers={"If-None-Match": etag}, **kwargs)
+
+
+async def test_unchanged_product_answers_304(client, make_products):
+    _, (product_id,) = make_products(3)
+    url = f"/api/products/{product_id}"
+    first = await client.get(url)
+    assert first.status_code == 200
+    assert first.headers["Cache-Control"] == "public, no-cache"
+
+    again = await revalidate(client, url, first.headers["ETag"])
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["ETag"] == first.headers["ETag"]
+
+
+async def test_product_update_changes_etag(client, auth_headers, make_users, make_products):
+    admin_id, = make_users(is_admin=True)
+    _, (product_id,) = make_products(3)
+    url = f"/api/products/{product_id}"
+    etag = (await client.get(url)).headers["ETag"]
+
+    response = await client.put(f"/api/products/admin/{product_id}", json={"price": 42},
+                                headers=auth_headers(admin_id, is_admin=True))
+    assert response.status_code == 200, response.text
+
+    changed = await revalidate(client, url, etag)
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert float(changed.json()["price"]) == 42
+
+
+async def test_new_review_is_visible_on_revalidation(client, auth_headers, make_users, make_products):
+    user_id, = make_users()
+    _, (product_id,) = make_products(3)
+    with SessionLocal() as db:
+        order_id = db.execute(insert(Order).values(
+            user_id=user_id, total_amount=10, recipient="r", shipping_address="a", status="completed"
+        )).inserted_primary_key[0]
+        db.execute(insert(OrderItem).values(order_id=order_id, product_id=product_id, quantity=1, price=10))
+        db.commit()
+
+    url = f"/api/reviews/product/{product_id}"
+    first = await client.get(url)
+    assert first.json() == []
+    assert "max-age" not in first.headers["Cache-Control"]
+    assert (await revalidate(client, url, first.headers["ETag"])).status_code == 304
+
+    response = await client.post(f"/api/reviews/{user_id}/add", headers=auth_headers(user_id),
+                                 json={"product_id": product_id, "rating": 5, "content": "Great"})
+    assert response.status_code == 200, response.text
+
+    after = await revalidate(client, url, first.headers["ETag"])
+    assert after.status_code == 200
+    assert [review["content"] for review in after.json()] == ["Great"]
+
+
+async def test_category_counts_revalidate_after_product_create(client, auth_headers, make_users):
+    admin_id, = make_users(is_admin=True)
+    first = await client.get("/api/products/categories")
+    assert first.headers["Cache-Control"] == "public, no-cache"
+    assert (await revalidate(client, "/api/products/categories", first.headers["ETag"])).status_code == 304
+
+    response = await client.post("/api/products/admin/create", headers=auth_headers(admin_id, is_admin=True), json={
+        "product_name": "Etag widget", "price": 5, "type": "etag-category", "description": "d", "stock_quantity": 2,
+    })
+    assert response.status_code == 200, response.text
+
+    after = await revalidate(client, "/api/products/categories", first.headers["ETag"])
+    assert after.status_code == 200
+    assert "etag-category" in after.text
+
+
+def set_change_version(scope: str, version: int, updated_at: datetime):
+    with SessionLocal() as db:
+        db.execute(update(ChangeVersion).where(ChangeVersion.scope == scope).values(version=version, updated_at=updated_at))
+        db.commit()
+
+
+async def test_change_in_the_same_second_defeats_if_modified_since(client, auth_headers, make_users, make_products):
+    admin_id, = make_users(is_admin=True)
+    _, (product_id,) = make_products(3)
+    # Creates the product's change counter row
+    await client.put(f"/api/products/admin/{product_id}", json={"price": 11}, headers=auth_headers(admin_id, is_admin=True))
+    url = f"/api/products/{product_id}"
+    second = datetime(2025, 3, 1, 12, 0, 0)
+
+    set_change_version(product_tag(product_id), 100, second)
+    last_modified = (await client.get(url)).headers["Last-Modified"]
+    assert (await client.get(url, headers={"If-Modified-Since": last_modified})).status_code == 304
+
+    # Written later within the second the client's Last-Modified names
+    set_change_version(product_tag(product_id), 101, second.replace(microsecond=700000))
+    response = await client.get(url, headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 200
+    assert response.headers["Last-Modified"] == last_modified
+
+
+async def test_checkout_moves_listing_etags_only_when_availability_changes(
+        client, auth_headers, make_users, make_products, fill_carts):
+    first_buyer, last_buyer = make_users(2)
+    product_type, (product_id,) = make_products(2)
+    fill_carts([first_buyer, last_buyer], product_id)
+    urls = ["/api/products/categories", f"/api/products/?type={product_type}"]
+    etags = {url: (await client.get(url)).headers["ETag"] for url in urls}
+    detail_etag = (await client.get(f"/api/products/{product_id}")).headers["ETag"]
+
+    response = await client.post("/api/orders/create", json={"recipient": "r", "shipping_address": "a"},
+                                 headers=auth_headers(first_buyer))
+    assert response.status_code == 200, response.text
+    # Still in stock: the product itself changed, the listings did not
+    assert (await revalidate(client, f"/api/products/{product_id}", detail_etag)).status_code == 200
+    for url in urls:
+        assert (await revalidate(client, url, etags[url])).status_code == 304
+
+    response = await client.post("/api/orders/create", json={"recipient": "r", "shipping_address": "a"},
+                                 headers=auth_headers(last_buyer))
+    assert response.status_code == 200, response.text
+    sold_out = {url: await revalidate(client, url, etags[url]) for url in urls}
+    assert [page.status_code for page in sold_out.values()] == [200, 200]
+    assert [item["stock_quantity"] for item in sold_out[urls[1]].json()] == [0]
+
+    response = await client.put(f"/api/orders/{response.json()['order_id']}/cancel", headers=auth_headers(last_buyer))
+    assert response.status_code == 200, response.text
+    for url in urls:
+        assert (await revalidate(client, url, sold_out[url].headers["ETag"])).status_code == 200
@@ -0,0 +1,96 @@
+import io
+
+import pytest
+from sqlalchemy import func, select
+
+from app.database import SessionLocal
+from app.jobs import import_products as importer
+from app.jobs.import_products import FeedError, import_products, read_csv
+from app.models import Product
+
+HEADER = "sku,product_name,price,type,description,stock_quantity\n"
+
+
+def feed(*lines: str):
+    return read_csv(io.StringIO(HEADER + "".join(line + "\n" for line in lines)))
+
+
+def catalog_rows(prefix: str, count: int, type: str, price: str = "9.99", name: str = "Gadget"):
+    return [f"{prefix}-{i},{name} {prefix} {i},{price},{type},Imported,{i % 3}" for i in range(count)]
+
+
+async def categories(client, *types):
+    response = await client.get("/api/products/categories")
+    counts = {category["type"]: category["product_count"] for category in response.json()}
+    return {type: counts.get(type, 0) for type in types}
+
+
+async def search_ids(client, term, type):
+    response = await client.get("/api/products/", params={"search": term, "type": type, "limit": 100})
+    assert response.status_code == 200, response.text
+    return {product["product_id"] for product in response.json()}
+
+
+async def test_partial_import_rebuilds_search_and_categories(client):
+    await import_products(feed(*catalog_rows("part", 30, "part-tools")), chunk_size=10)
+    assert await categories(client, "part-tools", "part-gizmos") == {"part-tools": 30, "part-gizmos": 0}
+
+    # Two chunks move 20 products to another type, then the third trips --max-errors
+    moved = catalog_rows("part", 20, "part-gizmos", name="Gizmo")
+    broken = ["part-x,Broken,not-a-price,part-gizmos,,1"] * 3 + catalog_rows("part-late", 7, "part-gizmos")
+    progress = importer.ImportProgress()
+    with pytest.raises(FeedError):
+        await import_products(feed(*moved, *broken), chunk_size=10, max_errors=2, progress=progress)
+    assert progress.rows_updated == 20
+
+    assert await categories(client, "part-tools", "part-gizmos") == {"part-tools": 10, "part-gizmos": 20}
+    assert len(await search_ids(client, "gizmo", "part-gizmos")) == 20
+    assert len(await search_ids(client, "gadget", "part-tools")) == 10
+
+
+async def test_insert_only_import_leaves_existing_rows_alone(client, monkeypatch):
+    rows = catalog_rows("keep", 30, "keep-type")
+    await import_products(feed(*rows), chunk_size=10)
+    etag = (await client.get("/api/products/categories")).headers["ETag"]
+
+    rebuilds = []
+
+    async def rebuild(conn):
+        rebuilds.append(conn)
+
+    monkeypatch.setattr(importer.search_backend, "rebuild", rebuild)
+    repriced = catalog_rows("keep", 30, "keep-type", price="1.00")
+    progress = await import_products(feed(*repriced), chunk_size=10, update_fields=())
+
+    summary = progress.snapshot()
+    assert (summary["rows_inserted"], summary["rows_updated"], summary["rows_skipped"]) == (0, 0, 30)
+    assert rebuilds == []
+    assert (await client.get("/api/products/categories", headers={"If-None-Match": etag})).status_code == 304
+    with SessionLocal() as db:
+        prices = set(db.scalars(select(Product.price).where(Product.sku.like("keep-%"))))
+    assert {str(price) for price in prices} == {"9.99"}
+
+
+async def test_upsert_updates_existing_skus_and_their_cached_detail(client):
+    await import_products(feed("upd-1,Lamp,10.00,upd-type,Desk lamp,4"))
+    with SessionLocal() as db:
+        product_id = db.scalar(select(Product.product_id).where(Product.sku == "upd-1"))
+    assert float((await client.get(f"/api/products/{product_id}")).json()["price"]) == 10
+
+    progress = await import_products(feed("upd-1,Lamp,12.50,upd-type,Desk lamp,0", "upd-2,Shade,3.00,upd-type,,1"))
+
+    assert (progress.rows_inserted, progress.rows_updated) == (1, 1)
+    detail = (await client.get(f"/api/products/{product_id}")).json()
+    assert (float(detail["price"]), detail["stock_quantity"]) == (12.5, 0)
+    with SessionLocal() as db:
+        assert db.scalar(select(func.count()).where(Product.sku.like("upd-%"))) == 2
+
+
+def test_invalid_rows_are_rejected_with_their_line():
+    progress = importer.ImportProgress()
+    rows = [row for row in feed("bad-1,,1.00,t,,1", "bad-2,Name,-3,t,,1", "bad-3,Name,1.00,t,,many")]
+    for line_number, record in rows:
+        with pytest.raises(FeedError) as error:
+            importer.normalize_row(record)
+        progress.reject(line_number, str(error.value))
+    assert [line for line, _ in progress.errors] == [2, 3, 4]
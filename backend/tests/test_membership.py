@@ -0,0 +1,35 @@
+from datetime import datetime
+
+from sqlalchemy import insert, select
+
+from app.database import SessionLocal
+from app.jobs.queue import job_queue
+from app.models import Order, User
+
+
+def is_member(user_id: int) -> bool:
+    with SessionLocal() as db:
+        return bool(db.scalar(select(User.is_member).where(User.user_id == user_id)))
+
+
+async def test_admin_status_change_refreshes_membership(client, auth_headers, make_users):
+    admin_id, = make_users(is_admin=True)
+    user_id, = make_users()
+    with SessionLocal() as db:
+        order_id = db.execute(insert(Order).values(
+            user_id=user_id, total_amount=10, recipient="r", shipping_address="a",
+            status="shipped", created_at=datetime.utcnow()
+        )).inserted_primary_key[0]
+        db.commit()
+
+    async def set_status(status):
+        response = await client.put(f"/api/orders/admin/{order_id}/status", json={"status": status},
+                                    headers=auth_headers(admin_id, is_admin=True))
+        assert response.status_code == 200, response.text
+        await job_queue.drain()
+
+    await set_status("completed")
+    assert is_member(user_id)
+
+    await set_status("cancelled")
+    assert not is_member(user_id)
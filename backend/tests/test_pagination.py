@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select
+
+from app.database import AsyncSessionLocal, SessionLocal
+from app.models import Order
+from app.utils import apply_keyset, keyset_page
+
+ORDER_SORT_KEY = [(Order.created_at, True), (Order.order_id, True)]
+
+
+async def walk_products(client, product_type, sort_order, limit=2):
+    ids, cursor = [], ""
+    while cursor is not None:
+        response = await client.get("/api/products/", params={
+            "type": product_type, "sort_by": "stock_quantity", "sort_order": sort_order,
+            "limit": limit, "cursor": cursor,
+        })
+        assert response.status_code == 200, response.text
+        page = response.json()
+        ids.extend(item["product_id"] for item in page["items"])
+        cursor = page["next_cursor"]
+    return ids
+
+
+async def test_product_cursor_walks_past_null_stock(client, make_products):
+    stocks = [None, 3, None, 1, 2, None, 0]
+    product_type, ids = make_products(*stocks)
+    stock_of = dict(zip(ids, stocks))
+    # NULL sorts as the smallest value, product_id breaks ties
+    expected = sorted(ids, key=lambda product_id: (stock_of[product_id] is not None, stock_of[product_id] or 0, product_id))
+
+    assert await walk_products(client, product_type, "asc") == expected
+    assert await walk_products(client, product_type, "desc") == expected[::-1]
+
+
+async def test_order_cursor_walks_past_null_created_at(make_users):
+    user_id, = make_users()
+    start = datetime(2024, 1, 1)
+    created = [start, None, start + timedelta(days=1), None, start, start + timedelta(days=2), None]
+    with SessionLocal() as db:
+        # Core insert on the table, so None is stored as NULL instead of the created_at default
+        db.execute(insert(Order.__table__), [
+            {"user_id": user_id, "total_amount": 1, "recipient": "r", "shipping_address": "a", "created_at": value}
+            for value in created
+        ])
+        db.commit()
+        rows = db.execute(select(Order.order_id, Order.created_at).where(Order.user_id == user_id)).all()
+    expected = [
+        order_id for order_id, _ in
+        sorted(rows, key=lambda row: (row.created_at is not None, row.created_at or start, row.order_id), reverse=True)
+    ]
+
+    seen, cursor = [], ""
+    async with AsyncSessionLocal() as db:
+        while cursor is not None:
+            query = apply_keyset(select(Order).where(Order.user_id == user_id), ORDER_SORT_KEY, cursor, 2)
+            orders, cursor = keyset_page((await db.scalars(query)).all(), ORDER_SORT_KEY, 2)
+            seen.extend(order.order_id for order in orders)
+    assert seen == expected
+
+
+async def test_cursor_for_another_sort_order_is_rejected(client, make_products):
+    product_type, _ = make_products(1, 2, 3)
+    first = (await client.get("/api/products/", params={
+        "type": product_type, "sort_by": "price", "limit": 1, "cursor": "",
+    })).json()
+
+    response = await client.get("/api/products/", params={
+        "type": product_type, "sort_by": "stock_quantity", "limit": 1, "cursor": first["next_cursor"],
+    })
+    assert response.status_code == 400
+    assert (await client.get("/api/products/", params={"cursor": "not-a-cursor"})).status_code == 400
@@ -0,0 +1,23 @@
+from sqlalchemy import update
+
+from app.database import SessionLocal
+from app.models import Product
+
+
+async def test_stock_reflects_writes_made_behind_the_cache(client, make_products):
+    _, (product_id,) = make_products(5)
+    assert (await client.get(f"/api/products/{product_id}")).json()["stock_quantity"] == 5
+    assert (await client.get(f"/api/products/{product_id}/stock")).json()["stock_quantity"] == 5
+
+    # Another worker's purchase: its cache invalidation never reaches this process
+    with SessionLocal() as db:
+        db.execute(update(Product).where(Product.product_id == product_id).values(stock_quantity=0))
+        db.commit()
+
+    stock = (await client.get(f"/api/products/{product_id}/stock")).json()
+    assert stock["stock_quantity"] == 0
+    assert stock["in_stock"] is False
+
+
+async def test_stock_of_missing_product_is_404(client):
+    assert (await client.get("/api/products/999999999/stock")).status_code == 404
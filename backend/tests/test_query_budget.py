@@ -0,0 +1,81 @@
+"""Statement budgets for the hot endpoints: flat counts however many rows they touch, no per-row queries"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+
+from app.database import AsyncSessionLocal, SessionLocal
+from app.models import Order
+from app.utils import product_cache
+from app.utils.nplusone_utils import QueryBudgetExceeded
+
+ORDER = {"recipient": "r", "shipping_address": "a"}
+
+
+def cart_with_products(make_users, make_products, fill_carts, count=3):
+    user_id, = make_users()
+    _, product_ids = make_products(*[5] * count)
+    for product_id in product_ids:
+        fill_carts([user_id], product_id)
+    return user_id
+
+
+async def test_create_order_budget(client, auth_headers, make_users, make_products, fill_carts, query_budget):
+    user_id = cart_with_products(make_users, make_products, fill_carts, count=4)
+    with query_budget(max_queries=8):
+        response = await client.post("/api/orders/create", json=ORDER, headers=auth_headers(user_id))
+    assert response.status_code == 200, response.text
+
+
+async def test_cancel_order_budget(client, auth_headers, make_users, make_products, fill_carts, query_budget):
+    user_id = cart_with_products(make_users, make_products, fill_carts, count=4)
+    order_id = (await client.post("/api/orders/create", json=ORDER, headers=auth_headers(user_id))).json()["order_id"]
+    with query_budget(max_queries=6):
+        response = await client.put(f"/api/orders/{order_id}/cancel", headers=auth_headers(user_id))
+    assert response.status_code == 200, response.text
+
+
+async def test_admin_listing_budgets(client, auth_headers, make_users, query_budget):
+    admin_id, = make_users(is_admin=True)
+    headers = auth_headers(admin_id, is_admin=True)
+    for url in ("/api/orders/admin/status/pending", "/api/cart/admin/all"):
+        # One for the admin's principal on a cold cache, one for the rows
+        with query_budget(max_queries=2):
+            response = await client.get(url, headers=headers)
+        assert response.status_code == 200, response.text
+
+
+async def test_auto_complete_budget(client, auth_headers, make_users, query_budget):
+    admin_id, = make_users(is_admin=True)
+    user_ids = make_users(5)
+    with SessionLocal() as db:
+        db.execute(insert(Order.__table__), [
+            {"user_id": user_id, "total_amount": 1, "recipient": "r", "shipping_address": "a", "status": "shipped",
+             "created_at": datetime.utcnow() - timedelta(days=30)}
+            for user_id in user_ids
+        ])
+        db.commit()
+
+    # The admin's principal, two counts, then one batch (select, update, two for the stats recount, two for
+    # the membership refresh) and the empty select that ends the job, however many users the batch holds
+    with query_budget(max_queries=10):
+        response = await client.put("/api/orders/auto-complete-old-orders", params={"wait": True},
+                                    headers=auth_headers(admin_id, is_admin=True))
+    assert response.status_code == 200, response.text
+    assert response.json()["job"]["updated_orders"] >= len(user_ids)
+
+
+async def test_query_loop_trips_the_budget_with_its_call_site(make_products, query_budget):
+    _, product_ids = make_products(1, 2, 3, 4)
+    async with AsyncSessionLocal() as db:
+        with pytest.raises(QueryBudgetExceeded) as excinfo:
+            with query_budget() as recorder:
+                for product_id in product_ids:
+                    await product_cache.get(db, product_id)
+
+    (shape, times, sites), = recorder.repeated()
+    assert times == len(product_ids)
+    assert 'FROM "Product" WHERE "Product".product_id = ?' in shape
+    site, = sites
+    assert site.startswith("app/utils/product_utils.py:") and site.endswith(" in load")
+    assert f"{len(product_ids)}x at {site}" in str(excinfo.value)
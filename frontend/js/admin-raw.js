@@ -251,8 +251,8 @@ async function manualCompleteOldOrders() {
                 <div class="alert alert-success">
                     <strong>Execution successful!</strong><br>
                     ${result.message}<br>
-                    ${result.updated_orders.length > 0 ? 
-                        `Updated ${result.updated_orders.length} orders, affecting ${result.updated_users.length} users` : 
+                    ${result.job && result.job.total > 0 ? 
+                        `Updated ${result.job.updated_orders} of ${result.job.total} orders so far, affecting ${result.job.updated_users} users` : 
                         'No orders need to be updated'}
                 </div>
             `;
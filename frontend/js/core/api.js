@@ -12,6 +12,8 @@ const requestCache = new Map();
 class ApiService {
     constructor() {
         this.cache = new Map();
+        // url -> { etag, lastModified, data } for conditional GETs
+        this.validators = new Map();
         this.pendingRequests = new Map();
         this.isRefreshing = false;
         this.refreshSubscribers = [];
@@ -50,6 +52,7 @@ class ApiService {
         if (token) {
             config.headers['Authorization'] = `Bearer ${token}`;
         }
+        this._addValidators(url, config);
 
         try {
             const promise = this._makeRequestWithRetry(url, config, API_CONFIG.RETRY_COUNT);
@@ -72,6 +75,10 @@ class ApiService {
         try {
             const response = await fetch(url, config);
 
+            if (response.status === 304 && this.validators.has(url)) {
+                return this.validators.get(url).data;
+            }
+
             if (!response.ok) {
                 // If it's a 401 error, try refreshing token
                 if (response.status === 401) {
@@ -92,6 +99,7 @@ class ApiService {
             }
 
             const result = await response.json();
+            this._storeValidators(url, config, response, result);
             return result;
         } catch (error) {
             if (retries > 0 && this._shouldRetry(error)) {
@@ -221,8 +229,29 @@ class ApiService {
         return `${url}_${JSON.stringify(options.body || '')}`;
     }
 
+    // Send back the validators of the last response so the server can answer 304
+    _addValidators(url, config) {
+        const cached = config.method === 'GET' && this.validators.get(url);
+        if (!cached) return;
+        if (cached.etag) {
+            config.headers['If-None-Match'] = cached.etag;
+        } else if (cached.lastModified) {
+            config.headers['If-Modified-Since'] = cached.lastModified;
+        }
+    }
+
+    _storeValidators(url, config, response, data) {
+        if (config.method !== 'GET') return;
+        const etag = response.headers.get('ETag');
+        const lastModified = response.headers.get('Last-Modified');
+        if (etag || lastModified) {
+            this.validators.set(url, { etag, lastModified, data });
+        }
+    }
+
     clearCache() {
         this.cache.clear();
+        this.validators.clear();
     }
 
     // Batch requests
@@ -261,6 +290,7 @@ async publicRequest(endpoint, options = {}) {
     if (token) {
         config.headers['Authorization'] = `Bearer ${token}`;
     }
+    this._addValidators(url, config);
 
     try {
         const promise = this._makePublicRequest(url, config, API_CONFIG.RETRY_COUNT);
@@ -283,11 +313,16 @@ async publicRequest(endpoint, options = {}) {
         try {
             const response = await fetch(url, config);
 
+            if (response.status === 304 && this.validators.has(url)) {
+                return this.validators.get(url).data;
+            }
+
             if (!response.ok) {
                 throw new Error(`HTTP ${response.status}: ${response.statusText}`);
             }
 
             const result = await response.json();
+            this._storeValidators(url, config, response, result);
             return result;
         } catch (error) {
             if (retries > 0 && this._shouldRetry(error)) {
@@ -378,6 +413,13 @@ const API = {
         remove: (userId, productId) =>
             apiService.request(`/cart/${userId}/remove/${productId}`, {
                 method: 'DELETE'
+            }),
+
+        // operations: [{ op: 'add' | 'set' | 'remove', productId, quantity }]
+        updateItems: (userId, operations, atomic = false) =>
+            apiService.request(`/cart/${userId}/items?atomic=${atomic}`, {
+                method: 'PATCH',
+                body: JSON.stringify({ operations })
             })
     },
 